@@ -1,54 +1,152 @@
-from flask import Flask, render_template, request, redirect, flash, jsonify, send_from_directory, send_file, url_for
+from flask import Flask, Blueprint, current_app, render_template, request, redirect, flash, jsonify, send_from_directory, send_file, url_for, Response, session
 import os
+import io
+import zipfile
+import zlib
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import click
 import mimetypes  # Add mimetype support for proper content type headers
 
 # Try to import TensorFlow-dependent modules but handle the case when they're not available
 try:
     from main import model_prediction, TENSORFLOW_AVAILABLE  # Image-based disease detection function
+    from main import INFERENCE_AVAILABLE, active_backend, batch_scheduler, iter_batch_predictions, load_image_bytes
+    from main import model_version, predict_image_array, decode_stats, get_model, inference_client, warmup_stats
+    from main import model_version_stats, cascade, predict_probabilities, predict_image_tiled, embed_images
 except ImportError:
     # Define fallbacks when TensorFlow is not available
     def model_prediction(filepath):
         return -1  # Return error code
-    TENSORFLOW_AVAILABLE = False
+    TENSORFLOW_AVAILABLE = INFERENCE_AVAILABLE = False
+    active_backend = lambda: None
+    batch_scheduler = iter_batch_predictions = load_image_bytes = None
+    model_version = predict_image_array = get_model = inference_client = None
+    decode_stats = warmup_stats = model_version_stats = lambda: None
+    cascade = predict_probabilities = predict_image_tiled = embed_images = None
     print("TensorFlow not available - running in limited mode")
 
-from llm import detect_disease  # Text-based disease detection function
+from llm import detect_disease, is_fallback_response, is_degraded, get_client  # Text-based disease detection function
+from llm import PROMPT_VERSION, disease_info_prompt, semantic_cache, stream_disease, latency_stats, single_flight
+from llm import register_fallback, client_stats
 import json
 import requests
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, login_required, current_user
-from models import db, User, Field, Sensor, SensorReading, DiseaseDetection
+from models import db, User, Field, Sensor, SensorReading, DiseaseDetection, add_missing_columns
 from sensor_utils import get_weather_data, get_location_name, process_sensor_data, get_field_health_status, generate_alert
 from config import Config
 from werkzeug.utils import secure_filename
+from werkzeug.wsgi import get_input_stream
 import traceback
 from datetime import datetime, timedelta
 from dashboard import dashboard  # Import the dashboard Blueprint
+from model_registry import registry as model_registry
+from prediction_cache import PredictionCache
+from jobs import JobQueue, QueueFullError
+from streams import FrameFormatError, StreamHub, StreamLimitError, read_frames
+from quality import ImageQualityError, QualityGate
+from cpu_budget import budget_stats
+from perceptual_hash import HammingIndex, dhash, hash_to_hex, hex_to_hash
+from embedding_index import EmbeddingIndex
+from knowledge import DiseaseKnowledge
+from semantic_cache import shingles
+import re
+import threading
+import time
 import math
 import random
+import numpy as np
 
-app = Flask(__name__)
-app.config.from_object(Config)
-
-# Initialize extensions
-db.init_app(app)
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'home'  # Redirect to home page which has Firebase auth
+login_manager.login_view = 'views.home'  # Redirect to home page which has Firebase auth
 login_manager.login_message = "Please log in to access this page. For now, you can continue without logging in."
 login_manager.login_message_category = "info"
 
-# Register blueprints
-app.register_blueprint(dashboard)  # Register the dashboard Blueprint
+# Database tables are created on the first request (or at startup with PRELOAD_ON_STARTUP)
+_init_lock = threading.Lock()
+
+def initialize_database(app):
+    """Create missing tables and columns once per app and process."""
+    if app.extensions.get('database_initialized'):
+        return
+    with _init_lock:
+        if app.extensions.get('database_initialized'):
+            return
+        with app.app_context():
+            try:
+                db.create_all()
+                add_missing_columns()
+                print("Database tables created successfully")
+            except Exception as e:
+                print(f"Error creating database tables: {e}")
+                traceback.print_exc()
+        app.extensions['database_initialized'] = True
+
+def preload_dependencies():
+    """Load the model, the Gemini client and plotly up front instead of on first use."""
+    start = time.perf_counter()
+    if INFERENCE_AVAILABLE and Config.INFERENCE_MODE == 'local':
+        try:
+            get_model()
+        except Exception as e:
+            print(f"Error preloading model: {e}")
+    get_client()
+    import plotly.graph_objects  # noqa: F401 - warms the dashboard chart import
+    print(f"Preloaded dependencies in {time.perf_counter() - start:.2f}s")
+
+def start_background_warmup():
+    """
+    Load and warm the model off the main thread; /status reports ready once it
+    is done. Called by serving processes only (gunicorn's post_worker_init,
+    `python app.py`), never at import time.
+    """
+    if (not Config.WARMUP_ON_STARTUP or Config.PRELOAD_ON_STARTUP
+            or not INFERENCE_AVAILABLE or Config.INFERENCE_MODE != 'local'):
+        return
+    threading.Thread(target=_background_warmup, name='model-warmup', daemon=True).start()
 
-# Create database tables
-with app.app_context():
+def _background_warmup():
     try:
-        db.create_all()
-        print("Database tables created successfully")
+        get_model()
     except Exception as e:
-        print(f"Error creating database tables: {e}")
-        traceback.print_exc()
+        print(f"Error warming up model: {e}")
+
+# Every page and API route below is registered on this blueprint, which create_app() attaches.
+# The caches, pools and hubs the routes use are module globals shared by all apps in a process.
+views = Blueprint('views', __name__, cli_group=None)
+
+def create_app(config_object=Config):
+    """
+    Build the Flask app. Heavy work (TensorFlow, the model, the Gemini client,
+    table creation) is deferred to first use unless PRELOAD_ON_STARTUP is set;
+    importing this module creates nothing on disk.
+    """
+    app = Flask(__name__)
+    app.config.from_object(config_object)
+
+    # Initialize extensions
+    db.init_app(app)
+    login_manager.init_app(app)
+
+    # Register blueprints
+    app.register_blueprint(views)
+    app.register_blueprint(dashboard)  # Register the dashboard Blueprint
+
+    @app.before_request
+    def ensure_database():
+        if not app.extensions.get('database_initialized'):
+            initialize_database(app)
+
+    @app.cli.command('init-db')
+    def init_db():
+        """Create database tables and add missing columns."""
+        initialize_database(app)
+
+    if app.config.get('PRELOAD_ON_STARTUP'):
+        initialize_database(app)
+        preload_dependencies()
+    return app
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -70,6 +168,208 @@ class_names = [
         'Tomato___Tomato_Yellow_Leaf_Curl_Virus', 'Tomato___Tomato_mosaic_virus', 'Tomato___healthy'
 ]
 
+# Cache of predictions keyed by image content and model version
+prediction_cache = PredictionCache(Config.PREDICTION_CACHE_PATH,
+                                   memory_entries=Config.PREDICTION_CACHE_MEMORY_ENTRIES,
+                                   max_db_bytes=Config.PREDICTION_CACHE_MAX_MB * 1024 * 1024)
+
+# Gemini detail text per disease class, served from disk/memory instead of a live call per upload
+disease_knowledge = DiseaseKnowledge(Config.KNOWLEDGE_CACHE_PATH,
+                                     # No fallback text: a failed fetch must not be stored as the class's detail
+                                     lambda name: detect_disease(disease_info_prompt(name), use_cache=False,
+                                                                 fallback=False),
+                                     prompt_version=PROMPT_VERSION, model_name=Config.GEMINI_MODEL,
+                                     ttl_seconds=Config.KNOWLEDGE_TTL_SECONDS,
+                                     refresh_interval=Config.KNOWLEDGE_REFRESH_SECONDS,
+                                     is_valid=lambda text: not is_fallback_response(text))
+
+def disease_detail(disease_name):
+    """Detail text for a predicted class (FALLBACK_RESPONSE when Gemini cannot be reached)."""
+    if Config.KNOWLEDGE_CACHE_ENABLED:
+        return disease_knowledge.get(disease_name)
+    return detect_disease(disease_info_prompt(disease_name), use_cache=False)
+
+_class_terms = None
+
+def _class_named_in(text):
+    """The disease class a prompt names: exactly for the upload-flow prompt, else by crop and disease words."""
+    global _class_terms
+    for name in class_names:
+        if text == disease_info_prompt(name):
+            return name
+    if _class_terms is None:
+        _class_terms = []
+        for name in class_names:
+            crop, _, disease = name.partition('___')
+            if 'healthy' not in disease:
+                _class_terms.append((name, {t for t in shingles(crop) if ' ' not in t},
+                                     {t for t in shingles(disease) if ' ' not in t}))
+    words = shingles(text)
+    best = None
+    for name, crop, disease in _class_terms:
+        if crop & words and disease <= words and (best is None or len(disease) > best[0]):
+            best = (len(disease), name)
+    return best[1] if best else None
+
+@register_fallback
+def _stored_disease_detail(symptoms):
+    """While Gemini is unavailable, answer with the stored detail text of the class the symptoms name."""
+    if not Config.KNOWLEDGE_CACHE_ENABLED:
+        return None
+    name = _class_named_in(symptoms)
+    return disease_knowledge.get(name, fetch_on_miss=False) if name else None
+
+# Originals are written to UPLOAD_FOLDER off the request thread
+upload_writer = ThreadPoolExecutor(max_workers=2, thread_name_prefix='upload-writer')
+
+def _write_upload(path, filename, data):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return filename
+    except Exception as e:
+        print(f"Error saving upload {path}: {e}")
+        return None
+
+def persist_upload(filename, data):
+    """
+    Start saving the original upload; returns a Future of the stored filename (None when the
+    write fails), or None when persistence is off. The write overlaps inference; resolve it with
+    stored_upload() before the filename is rendered or recorded.
+    """
+    if not Config.PERSIST_UPLOADS or not filename:
+        return None
+    return upload_writer.submit(_write_upload, os.path.join(current_app.config['UPLOAD_FOLDER'], filename),
+                                filename, data)
+
+def stored_upload(pending):
+    """Wait for a persist_upload() write; the filename once the file is on disk, else None."""
+    return pending.result() if pending is not None else None
+
+# Perceptual-hash index of past uploads and stored detections, for near-duplicate reuse
+near_duplicate_index = HammingIndex(max_distance=Config.NEAR_DUPLICATE_MAX_DISTANCE)
+_near_duplicate_lock = threading.Lock()
+_near_duplicate_state = {'model_version': None}
+
+def _ensure_near_duplicate_index():
+    """Load stored detection hashes on first use and start over when the model changes."""
+    version = model_version()
+    if _near_duplicate_state['model_version'] == version:
+        return
+    with _near_duplicate_lock:
+        if _near_duplicate_state['model_version'] == version:
+            return
+        near_duplicate_index.clear()
+        # Only detections made by the current model version are reused
+        rows = db.session.query(DiseaseDetection.id, DiseaseDetection.image_hash) \
+            .filter(DiseaseDetection.image_hash.isnot(None), DiseaseDetection.model_version == version)
+        for detection_id, image_hash in rows:
+            near_duplicate_index.add(hex_to_hash(image_hash), ('detection', detection_id))
+        _near_duplicate_state['model_version'] = version
+        print(f"Loaded {len(near_duplicate_index)} stored image hashes")
+
+def _near_duplicate_entry(payload):
+    """Resolve an index payload to a prediction entry, or None if it is no longer available."""
+    kind, ref = payload
+    if kind == 'cache':
+        return prediction_cache.get(ref)
+    detection = db.session.get(DiseaseDetection, ref)
+    if detection is None or detection.disease_name not in class_names:
+        return None
+    return {
+        'result_index': class_names.index(detection.disease_name),
+        'confidence': detection.confidence,
+        'probabilities': None,
+        'detail': None,
+        'model_version': detection.model_version
+    }
+
+# Penultimate-layer embeddings of stored detections, one index per model version
+similarity_indexes = {}
+_similarity_lock = threading.Lock()
+
+def similarity_index(version=None):
+    """Return the embedding index of a model version (the served model by default)."""
+    # The cascade suffix only affects predictions; embeddings always come from the full model
+    version = (version or model_version()).split('+')[0]
+    with _similarity_lock:
+        index = similarity_indexes.get(version)
+        if index is None:
+            directory = os.path.join(Config.EMBEDDING_DIR, re.sub(r'[^A-Za-z0-9._-]+', '_', version))
+            index = similarity_indexes[version] = EmbeddingIndex(directory, dim=Config.EMBEDDING_DIM,
+                                                                 nprobe=Config.SIMILARITY_NPROBE,
+                                                                 exact_below=Config.SIMILARITY_EXACT_BELOW)
+        return index
+
+def embeddings_available():
+    return Config.EMBEDDINGS_ENABLED and embed_images is not None and Config.INFERENCE_MODE != 'pool'
+
+def _index_detection(detection_id, data):
+    try:
+        version, vectors = embed_images(load_image_bytes(data)[np.newaxis])
+        similarity_index(version).append([detection_id], vectors)
+    except Exception as e:
+        print(f"Error storing embedding for detection {detection_id}: {e}")
+
+def index_detection(detection_id, data):
+    """Queue the embedding of a saved detection's image for similar-case search."""
+    if embeddings_available():
+        upload_writer.submit(_index_detection, detection_id, data)
+
+def classify_upload(data):
+    """
+    Classify uploaded image bytes. Identical bytes are answered from the prediction
+    cache, and perceptual near-duplicates of earlier uploads or stored detections
+    reuse the earlier prediction; only new images run through the model.
+    Returns (cache_key, entry, source) where source is 'exact', 'near_duplicate' or None.
+    """
+    version = model_version()
+    cache_key = PredictionCache.make_key(data, version)
+    if Config.PREDICTION_CACHE_ENABLED:
+        entry = prediction_cache.get(cache_key)
+        if entry is not None:
+            return cache_key, entry, 'exact'
+
+    image_array = load_image_bytes(data)
+    if Config.QUALITY_GATE_ENABLED:
+        # Raises ImageQualityError before any model or LLM work is done
+        quality_gate.check(image_array)
+    image_hash = dhash(image_array) if Config.NEAR_DUPLICATE_ENABLED else None
+    if image_hash is not None:
+        _ensure_near_duplicate_index()
+        match = near_duplicate_index.nearest(image_hash)
+        entry = _near_duplicate_entry(match[1]) if match else None
+        if entry is not None:
+            entry = dict(entry, image_hash=hash_to_hex(image_hash))
+            if Config.PREDICTION_CACHE_ENABLED:
+                prediction_cache.put(cache_key, entry)
+            return cache_key, entry, 'near_duplicate'
+
+    result_index, confidence, probabilities = predict_image_array(image_array)
+    entry = {
+        'result_index': result_index,
+        'confidence': confidence,
+        'probabilities': [round(float(p), 6) for p in probabilities],
+        'detail': None,
+        'image_hash': hash_to_hex(image_hash) if image_hash is not None else None,
+        'model_version': version
+    }
+    if Config.PREDICTION_CACHE_ENABLED:
+        prediction_cache.put(cache_key, entry)
+        if image_hash is not None:
+            near_duplicate_index.add(image_hash, ('cache', cache_key))
+    return cache_key, entry, None
+
+# Blur / exposure / plant-content checks run before inference
+quality_gate = QualityGate(min_sharpness=Config.QUALITY_MIN_SHARPNESS,
+                           min_brightness=Config.QUALITY_MIN_BRIGHTNESS,
+                           max_brightness=Config.QUALITY_MAX_BRIGHTNESS,
+                           max_clipped_fraction=Config.QUALITY_MAX_CLIPPED_FRACTION,
+                           min_plant_fraction=Config.QUALITY_MIN_PLANT_FRACTION)
+
 # Firebase Config - Get from environment variables via config.py
 FIREBASE_CONFIG = {
     "apiKey": Config.FIREBASE_API_KEY,
@@ -103,7 +403,7 @@ def verify_firebase_token(id_token):
         return None
 
 # Home Route (Renders the main page)
-@app.route('/')
+@views.route('/')
 def home():
     # Use hardcoded Firebase configuration directly
     firebase_config = {
@@ -119,46 +419,45 @@ def home():
     return render_template('index.html', firebase_config=firebase_config)
 
 # About Page Route
-@app.route('/about')
+@views.route('/about')
 def about():
     return render_template('about.html')
 
 # Route to handle image-based disease detection
-@app.route('/upload', methods=['POST'])
+@views.route('/upload', methods=['POST'])
 def upload_image():
     # Check if file is in the request
     if 'file' not in request.files:
         flash('No file part', 'danger')
-        return redirect(request.referrer or url_for('home'))
+        return redirect(request.referrer or url_for('.home'))
     
     file = request.files['file']
     
     if file.filename == '':
         flash('No selected file', 'danger')
-        return redirect(request.referrer or url_for('home'))
-    
-    # Make sure the uploads directory exists
-    if not os.path.exists(app.config['UPLOAD_FOLDER']):
-        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+        return redirect(request.referrer or url_for('.home'))
     
     if file and allowed_file(file.filename):
         # Create a safe filename
         filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        # Decode straight from the in-memory upload; the original is written to disk meanwhile
+        data = file.read()
+        pending_upload = persist_upload(filename, data)
         
         try:
-            # Check if TensorFlow is available
-            if not TENSORFLOW_AVAILABLE:
-                flash('TensorFlow is not available on the server. Disease detection cannot be performed.', 'danger')
+            # Check if an inference backend (TensorFlow or the NumPy engine) is available
+            if not INFERENCE_AVAILABLE:
+                flash('No inference backend is available on the server. Disease detection cannot be performed.', 'danger')
                 return render_template('result.html', 
-                                      prediction="Error: TensorFlow not available", 
+                                      prediction="Error: Inference backend not available", 
                                       confidence=None,
-                                      image_path=filename)
+                                      image_path=stored_upload(pending_upload))
             
-            # Get prediction from the model
-            print("Using TensorFlow model for prediction")
-            result_index = model_prediction(filepath)
+            # Get prediction from the model (or the cache, for a repeated upload)
+            cache_key, entry, cache_source = classify_upload(data)
+            result_index = entry['result_index']
+            if cache_source:
+                print(f"Reusing cached prediction for this image ({cache_source})")
             
             if result_index == -1:
                 # Model has low confidence
@@ -166,7 +465,7 @@ def upload_image():
                 return render_template('result.html', 
                                       prediction="Uncertain: Model has low confidence", 
                                       confidence=None,
-                                      image_path=filename)
+                                      image_path=stored_upload(pending_upload))
             
             # Valid prediction
             disease_name = class_names[result_index]
@@ -176,16 +475,28 @@ def upload_image():
             
             print(f"Prediction: {disease_name}, No exact confidence available")
             
-            # Try to get additional info from LLM API for a richer response
-            detailed_result = None
-            try:
-                # Use the LLM-based detection to get more detailed information
-                detailed_prompt = f"Provide information about the plant disease: {disease_name}"
-                detailed_result = detect_disease(detailed_prompt)
-                print(f"Got detailed information for {disease_name}")
-            except Exception as e:
-                print(f"Could not get detailed disease information: {e}")
-                traceback.print_exc()
+            # Try to get additional info for a richer response (knowledge cache first, then the LLM API)
+            detailed_result = None if Config.KNOWLEDGE_CACHE_ENABLED else entry.get('detail')
+            stream_url = None
+            if detailed_result is None and Config.LLM_STREAMING:
+                # Render the prediction at once and let the page stream in a detail text that is not cached yet
+                if Config.KNOWLEDGE_CACHE_ENABLED:
+                    detailed_result = disease_knowledge.get(disease_name, fetch_on_miss=False)
+                if detailed_result is None:
+                    stream_url = url_for('.disease_info_stream', disease_name=disease_name)
+            if detailed_result is None and stream_url is None:
+                try:
+                    detailed_result = disease_detail(disease_name)
+                    print(f"Got detailed information for {disease_name}")
+                    if (Config.PREDICTION_CACHE_ENABLED and not Config.KNOWLEDGE_CACHE_ENABLED
+                            and not is_fallback_response(detailed_result)):
+                        prediction_cache.update(cache_key, detail=detailed_result)
+                except Exception as e:
+                    print(f"Could not get detailed disease information: {e}")
+                    traceback.print_exc()
+            
+            # Only a file that made it to disk is shown on the page or recorded
+            image_path = stored_upload(pending_upload)
             
             # Store the field_id if provided (for logged in users)
             field_id = request.form.get('field_id')
@@ -198,13 +509,16 @@ def upload_image():
                         detection = DiseaseDetection(
                             field_id=field_id,
                             disease_name=disease_name,
-                            confidence=0.5,  # Use a neutral value for database
-                            image_path=filename,
+                            confidence=entry['confidence'],
+                            image_path=image_path,
+                            image_hash=entry.get('image_hash'),
+                            model_version=entry.get('model_version'),
                             latitude=request.form.get('latitude'),
                             longitude=request.form.get('longitude')
                         )
                         db.session.add(detection)
                         db.session.commit()
+                        index_detection(detection.id, data)
                         
                         # Generate alert
                         generate_alert(field_id, detection)
@@ -216,9 +530,17 @@ def upload_image():
             return render_template('result.html', 
                                   prediction=disease_name,
                                   confidence=confidence,
-                                  image_path=filename,
-                                  result=detailed_result)  # Pass the detailed results from LLM
+                                  image_path=image_path,
+                                  result=detailed_result,  # Pass the detailed results from LLM
+                                  degraded=is_degraded(detailed_result),
+                                  stream_url=stream_url)
                                   
+        except ImageQualityError as e:
+            flash(str(e), 'warning')
+            return render_template('result.html', 
+                                  prediction="Image quality check failed", 
+                                  confidence=None,
+                                  image_path=stored_upload(pending_upload))
         except Exception as e:
             print(f"Error processing image: {e}")
             traceback.print_exc()
@@ -226,62 +548,422 @@ def upload_image():
             return render_template('result.html', 
                                   prediction=f"Error: {str(e)}", 
                                   confidence=None,
-                                  image_path=filename)
+                                  image_path=stored_upload(pending_upload))
     
     # If file type is not allowed
     flash('Invalid file type. Please upload an image.', 'danger')
-    return redirect(request.referrer or url_for('home'))
+    return redirect(request.referrer or url_for('.home'))
 
 # API endpoint for image-based disease detection (returns JSON)
-@app.route('/api/predict', methods=['POST'])
+@views.route('/api/predict', methods=['POST'])
 def api_predict():
-    if not TENSORFLOW_AVAILABLE:
+    if not INFERENCE_AVAILABLE:
         return jsonify({
             'success': False,
-            'message': 'TensorFlow is not available on the server. Please use offline mode.'
+            'message': 'No inference backend is available on the server. Please use offline mode.'
         }), 503
         
     if 'file' not in request.files or request.files['file'].filename == '':
         return jsonify({'error': 'No file selected'}), 400
 
     file = request.files['file']
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
-    file.save(filepath)
+    data = file.read()
+    persist_upload(secure_filename(file.filename), data)
 
-    # Run the image through the model
-    result_index = model_prediction(filepath)
+    # Async mode: answer with a job id now and classify in the background
+    if request.args.get('async', request.form.get('async', '')).lower() in ('1', 'true', 'yes'):
+        try:
+            job = prediction_jobs.submit(_prediction_job, current_app._get_current_object(), data)
+        except QueueFullError:
+            return jsonify({'success': False, 'message': 'Too many pending prediction jobs, try again shortly'}), 503
+        return jsonify({
+            'success': True,
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': url_for('.job_status', job_id=job.id),
+            'events_url': url_for('.job_events', job_id=job.id)
+        }), 202
 
-    if result_index == -1:
+    # Run the image through the model (or answer from the cache)
+    try:
+        _, entry, cache_source = classify_upload(data)
+    except ImageQualityError as e:
         return jsonify({
             'success': False,
-            'message': 'Model is not confident about the prediction'
-        })
-    else:
+            'message': str(e),
+            'quality_issue': e.reason,
+            'quality': e.metrics
+        }), 422
+    except Exception as e:
+        print(f"Error in model prediction: {e}")
         return jsonify({
+            'success': False,
+            'message': f'Error processing image: {str(e)}'
+        }), 500
+    return jsonify(_prediction_response(entry, cache_source))
+
+def _prediction_response(entry, cache_source):
+    """JSON body for a classified upload (shared by /api/predict and async jobs)."""
+    result_index = entry['result_index']
+
+    if result_index == -1:
+        return {
+            'success': False,
+            'message': 'Model is not confident about the prediction',
+            'cached': cache_source is not None,
+            'near_duplicate': cache_source == 'near_duplicate'
+        }
+    else:
+        return {
             'success': True, 
-            'disease': class_names[result_index]
-        })
+            'disease': class_names[result_index],
+            'confidence': entry['confidence'],
+            'probabilities': dict(zip(class_names, entry['probabilities'])) if entry['probabilities'] else None,
+            'details': entry.get('detail'),
+            'details_degraded': is_degraded(entry.get('detail')),  # Served without a live Gemini answer
+            'cached': cache_source is not None,
+            'near_duplicate': cache_source == 'near_duplicate'
+        }
+
+# API endpoint for tiled high-resolution detection (patch heatmap + image-level result)
+@views.route('/api/predict/tiled', methods=['POST'])
+def api_predict_tiled():
+    if not INFERENCE_AVAILABLE:
+        return jsonify({
+            'success': False,
+            'message': 'No inference backend is available on the server. Please use offline mode.'
+        }), 503
+
+    if 'file' not in request.files or request.files['file'].filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+
+    file = request.files['file']
+    data = file.read()
+    persist_upload(secure_filename(file.filename), data)
+    try:
+        result = predict_image_tiled(data)
+    except Exception as e:
+        print(f"Error in tiled prediction: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error processing image: {str(e)}'
+        }), 500
+
+    probabilities = result.pop('probabilities')
+    result_index = result.pop('result_index')
+    result.update({
+        'success': result['confidence'] > Config.MODEL_CONFIDENCE_THRESHOLD,
+        'disease': class_names[result_index],
+        'probabilities': {name: round(float(p), 6) for name, p in zip(class_names, probabilities)}
+    })
+    return jsonify(result)
+
+# Background prediction jobs for /api/predict?async=1
+prediction_jobs = JobQueue(workers=Config.ASYNC_JOB_WORKERS,
+                           max_pending=Config.ASYNC_JOB_MAX_PENDING,
+                           ttl_seconds=Config.ASYNC_JOB_TTL_SECONDS,
+                           db_path=Config.ASYNC_JOB_DB_PATH if Config.ASYNC_JOB_SHARED else None)
+
+def _prediction_job(app, data):
+    """Classify an upload off the request thread, including the LLM detail text the sync API skips."""
+    with app.app_context():
+        cache_key, entry, cache_source = classify_upload(data)
+        if entry['result_index'] != -1 and (entry.get('detail') is None or Config.KNOWLEDGE_CACHE_ENABLED):
+            disease_name = class_names[entry['result_index']]
+            try:
+                detail = disease_detail(disease_name)
+                entry = dict(entry, detail=detail)
+                if (Config.PREDICTION_CACHE_ENABLED and not Config.KNOWLEDGE_CACHE_ENABLED
+                        and not is_fallback_response(detail)):
+                    prediction_cache.update(cache_key, detail=detail)
+            except Exception as e:
+                print(f"Could not get detailed disease information: {e}")
+        return _prediction_response(entry, cache_source)
+
+# Poll the state of a prediction job
+@views.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    job = prediction_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    return jsonify(job.to_dict())
+
+# Follow a prediction job as Server-Sent Events until it finishes
+@views.route('/api/jobs/<job_id>/events')
+def job_events(job_id):
+    job = prediction_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+
+    def generate():
+        version = None
+        while True:
+            if version != job.version:
+                version = job.version
+                event = 'result' if job.finished else 'status'
+                yield f"event: {event}\ndata: {json.dumps(job.to_dict())}\n\n"
+                if job.finished:
+                    return
+            elif version == prediction_jobs.wait_for_change(job, version, timeout=15.0):
+                # Keep idle connections open through proxies
+                yield ": keep-alive\n\n"
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Shared pool for decoding uploaded images in parallel
+decode_executor = ThreadPoolExecutor(max_workers=Config.IMAGE_DECODE_WORKERS, thread_name_prefix='image-decode')
+
+def _collect_uploaded_images(uploads):
+    """
+    Return (items, archives) for the uploaded files, where items are (filename, source) pairs and
+    source is either image bytes or (archive, member) for a zip member read later by _read_upload.
+    Raises zipfile.BadZipFile for an upload named .zip that is not a readable archive.
+    """
+    items, archives = [], []
+    try:
+        for filename, data in uploads:
+            if filename.lower().endswith('.zip'):
+                archive = zipfile.ZipFile(io.BytesIO(data))
+                archives.append(archive)
+                items.extend((member.filename, (archive, member)) for member in archive.infolist()
+                             if not member.is_dir() and allowed_file(member.filename))
+            elif allowed_file(filename):
+                items.append((filename, data))
+    except zipfile.BadZipFile:
+        for archive in archives:
+            archive.close()
+        raise
+    return items, archives
+
+def _read_upload(source):
+    """Decode one item from _collect_uploaded_images; bad zip members raise and become per-item errors."""
+    if isinstance(source, tuple):
+        archive, member = source
+        if member.file_size > Config.BATCH_PREDICT_MAX_MEMBER_BYTES:
+            raise ValueError(f'archive member is larger than {Config.BATCH_PREDICT_MAX_MEMBER_BYTES} bytes')
+        try:
+            source = archive.read(member)
+        except (zipfile.BadZipFile, NotImplementedError, RuntimeError, EOFError, zlib.error) as e:
+            raise ValueError(f'corrupt archive member ({e})')
+    return load_image_bytes(source)
+
+# API endpoint for multi-image disease detection (streams NDJSON, one line per image)
+@views.route('/api/predict/batch', methods=['POST'])
+def api_predict_batch():
+    if not INFERENCE_AVAILABLE:
+        return jsonify({
+            'success': False,
+            'message': 'No inference backend is available on the server. Please use offline mode.'
+        }), 503
+
+    # Read the encoded uploads now; the request's file handles are closed before streaming starts
+    uploads = [(file.filename, file.read())
+               for file in request.files.getlist('files') + request.files.getlist('file')
+               if file and file.filename]
+    if not uploads:
+        return jsonify({'error': 'No files selected'}), 400
+
+    # Open and check every archive before the 200 goes out, so a bad upload still gets a proper status
+    try:
+        items, archives = _collect_uploaded_images(uploads)
+    except zipfile.BadZipFile:
+        return jsonify({'error': 'Uploaded .zip file is not a valid zip archive'}), 400
+
+    def close_archives():
+        for archive in archives:
+            archive.close()
+
+    if not items:
+        close_archives()
+        return jsonify({'error': 'No images found in the upload'}), 400
+    if len(items) > Config.BATCH_PREDICT_MAX_ITEMS:
+        close_archives()
+        return jsonify({'error': f'Too many images ({len(items)}), at most {Config.BATCH_PREDICT_MAX_ITEMS} per request'}), 400
+
+    def generate():
+        count = 0
+        predictions = iter_batch_predictions(items, _read_upload, decode_executor,
+                                             chunk_size=Config.BATCH_PREDICT_CHUNK_SIZE)
+        for filename, probabilities, error in predictions:
+            if error is not None:
+                line = {'filename': filename, 'success': False, 'message': f'Could not decode image: {error}'}
+            else:
+                result_index = int(np.argmax(probabilities))
+                confidence = float(probabilities[result_index])
+                line = {
+                    'filename': filename,
+                    'success': confidence > Config.MODEL_CONFIDENCE_THRESHOLD,
+                    'disease': class_names[result_index],
+                    'confidence': confidence,
+                    'probabilities': {name: float(p) for name, p in zip(class_names, probabilities)}
+                }
+            count += 1
+            yield json.dumps(line) + '\n'
+        yield json.dumps({'done': True, 'count': count}) + '\n'
+
+    response = Response(generate(), mimetype='application/x-ndjson')
+    response.call_on_close(close_archives)
+    return response
+
+# Live camera streams: frames in over POST (one per frame, or an upload channel), smoothed predictions out over SSE
+stream_hub = StreamHub(load_image_bytes, predict_probabilities, class_names,
+                       max_fps=Config.STREAM_MAX_FPS, smoothing=Config.STREAM_SMOOTHING,
+                       max_streams=Config.STREAM_MAX_STREAMS, idle_timeout=Config.STREAM_IDLE_TIMEOUT,
+                       max_batch=Config.INFERENCE_BATCH_MAX_SIZE, max_viewers=Config.STREAM_MAX_VIEWERS)
+
+def _streams_servable():
+    """
+    Stream state is per process, so streams need a single worker. gunicorn's
+    post_fork exports the actual worker count as WEB_CONCURRENCY; when it is
+    unset this is the single-process development server.
+    """
+    return int(os.getenv('WEB_CONCURRENCY', '1')) <= 1
+
+@views.route('/api/stream', methods=['POST'])
+def open_stream():
+    if not INFERENCE_AVAILABLE:
+        return jsonify({
+            'success': False,
+            'message': 'No inference backend is available on the server. Please use offline mode.'
+        }), 503
+    if not _streams_servable():
+        return jsonify({
+            'success': False,
+            'message': 'Live streams need a single-worker deployment (WEB_CONCURRENCY=1); see the README.'
+        }), 503
+    try:
+        stream = stream_hub.open()
+    except StreamLimitError:
+        return jsonify({'success': False, 'message': 'Too many open streams, try again shortly'}), 503
+    return jsonify({
+        'success': True,
+        'stream_id': stream.id,
+        'max_fps': Config.STREAM_MAX_FPS,
+        'frames_url': url_for('.push_stream_frame', stream_id=stream.id),
+        'upload_url': url_for('.upload_stream_frames', stream_id=stream.id),
+        'events_url': url_for('.stream_events', stream_id=stream.id)
+    }), 201
+
+@views.route('/api/stream/<stream_id>/frames', methods=['POST'])
+def push_stream_frame(stream_id):
+    """Accept one frame (raw image body or a 'frame' file field); 429 when over the max-FPS policy."""
+    stream = stream_hub.get(stream_id)
+    if stream is None:
+        return jsonify({'error': 'Unknown or expired stream'}), 404
+    frame = request.files['frame'].read() if 'frame' in request.files else request.get_data()
+    if not frame:
+        return jsonify({'error': 'Empty frame'}), 400
+
+    accepted, retry_after = stream_hub.push(stream, frame)
+    if not accepted:
+        response = jsonify({'accepted': False, 'message': 'Frame rate limit exceeded', 'retry_after': round(retry_after, 3)})
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response, 429
+    return jsonify({'accepted': True, 'seq': stream.seq, 'dropped': stream.dropped}), 202
+
+@views.route('/api/stream/<stream_id>/upload', methods=['POST'])
+def upload_stream_frames(stream_id):
+    """
+    Upload channel: one long-lived (usually chunked) POST whose body carries
+    length-prefixed frames for as long as the camera runs. Frames over the
+    max-FPS policy are discarded rather than answered with 429. Returns a
+    summary once the body ends or the stream is closed.
+    """
+    stream = stream_hub.get(stream_id)
+    if stream is None:
+        return jsonify({'error': 'Unknown or expired stream'}), 404
+    if not stream_hub.open_upload(stream):
+        return jsonify({'error': 'This stream already has an upload channel open'}), 409
+    # The body lasts as long as the stream, so MAX_CONTENT_LENGTH does not apply; each frame is bounded instead
+    body = get_input_stream(request.environ, max_content_length=None)
+    received = accepted = 0
+    try:
+        for frame in read_frames(body, Config.STREAM_MAX_FRAME_BYTES):
+            if stream.closed:
+                break
+            received += 1
+            accepted += stream_hub.push(stream, frame)[0]
+    except FrameFormatError as e:
+        return jsonify({'error': str(e), 'frames': received, 'accepted': accepted}), 400
+    finally:
+        stream_hub.close_upload(stream)
+    return jsonify({'frames': received, 'accepted': accepted, 'dropped': stream.dropped, 'closed': stream.closed})
+
+@views.route('/api/stream/<stream_id>/events')
+def stream_events(stream_id):
+    stream = stream_hub.get(stream_id)
+    if stream is None:
+        return jsonify({'error': 'Unknown or expired stream'}), 404
+    if not stream_hub.add_viewer(stream):
+        response = jsonify({'error': 'Too many viewers of this stream, try again shortly'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+
+    def generate():
+        version = stream.version
+        while not stream.closed:
+            new_version = stream_hub.wait_for_result(stream, version, timeout=15.0)
+            # A connected viewer keeps the stream alive even between frames
+            stream.last_active = time.time()
+            if new_version == version:
+                yield ": keep-alive\n\n"
+                continue
+            version = new_version
+            if stream.result is not None and not stream.closed:
+                yield f"event: prediction\ndata: {json.dumps(stream.result)}\n\n"
+        yield "event: closed\ndata: {}\n\n"
+
+    response = Response(generate(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Released when the connection ends, even if the generator never started
+    response.call_on_close(lambda: stream_hub.remove_viewer(stream))
+    return response
+
+@views.route('/api/stream/<stream_id>', methods=['DELETE'])
+def close_stream(stream_id):
+    if not stream_hub.close(stream_id):
+        return jsonify({'error': 'Unknown or expired stream'}), 404
+    return jsonify({'success': True})
+
+# Symptoms waiting for their streamed answer travel in the signed session cookie under a one-time
+# token: they stay out of the stream URL (and so out of access logs), and any worker can read them
+PENDING_SYMPTOMS_MAX_CHARS = 2000  # Longer descriptions are answered without streaming (cookie size)
+PENDING_SYMPTOMS_MAX_ENTRIES = 3
+
+def _add_pending_symptoms(symptoms):
+    token = uuid.uuid4().hex
+    pending = session.get('pending_symptoms', [])[-(PENDING_SYMPTOMS_MAX_ENTRIES - 1):]
+    session['pending_symptoms'] = pending + [[token, symptoms]]
+    return token
+
+def _pop_pending_symptoms(token):
+    pending = session.get('pending_symptoms', [])
+    for entry in pending:
+        if entry[0] == token:
+            session['pending_symptoms'] = [other for other in pending if other is not entry]
+            return entry[1]
+    return None
 
 # Route to handle symptoms-based text detection using LLM API
-@app.route('/text-detection', methods=['POST'])
+@views.route('/text-detection', methods=['POST'])
 def text_detection():
     if 'text_input' not in request.form or not request.form['text_input']:
         flash('Please enter symptoms for analysis', 'warning')
-        return redirect(url_for('home'))
+        return redirect(url_for('.home'))
     
     user_input = request.form['text_input']
     
+    if Config.LLM_STREAMING and len(user_input) <= PENDING_SYMPTOMS_MAX_CHARS:
+        # The page renders at once and fills in the answer from /api/text-detection/stream/<token>
+        return render_template('result.html', uploaded_text=user_input,
+                               stream_url=url_for('.text_detection_stream', token=_add_pending_symptoms(user_input)))
+    
     try:
+        # Network failures and timeouts come back as a fallback answer rather than an exception
         result = detect_disease(user_input)
-        return render_template('result.html', result=result, uploaded_text=user_input)
-    except requests.exceptions.RequestException as e:
-        # Handle connection errors
-        print(f"Network error during text detection: {e}")
-        traceback.print_exc()
-        flash('Network error: Could not connect to the disease detection service. Please check your internet connection and try again.', 'danger')
-        return render_template('result.html', 
-                              result="Error: Network connection failed. The API service may be unavailable.", 
-                              uploaded_text=user_input)
+        return render_template('result.html', result=result, uploaded_text=user_input,
+                               degraded=is_degraded(result))
     except Exception as e:
         # Handle all other errors
         print(f"Error in text detection: {e}")
@@ -292,7 +974,7 @@ def text_detection():
                               uploaded_text=user_input)
 
 # API endpoint for text-based disease detection (returns JSON)
-@app.route('/api/text-detection', methods=['POST'])
+@views.route('/api/text-detection', methods=['POST'])
 def api_text_detection():
     data = request.get_json()
     if not data or 'symptoms' not in data:
@@ -303,11 +985,69 @@ def api_text_detection():
     
     return jsonify({
         'success': True,
-        'result': result
+        'result': result,
+        'degraded': is_degraded(result)  # A cached or canned answer served while Gemini is unavailable
     })
 
+def _stream_llm_events(pieces, on_complete=None):
+    """
+    Server-Sent Events for an answer generated piece by piece: 'chunk' events,
+    then 'done' (with degraded set when a fallback answer was served) or 'error'.
+    on_complete only ever sees a whole answer; an error part-way skips it.
+    """
+    start = time.perf_counter()
+    first_byte = None
+    text = []
+    degraded = False
+    try:
+        for piece in pieces:
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            degraded = degraded or is_degraded(piece)
+            text.append(piece)
+            yield f"event: chunk\ndata: {json.dumps({'text': piece})}\n\n"
+    except Exception as e:
+        print(f"Error streaming disease information: {e}")
+        # incomplete: the chunks already sent are only the start of an answer
+        yield f"event: error\ndata: {json.dumps({'message': str(e), 'incomplete': bool(text)})}\n\n"
+        return
+    result = ''.join(text)
+    if on_complete is not None and not degraded and not is_fallback_response(result):
+        on_complete(result)
+    yield "event: done\ndata: " + json.dumps({
+        'ttfb_ms': round(first_byte * 1000.0, 1) if first_byte is not None else None,
+        'total_ms': round((time.perf_counter() - start) * 1000.0, 1),
+        'degraded': degraded
+    }) + "\n\n"
+
+def _sse_response(events):
+    return Response(events, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Streaming answer for a symptom description (used by result.html)
+@views.route('/api/text-detection/stream/<token>')
+def text_detection_stream(token):
+    symptoms = _pop_pending_symptoms(token)
+    if not symptoms:
+        return jsonify({'error': 'Unknown or already answered symptom description'}), 404
+    return _sse_response(_stream_llm_events(stream_disease(symptoms)))
+
+# Streaming detail text for a predicted disease class (upload flow, knowledge cache miss)
+@views.route('/api/disease-info/stream/<disease_name>')
+def disease_info_stream(disease_name):
+    if disease_name not in class_names:
+        return jsonify({'error': 'Unknown disease class'}), 404
+    if Config.KNOWLEDGE_CACHE_ENABLED:
+        cached = disease_knowledge.get(disease_name, fetch_on_miss=False)
+        if cached is not None:
+            return _sse_response(_stream_llm_events(iter([cached])))
+    # The streamed answer is kept so the next upload of this class renders at once
+    on_complete = (lambda text: disease_knowledge.put(disease_name, text)) if Config.KNOWLEDGE_CACHE_ENABLED else None
+    pieces = stream_disease(disease_info_prompt(disease_name), use_cache=False)
+    return _sse_response(_stream_llm_events(pieces, on_complete))
+
 # Route for downloading the model for offline use
-@app.route('/download-model')
+@views.route('/download-model')
 def download_model():
     """
     Download model endpoint that serves model.json and weight files directly 
@@ -372,61 +1112,85 @@ def fix_model_json_format(model_json):
     return fixed_json
 
 # Route to serve model files
-@app.route('/static/model/<path:filename>')
+@views.route('/static/model/<path:filename>')
 def serve_model(filename):
     """Explicitly serve files from the model directory"""
-    return send_from_directory(os.path.join(app.root_path, 'static', 'model'), filename)
+    return send_from_directory(os.path.join(current_app.root_path, 'static', 'model'), filename)
 
 # Route to serve binary model weight files
-@app.route('/static/model/tfjs_model/weights/<path:filename>')
+@views.route('/static/model/tfjs_model/weights/<path:filename>')
 def serve_model_weights(filename):
     """Serve binary weight files with correct MIME type"""
-    weights_path = os.path.join(app.root_path, 'static', 'model', 'tfjs_model', 'weights')
+    weights_path = os.path.join(current_app.root_path, 'static', 'model', 'tfjs_model', 'weights')
     # Use application/octet-stream for binary files
     return send_from_directory(weights_path, filename, mimetype='application/octet-stream')
 
 # Special route for metadata.json with correct MIME type
-@app.route('/static/model/metadata.json')
+@views.route('/static/model/metadata.json')
 def serve_metadata():
     """Explicitly serve metadata.json with correct MIME type"""
     return send_from_directory(
-        os.path.join(app.root_path, 'static', 'model'), 
+        os.path.join(current_app.root_path, 'static', 'model'), 
         'metadata.json', 
         mimetype='application/json'
     )
 
 # Special route for classes.json with correct MIME type
-@app.route('/static/model/classes.json')
+@views.route('/static/model/classes.json')
 def serve_classes():
     """Explicitly serve classes.json with correct MIME type"""
     return send_from_directory(
-        os.path.join(app.root_path, 'static', 'model'), 
+        os.path.join(current_app.root_path, 'static', 'model'), 
         'classes.json', 
         mimetype='application/json'
     )
 
 # Route to serve nested model files in tfjs_model directory
-@app.route('/static/model/tfjs_model/<path:filename>')
+@views.route('/static/model/tfjs_model/<path:filename>')
 def serve_tfjs_model(filename):
     """Explicitly serve files from the tfjs_model directory"""
-    return send_from_directory(os.path.join(app.root_path, 'static', 'model', 'tfjs_model'), filename)
+    return send_from_directory(os.path.join(current_app.root_path, 'static', 'model', 'tfjs_model'), filename)
 
 # Route to serve nested model files in saved_model directory
-@app.route('/static/model/saved_model/<path:filename>')
+@views.route('/static/model/saved_model/<path:filename>')
 def serve_saved_model(filename):
     """Explicitly serve files from the saved_model directory"""
-    return send_from_directory(os.path.join(app.root_path, 'static', 'model', 'saved_model'), filename)
+    return send_from_directory(os.path.join(current_app.root_path, 'static', 'model', 'saved_model'), filename)
 
 # Status route to check if TensorFlow is available
-@app.route('/status')
+@views.route('/status')
 def status():
+    warmup = warmup_stats()
     return jsonify({
+        'ready': bool(warmup and warmup['ready']),
+        'warmup': warmup,
         'tensorflow_available': TENSORFLOW_AVAILABLE,
-        'offline_mode_recommended': not TENSORFLOW_AVAILABLE
+        'inference_available': INFERENCE_AVAILABLE,
+        'inference_backend': active_backend(),
+        'offline_mode_recommended': not INFERENCE_AVAILABLE,
+        'model_version': model_version_stats(),
+        'inference_mode': Config.INFERENCE_MODE,
+        'inference_pool': inference_client().stats() if inference_client and Config.INFERENCE_MODE == 'pool' else None,
+        'cpu_budget': budget_stats(),
+        'model_registry': model_registry.stats(),
+        'cascade': cascade.stats() if cascade and Config.CASCADE_ENABLED else None,
+        'batching': batch_scheduler.stats() if batch_scheduler and Config.INFERENCE_BATCHING else None,
+        'prediction_cache': prediction_cache.stats() if Config.PREDICTION_CACHE_ENABLED else None,
+        'near_duplicates': near_duplicate_index.stats() if Config.NEAR_DUPLICATE_ENABLED else None,
+        'decode': decode_stats(),
+        'quality_gate': quality_gate.stats() if Config.QUALITY_GATE_ENABLED else None,
+        'jobs': prediction_jobs.stats(),
+        'streams': stream_hub.stats(),
+        'similarity': {version: index.stats() for version, index in list(similarity_indexes.items())},
+        'disease_knowledge': disease_knowledge.stats() if Config.KNOWLEDGE_CACHE_ENABLED else None,
+        'semantic_cache': semantic_cache.stats() if Config.SEMANTIC_CACHE_ENABLED else None,
+        'llm_latency': latency_stats(),
+        'llm_single_flight': single_flight.stats() if Config.LLM_SINGLE_FLIGHT else None,
+        'llm_client': client_stats()
     })
 
 # API route for user verification and session management
-@app.route('/api/auth/verify', methods=['POST'])
+@views.route('/api/auth/verify', methods=['POST'])
 def verify_firebase_auth():
     """Verify Firebase token and create/update user in database"""
     data = request.get_json()
@@ -472,8 +1236,45 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# API endpoint for similar past cases (nearest neighbours in the model's embedding space)
+@views.route('/api/detections/<int:detection_id>/similar')
+def similar_detections(detection_id):
+    detection = DiseaseDetection.query.get_or_404(detection_id)
+    if not embeddings_available():
+        return jsonify({'success': False, 'message': 'Similar-case search is not enabled on this server.'}), 503
+
+    k = min(max(request.args.get('k', 10, type=int), 1), 100)
+    index = similarity_index()
+    row = index.row_of(detection_id)
+    if row is None:
+        return jsonify({
+            'success': False,
+            'message': 'No embedding is stored for this detection under the current model version.'
+        }), 404
+
+    start = time.perf_counter()
+    # Ask for one extra match in case the detection was embedded more than once
+    matches = [(i, s) for i, s in index.search(index.vector(row), k=k + 1, exclude_row=row) if i != detection_id][:k]
+    query_ms = (time.perf_counter() - start) * 1000.0
+    found = {d.id: d for d in DiseaseDetection.query.filter(DiseaseDetection.id.in_([i for i, _ in matches]))}
+    return jsonify({
+        'success': True,
+        'detection_id': detection_id,
+        'disease_name': detection.disease_name,
+        'query_ms': round(query_ms, 2),
+        'similar': [{
+            'detection_id': match_id,
+            'similarity': round(similarity, 4),
+            'disease_name': found[match_id].disease_name,
+            'confidence': found[match_id].confidence,
+            'image_path': found[match_id].image_path,
+            'status': found[match_id].status,
+            'detected_at': found[match_id].detected_at.isoformat() if found[match_id].detected_at else None
+        } for match_id, similarity in matches if match_id in found]
+    })
+
 # API endpoint for weather data
-@app.route('/api/weather/<field_id>')
+@views.route('/api/weather/<field_id>')
 def get_field_weather(field_id):
     field = Field.query.get_or_404(field_id)
     
@@ -492,7 +1293,7 @@ def get_field_weather(field_id):
     })
 
 # API endpoint for field sensor data
-@app.route('/api/sensors/<field_id>')
+@views.route('/api/sensors/<field_id>')
 def get_field_sensors(field_id):
     field = Field.query.get_or_404(field_id)
     
@@ -564,7 +1365,7 @@ def get_field_sensors(field_id):
     })
 
 # API endpoint for disease tracking
-@app.route('/api/diseases/<field_id>')
+@views.route('/api/diseases/<field_id>')
 def get_field_diseases(field_id):
     field = Field.query.get_or_404(field_id)
     
@@ -631,7 +1432,7 @@ def get_field_diseases(field_id):
     })
 
 # API Routes for Dashboard Data
-@app.route('/api/weather/<field_id>')
+@views.route('/api/weather/<field_id>')
 def get_weather_data_api(field_id):
     """API endpoint to get weather data for a specific field"""
     try:
@@ -672,7 +1473,7 @@ def get_weather_data_api(field_id):
             'weather': weather_data
         })
     except Exception as e:
-        app.logger.error(f"Error getting weather data: {str(e)}")
+        current_app.logger.error(f"Error getting weather data: {str(e)}")
         return jsonify({
             'success': False,
             'error': 'Failed to retrieve weather data',
@@ -680,7 +1481,7 @@ def get_weather_data_api(field_id):
         }), 500
 
 
-@app.route('/api/sensors/<field_id>')
+@views.route('/api/sensors/<field_id>')
 def get_sensor_data_api(field_id):
     """API endpoint to get sensor data for a specific field"""
     try:
@@ -766,7 +1567,7 @@ def get_sensor_data_api(field_id):
             'health_status': health_status
         })
     except Exception as e:
-        app.logger.error(f"Error getting sensor data: {str(e)}")
+        current_app.logger.error(f"Error getting sensor data: {str(e)}")
         return jsonify({
             'success': False,
             'error': 'Failed to retrieve sensor data',
@@ -774,7 +1575,7 @@ def get_sensor_data_api(field_id):
         }), 500
 
 
-@app.route('/api/diseases/<field_id>')
+@views.route('/api/diseases/<field_id>')
 def get_disease_data_api(field_id):
     """API endpoint to get disease detection data for a specific field"""
     try:
@@ -862,7 +1663,7 @@ def get_disease_data_api(field_id):
             'stats': stats
         })
     except Exception as e:
-        app.logger.error(f"Error getting disease data: {str(e)}")
+        current_app.logger.error(f"Error getting disease data: {str(e)}")
         return jsonify({
             'success': False,
             'error': 'Failed to retrieve disease data',
@@ -870,7 +1671,7 @@ def get_disease_data_api(field_id):
         }), 500
 
 # Direct dashboard access for testing purposes
-@app.route('/test-dashboard')
+@views.route('/test-dashboard')
 def test_dashboard():
     """Direct access to dashboard template for testing"""
     # Use hardcoded Firebase configuration directly
@@ -890,7 +1691,7 @@ def test_dashboard():
                           direct_access=True)
 
 # Mock weather API endpoint
-@app.route('/api/weather/<int:field_id>')
+@views.route('/api/weather/<int:field_id>')
 def weather_api(field_id):
     """API endpoint for weather data"""
     try:
@@ -956,7 +1757,7 @@ def weather_api(field_id):
 
 
 # Mock sensors API endpoint
-@app.route('/api/sensors/<int:field_id>')
+@views.route('/api/sensors/<int:field_id>')
 def sensors_api(field_id):
     """API endpoint for sensor data"""
     try:
@@ -1016,7 +1817,7 @@ def sensors_api(field_id):
 
 
 # Mock diseases API endpoint
-@app.route('/api/diseases/<int:field_id>')
+@views.route('/api/diseases/<int:field_id>')
 def diseases_api(field_id):
     """API endpoint for disease detection data"""
     try:
@@ -1092,7 +1893,66 @@ def diseases_api(field_id):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/config/geoapify')
+@views.cli.command('backfill-image-hashes')
+def backfill_image_hashes():
+    """Compute perceptual hashes for stored detections whose image is on disk but not yet hashed."""
+    detections = DiseaseDetection.query.filter(DiseaseDetection.image_hash.is_(None),
+                                               DiseaseDetection.image_path.isnot(None)).all()
+    updated = 0
+    for detection in detections:
+        path = os.path.join(current_app.config['UPLOAD_FOLDER'], detection.image_path)
+        if not os.path.exists(path):
+            continue
+        try:
+            with open(path, 'rb') as f:
+                detection.image_hash = hash_to_hex(dhash(load_image_bytes(f.read())))
+            updated += 1
+        except Exception as e:
+            print(f"Could not hash {path}: {e}")
+    db.session.commit()
+    print(f"Hashed {updated} of {len(detections)} detections")
+
+@views.cli.command('backfill-embeddings')
+def backfill_embeddings():
+    """Embed stored detections whose image is on disk but not yet in the served model's similarity index."""
+    if not embeddings_available():
+        print("Embeddings are not available (EMBEDDINGS_ENABLED is off, pool mode, or no inference backend)")
+        return
+    index = similarity_index()
+    indexed = index.indexed_ids()
+    rows = db.session.query(DiseaseDetection.id, DiseaseDetection.image_path) \
+        .filter(DiseaseDetection.image_path.isnot(None)).all()
+    pending = [(detection_id, os.path.join(current_app.config['UPLOAD_FOLDER'], image_path))
+               for detection_id, image_path in rows if detection_id not in indexed]
+    pending = [(detection_id, path) for detection_id, path in pending if os.path.exists(path)]
+    added = 0
+    for start in range(0, len(pending), Config.BATCH_PREDICT_CHUNK_SIZE):
+        ids, arrays = [], []
+        for detection_id, path in pending[start:start + Config.BATCH_PREDICT_CHUNK_SIZE]:
+            try:
+                with open(path, 'rb') as f:
+                    arrays.append(load_image_bytes(f.read()))
+                ids.append(detection_id)
+            except Exception as e:
+                print(f"Could not read {path}: {e}")
+        if ids:
+            version, vectors = embed_images(np.stack(arrays))
+            similarity_index(version).append(ids, vectors)
+            added += len(ids)
+    print(f"Embedded {added} of {len(rows)} detections")
+    if len(index) >= Config.SIMILARITY_EXACT_BELOW:
+        index.train()
+
+@views.cli.command('prewarm-knowledge')
+@click.option('--force', is_flag=True, help='Refetch every class, not just missing or stale ones.')
+def prewarm_knowledge(force):
+    """Fetch the Gemini detail text for every disease class into the knowledge cache."""
+    start = time.perf_counter()
+    stored, failed = disease_knowledge.prewarm(class_names, force=force)
+    print(f"Stored {stored} entries ({failed} failed) in {time.perf_counter() - start:.1f}s; "
+          f"{disease_knowledge.stats()['entries']} of {len(class_names)} classes cached")
+
+@views.route('/api/config/geoapify')
 def get_geoapify_api_key():
     """Return the Geoapify API key for use in the frontend"""
     return jsonify({
@@ -1100,6 +1960,8 @@ def get_geoapify_api_key():
     })
 
 if __name__ == '__main__':
+    app = create_app()
+    
     # Create the model directory if it doesn't exist
     os.makedirs('static/model', exist_ok=True)
     
@@ -1107,9 +1969,14 @@ if __name__ == '__main__':
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     
     # Print status information
-    if not TENSORFLOW_AVAILABLE:
-        print("WARNING: TensorFlow is not available. Online image detection will not work.")
+    if not INFERENCE_AVAILABLE:
+        print("WARNING: No inference backend is available. Online image detection will not work.")
         print("Please use the offline mode with TensorFlow.js in the browser.")
+    elif not TENSORFLOW_AVAILABLE:
+        print("TensorFlow is not available. Online image detection uses the NumPy engine.")
+    
+    start_background_warmup()
+    os.environ.setdefault('WEB_CONCURRENCY', '1')  # The development server is a single process
     
     # Run the app on the assigned port or default to 5000
     port = int(os.environ.get("PORT", 5000))
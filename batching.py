@@ -0,0 +1,129 @@
+"""
+Dynamic micro-batching for model inference.
+
+Concurrent request threads submit their inputs to a shared scheduler. A single
+worker thread collects whatever is pending for up to max_wait_ms (or until
+max_batch_size rows are queued), runs one batched forward pass and hands each
+caller back its own rows of the result.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class _PendingRequest:
+    def __init__(self, inputs):
+        self.inputs = inputs
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class BatchScheduler:
+    """Collects pending inputs into batches and runs them through predict_fn."""
+
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=5.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._held = None  # A request that did not fit the previous batch
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._requests = 0
+        self._rows = 0
+        self._max_rows = 0
+        self._queue_delay_total = 0.0
+        self._queue_delay_max = 0.0
+
+    def submit(self, inputs, timeout=None):
+        """
+        Queue a batch of shape (N, H, W, C) and block until its predictions are ready.
+        Returns an array with one row of class probabilities per input row.
+        """
+        self._ensure_started()
+        request = _PendingRequest(np.asarray(inputs, dtype=np.float32))
+        self._queue.put(request)
+        return request.future.result(timeout=timeout)
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='batch-scheduler', daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        """Block for the first request, then gather more until the window or batch fills."""
+        pending = [self._held or self._queue.get()]
+        self._held = None
+        rows = len(pending[0].inputs)
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if rows + len(request.inputs) > self.max_batch_size:
+                # Starts the next batch, so no batch is larger than max_batch_size
+                self._held = request
+                break
+            pending.append(request)
+            rows += len(request.inputs)
+        return pending, rows
+
+    def _run(self):
+        while True:
+            pending, rows = self._collect()
+            started = time.perf_counter()
+            try:
+                if len(pending) == 1:
+                    batch = pending[0].inputs
+                else:
+                    batch = np.concatenate([request.inputs for request in pending])
+                predictions = self.predict_fn(batch)
+            except Exception as e:
+                for request in pending:
+                    request.future.set_exception(e)
+                continue
+
+            offset = 0
+            for request in pending:
+                count = len(request.inputs)
+                request.future.set_result(predictions[offset:offset + count])
+                offset += count
+
+            self._record(pending, rows, started)
+
+    def _record(self, pending, rows, started):
+        delays = [started - request.enqueued_at for request in pending]
+        with self._stats_lock:
+            self._batches += 1
+            self._requests += len(pending)
+            self._rows += rows
+            self._max_rows = max(self._max_rows, rows)
+            self._queue_delay_total += sum(delays)
+            self._queue_delay_max = max(self._queue_delay_max, max(delays))
+
+    def stats(self):
+        with self._stats_lock:
+            batches = self._batches
+            requests = self._requests
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'batches': batches,
+                'requests': requests,
+                'avg_batch_size': round(self._rows / batches, 2) if batches else 0.0,
+                'largest_batch': self._max_rows,
+                'avg_queue_delay_ms': round(self._queue_delay_total / requests * 1000.0, 3) if requests else 0.0,
+                'max_queue_delay_ms': round(self._queue_delay_max * 1000.0, 3),
+                'pending': self._queue.qsize()
+            }
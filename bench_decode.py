@@ -0,0 +1,68 @@
+"""
+Compare the old and new image decode paths used by /upload and /api/predict.
+
+before: save the upload to disk, then re-open the file and decode it at full
+        resolution before resizing to 128x128 (what keras load_img did)
+after:  decode the in-memory upload with JPEG draft mode (reduced DCT scale)
+
+Usage:
+    python bench_decode.py --images input_folder --repeat 5
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from main import load_image_array, load_image_bytes
+
+
+def time_per_image(fn, payloads, repeat):
+    timings = []
+    for _ in range(repeat):
+        for data in payloads:
+            start = time.perf_counter()
+            fn(data)
+            timings.append(time.perf_counter() - start)
+    return np.array(timings) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark save-then-reload vs in-memory draft decoding.')
+    parser.add_argument('--images', default='input_folder')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    names = sorted(f for f in os.listdir(args.images) if f.lower().endswith(('.png', '.jpg', '.jpeg')))
+    payloads = []
+    for name in names:
+        with open(os.path.join(args.images, name), 'rb') as f:
+            payloads.append(f.read())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'upload.jpg')
+
+        def save_then_reload(data):
+            with open(path, 'wb') as f:
+                f.write(data)
+            return load_image_array(path, draft=False)
+
+        results = [
+            ('before: save + full decode', time_per_image(save_then_reload, payloads, args.repeat)),
+            ('in-memory full decode', time_per_image(lambda d: load_image_bytes(d, draft=False), payloads, args.repeat)),
+            ('after: in-memory draft decode', time_per_image(lambda d: load_image_bytes(d, draft=True), payloads, args.repeat)),
+        ]
+
+    total_mb = sum(len(p) for p in payloads) / (1024 * 1024)
+    print(f"{len(payloads)} images ({total_mb:.1f} MB), {args.repeat} passes\n")
+    print(f"{'path':<32}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for label, timings in results:
+        print(f"{label:<32}{timings.mean():>10.2f}{np.percentile(timings, 50):>10.2f}{np.percentile(timings, 99):>10.2f}")
+    speedup = results[0][1].mean() / results[-1][1].mean()
+    print(f"\nSpeed-up of the new path: {speedup:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Size web workers and inference replicas for INFERENCE_MODE=pool.
+
+For every replica count, starts inference_server.py, then drives it from a
+number of client processes (standing in for gunicorn workers) that each send
+single-image requests from several threads. Reports throughput, p50/p99
+latency and the memory held by the replicas. With --local, the same client
+counts are also run with the model loaded in every client process (the
+INFERENCE_MODE=local layout) for comparison.
+
+Usage:
+    python bench_inference_pool.py --replicas 1 2 4 --clients 2 4 8 --requests 200
+    python bench_inference_pool.py --replicas 2 --clients 4 --local
+"""
+
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from config import Config
+from model_registry import current_rss_bytes
+
+
+def _process_tree_rss_mb(root_pid):
+    """Sum the resident memory of root_pid and all of its descendants (Linux /proc)."""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+                children.setdefault(ppid, []).append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+    total, stack = 0, [root_pid]
+    while stack:
+        pid = stack.pop()
+        try:
+            with open(f'/proc/{pid}/statm') as f:
+                total += int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except OSError:
+            pass
+        stack.extend(children.get(pid, []))
+    return total / (1024 * 1024)
+
+
+def _client(mode, address, threads, requests, results):
+    """One stand-in web worker: `threads` threads share `requests` single-image predictions."""
+    image = (np.random.rand(1, 128, 128, 3) * 255).astype(np.float32)
+    if mode == 'pool':
+        from inference_server import InferenceClient
+        predict = InferenceClient(address).predict
+    else:
+        from main import get_model
+        predict = get_model().predict
+    predict(image)
+
+    latencies = []
+    counter = iter(range(requests))
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    return
+            start = time.perf_counter()
+            predict(image)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    # Wall-clock window after warm-up, so model loading is not counted as serving time
+    started = time.time()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put((latencies, started, time.time(), current_rss_bytes() / (1024 * 1024)))
+
+
+def run_clients(mode, address, clients, threads, requests):
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    processes = [context.Process(target=_client, args=(mode, address, threads, requests // clients, results))
+                 for _ in range(clients)]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    elapsed = max(end for _, _, end, _ in collected) - min(start for _, start, _, _ in collected)
+    latencies = np.concatenate([np.array(lat) for lat, _, _, _ in collected]) * 1000.0
+    client_rss = sum(rss for _, _, _, rss in collected)
+    return len(latencies) / elapsed, latencies, client_rss
+
+
+def wait_for_server(address, timeout=120.0):
+    from inference_server import InferenceClient
+
+    deadline = time.time() + timeout
+    image = np.zeros((1, 128, 128, 3), dtype=np.float32)
+    while time.time() < deadline:
+        if os.path.exists(address):
+            try:
+                InferenceClient(address, timeout=timeout).predict(image)
+                return
+            except (OSError, EOFError):
+                pass
+        time.sleep(0.5)
+    raise TimeoutError('Inference server did not come up')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark web worker / inference replica sizing.')
+    parser.add_argument('--replicas', type=int, nargs='+', default=[1, 2])
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=4, help='Request threads per client process')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per configuration')
+    parser.add_argument('--local', action='store_true', help='Also benchmark a model copy per client (INFERENCE_MODE=local)')
+    args = parser.parse_args()
+
+    print(f"{'mode':<8}{'replicas':>9}{'clients':>9}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'model RSS MB':>14}")
+
+    def report(mode, replicas, clients, throughput, latencies, rss):
+        print(f"{mode:<8}{replicas:>9}{clients:>9}{throughput:>9.1f}{np.percentile(latencies, 50):>9.2f}"
+              f"{np.percentile(latencies, 99):>9.2f}{rss:>14.0f}")
+
+    for replicas in args.replicas:
+        address = os.path.join(tempfile.mkdtemp(), 'inference.sock')
+        server = subprocess.Popen([sys.executable, 'inference_server.py', '--address', address,
+                                   '--replicas', str(replicas)],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_server(address)
+            replica_rss = _process_tree_rss_mb(server.pid)
+            for clients in args.clients:
+                throughput, latencies, _ = run_clients('pool', address, clients, args.threads, args.requests)
+                report('pool', replicas, clients, throughput, latencies, replica_rss)
+        finally:
+            server.terminate()
+            server.wait()
+
+    if args.local:
+        for clients in args.clients:
+            throughput, latencies, client_rss = run_clients('local', None, clients, args.threads, args.requests)
+            report('local', '-', clients, throughput, latencies, client_rss)
+
+
+if __name__ == '__main__':
+    main()
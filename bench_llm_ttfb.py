@@ -0,0 +1,79 @@
+"""
+Time to first byte of a symptom answer, blocking vs streaming.
+
+blocking:  POST /api/text-detection; nothing arrives until the whole answer is ready
+streaming: POST /text-detection renders the page, then its stream URL is read;
+           time to the first 'chunk' event and to 'done'
+
+Each query gets a random suffix so the semantic cache does not answer it.
+Run against a running server with a reachable Gemini API.
+
+Usage:
+    python bench_llm_ttfb.py --url http://localhost:5000 --repeat 5
+"""
+
+import argparse
+import re
+import time
+import uuid
+
+import numpy as np
+import requests
+
+QUERIES = [
+    "Yellow spots with brown centres on the lower tomato leaves",
+    "White powdery coating on squash leaves",
+    "Dark concentric rings on potato leaves after heavy rain",
+]
+
+
+def blocking(url, symptoms):
+    start = time.perf_counter()
+    response = requests.post(f"{url}/api/text-detection", json={'symptoms': symptoms}, stream=True, timeout=120)
+    next(response.iter_content(chunk_size=1))
+    first_byte = time.perf_counter() - start
+    response.content
+    return first_byte, time.perf_counter() - start
+
+
+def streaming(url, symptoms):
+    start = time.perf_counter()
+    first_chunk = None
+    # The page hands the symptoms to the stream through the session cookie, so keep one session
+    client = requests.Session()
+    page = client.post(f"{url}/text-detection", data={'text_input': symptoms}, timeout=120)
+    match = re.search(r'data-stream-url="([^"]+)"', page.text)
+    if match is None:
+        raise SystemExit('The result page has no stream URL; is LLM_STREAMING enabled on the server?')
+    with client.get(url + match.group(1), stream=True, timeout=120) as response:
+        for line in response.iter_lines():
+            if line.startswith(b'event: chunk') and first_chunk is None:
+                first_chunk = time.perf_counter() - start
+            elif line.startswith(b'event: done') or line.startswith(b'event: error'):
+                break
+    return first_chunk, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare blocking and streaming time to first byte.')
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for name, run in (('blocking', blocking), ('streaming', streaming)):
+        first, total = [], []
+        for i in range(args.repeat):
+            symptoms = f"{QUERIES[i % len(QUERIES)]} (sample {uuid.uuid4().hex[:8]})"
+            ttfb, elapsed = run(args.url, symptoms)
+            if ttfb is not None:
+                first.append(ttfb * 1000.0)
+            total.append(elapsed * 1000.0)
+        if not first:
+            print(f"{name:>9}: no answer text received")
+            continue
+        print(f"{name:>9}: first byte p50 {np.percentile(first, 50):7.0f} ms, "
+              f"complete p50 {np.percentile(total, 50):7.0f} ms over {len(total)} requests")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Per-call overhead of the Keras serving paths.
+
+predict:      model.predict(batch) (the original path)
+eager call:   model(batch, training=False)
+tf.function:  the fixed-signature serving function used by main.py
+tf.function + XLA: the same, compiled with jit_compile=True
+
+Each path is warmed up on every batch size before timing.
+
+Usage:
+    python bench_serving.py --model model.h5 --batch-sizes 1 8 32 --repeat 200
+"""
+
+import argparse
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from config import Config
+from main import IMAGE_SIZE
+
+
+def serving_function(model, jit_compile):
+    @tf.function(input_signature=[tf.TensorSpec([None, IMAGE_SIZE[0], IMAGE_SIZE[1], 3], tf.float32)],
+                 jit_compile=jit_compile)
+    def serve(batch):
+        return model(batch, training=False)
+
+    return lambda batch: serve(tf.convert_to_tensor(batch, dtype=tf.float32)).numpy()
+
+
+def time_calls(fn, batch, repeat):
+    fn(batch)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(batch)
+        timings.append(time.perf_counter() - start)
+    return np.array(timings) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare model.predict with the compiled serving function.')
+    parser.add_argument('--model', default=Config.MODEL_PATH)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--no-xla', action='store_true', help='Skip the XLA-compiled variant')
+    args = parser.parse_args()
+
+    model = tf.keras.models.load_model(args.model)
+    paths = [
+        ('predict', lambda batch: model.predict(batch, verbose=0)),
+        ('eager call', lambda batch: model(batch, training=False).numpy()),
+        ('tf.function', serving_function(model, jit_compile=False)),
+    ]
+    if not args.no_xla:
+        paths.append(('tf.function + XLA', serving_function(model, jit_compile=True)))
+
+    print(f"{'path':<20}{'batch':>6}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'speed-up':>10}")
+    for size in args.batch_sizes:
+        batch = (np.random.rand(size, IMAGE_SIZE[0], IMAGE_SIZE[1], 3) * 255).astype(np.float32)
+        baseline = None
+        for name, fn in paths:
+            timings = time_calls(fn, batch, args.repeat)
+            baseline = baseline or timings.mean()
+            print(f"{name:<20}{size:>6}{timings.mean():>10.3f}{np.percentile(timings, 50):>10.3f}"
+                  f"{np.percentile(timings, 99):>10.3f}{baseline / timings.mean():>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Sweep TensorFlow thread budgets and CPU pinning.
+
+For every combination of worker processes, intra-op threads, inter-op threads
+and affinity, fresh worker processes are started with those settings (they
+can only be applied before TensorFlow initialises). Each worker loads the
+model and classifies the images in input_folder from several request threads,
+as a web worker would. Prints aggregate throughput and p50/p99 latency per
+combination.
+
+Usage:
+    python bench_threads.py --workers 1 2 4 --intra 1 2 auto 0 --inter 1 2 --affinity none auto
+"""
+
+import argparse
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+
+import numpy as np
+
+
+def _worker(env, index, images_dir, threads, requests, results):
+    # Settings must be in the environment before config (and TensorFlow) are imported
+    os.environ.update(env)
+    os.environ['WORKER_INDEX'] = str(index)
+    # Pinned at process start, as gunicorn's post_fork does for web workers
+    from cpu_budget import apply_cpu_affinity
+    apply_cpu_affinity(index)
+    from main import get_model, load_image_array
+
+    names = sorted(f for f in os.listdir(images_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg')))
+    images = [load_image_array(os.path.join(images_dir, f))[np.newaxis] for f in names]
+    predict = get_model().predict
+    for image in images:
+        predict(image)
+
+    latencies = []
+    lock = threading.Lock()
+    counter = itertools.count()
+
+    def run():
+        while True:
+            i = next(counter)
+            if i >= requests:
+                return
+            start = time.perf_counter()
+            predict(images[i % len(images)])
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    pool = [threading.Thread(target=run) for _ in range(threads)]
+    started = time.time()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put((latencies, started, time.time()))
+
+
+def run_combination(workers, intra, inter, affinity, args):
+    env = {
+        'WEB_CONCURRENCY': str(workers),
+        'INFERENCE_MODE': 'local',
+        'TF_INTRA_OP_THREADS': str(intra),
+        'TF_INTER_OP_THREADS': str(inter),
+        'CPU_AFFINITY': affinity,
+        'WARMUP_BATCH_SIZES': '1',
+        'MODEL_WATCH_SECONDS': '0'
+    }
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    processes = [context.Process(target=_worker,
+                                 args=(env, i, args.images, args.threads, args.requests // workers, results))
+                 for i in range(workers)]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    latencies = np.concatenate([np.array(lat) for lat, _, _ in collected]) * 1000.0
+    elapsed = max(end for _, _, end in collected) - min(start for _, start, _ in collected)
+    return len(latencies) / elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep TF intra/inter-op threads and CPU affinity.')
+    parser.add_argument('--images', default='input_folder')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2])
+    parser.add_argument('--intra', nargs='+', default=['0', '1', 'auto'], help="Thread counts, 'auto' or 0 (TF default)")
+    parser.add_argument('--inter', nargs='+', default=['0', '1'])
+    parser.add_argument('--affinity', nargs='+', default=['none', 'auto'])
+    parser.add_argument('--threads', type=int, default=4, help='Request threads per worker')
+    parser.add_argument('--requests', type=int, default=400, help='Requests per combination (split across workers)')
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs; {args.requests} single-image requests per combination, "
+          f"{args.threads} request threads per worker\n")
+    print(f"{'workers':>8}{'intra':>7}{'inter':>7}{'affinity':>10}{'img/s':>9}{'p50 ms':>9}{'p99 ms':>9}")
+    for workers, intra, inter, affinity in itertools.product(args.workers, args.intra, args.inter, args.affinity):
+        throughput, latencies = run_combination(workers, intra, inter, affinity, args)
+        print(f"{workers:>8}{intra:>7}{inter:>7}{affinity:>10}{throughput:>9.1f}"
+              f"{np.percentile(latencies, 50):>9.2f}{np.percentile(latencies, 99):>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
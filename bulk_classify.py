@@ -0,0 +1,186 @@
+"""
+Bulk offline classification of an image folder.
+
+Decodes images on a thread pool ahead of the model (so decode and inference
+overlap), runs them in batches, appends results to a CSV or JSONL file and
+records every processed file in a checkpoint so an interrupted run can resume.
+
+Usage:
+    python bulk_classify.py --input input_folder --output results.csv
+    python bulk_classify.py --input /archive --output results.jsonl --batch-size 64 --workers 8
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from config import Config
+from main import INFERENCE_AVAILABLE, class_names, load_image_bytes, predict_probabilities
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+def find_images(input_folder, recursive=False):
+    """Return image paths relative to input_folder, in a stable order."""
+    if not recursive:
+        return sorted(f for f in os.listdir(input_folder) if f.lower().endswith(IMAGE_EXTENSIONS))
+    found = []
+    for root, _, files in os.walk(input_folder):
+        for f in files:
+            if f.lower().endswith(IMAGE_EXTENSIONS):
+                found.append(os.path.relpath(os.path.join(root, f), input_folder))
+    return sorted(found)
+
+
+def load_checkpoint(path):
+    """Return the set of files already processed by a previous run."""
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {line.rstrip('\n') for line in f if line.strip()}
+
+
+def decode_file(path):
+    with open(path, 'rb') as f:
+        return load_image_bytes(f.read())
+
+
+def prefetch(paths, input_folder, executor, depth):
+    """Yield (name, array, error) in order while keeping up to depth decodes in flight."""
+    def task(name):
+        try:
+            return name, decode_file(os.path.join(input_folder, name)), None
+        except Exception as e:
+            return name, None, str(e)
+
+    in_flight = deque()
+    for name in paths:
+        in_flight.append(executor.submit(task, name))
+        if len(in_flight) >= depth:
+            yield in_flight.popleft().result()
+    while in_flight:
+        yield in_flight.popleft().result()
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class ResultWriter:
+    """Appends result rows as CSV or JSONL."""
+
+    FIELDS = ['file', 'disease', 'confidence', 'confident', 'error']
+
+    def __init__(self, path, fmt):
+        self.fmt = fmt
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'a', newline='')
+        if fmt == 'csv':
+            self.writer = csv.DictWriter(self.file, fieldnames=self.FIELDS)
+            if is_new:
+                self.writer.writeheader()
+
+    def write(self, row):
+        if self.fmt == 'csv':
+            self.writer.writerow(row)
+        else:
+            self.file.write(json.dumps(row) + '\n')
+
+    def flush(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+
+def run(args):
+    paths = find_images(args.input, recursive=args.recursive)
+    checkpoint_path = args.checkpoint or args.output + '.checkpoint'
+    done = load_checkpoint(checkpoint_path)
+    pending = [p for p in paths if p not in done]
+    print(f"Found {len(paths)} images, {len(done)} already processed, {len(pending)} to go")
+    if not pending:
+        return 0
+
+    fmt = args.format or ('jsonl' if args.output.endswith(('.jsonl', '.ndjson')) else 'csv')
+    writer = ResultWriter(args.output, fmt)
+    processed = 0
+    start = time.perf_counter()
+    last_report = start
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor, open(checkpoint_path, 'a') as checkpoint:
+        decoded = prefetch(pending, args.input, executor, depth=args.batch_size * 2)
+        for batch in batched(decoded, args.batch_size):
+            arrays = [array for _, array, error in batch if error is None]
+            predictions = iter(predict_probabilities(np.stack(arrays)) if arrays else [])
+            for name, array, error in batch:
+                if error is not None:
+                    writer.write({'file': name, 'disease': None, 'confidence': None, 'confident': False, 'error': error})
+                    continue
+                probabilities = next(predictions)
+                result_index = int(np.argmax(probabilities))
+                confidence = float(probabilities[result_index])
+                writer.write({
+                    'file': name,
+                    'disease': class_names[result_index],
+                    'confidence': round(confidence, 6),
+                    'confident': confidence > Config.MODEL_CONFIDENCE_THRESHOLD,
+                    'error': None
+                })
+
+            # Results must be durable before the files are marked done
+            writer.flush()
+            checkpoint.write(''.join(name + '\n' for name, _, _ in batch))
+            checkpoint.flush()
+
+            processed += len(batch)
+            now = time.perf_counter()
+            if now - last_report >= args.report_every:
+                print(f"{processed}/{len(pending)} images, {processed / (now - start):.1f} images/sec")
+                last_report = now
+
+    writer.close()
+    elapsed = time.perf_counter() - start
+    print(f"Classified {processed} images in {elapsed:.1f}s ({processed / elapsed:.1f} images/sec)")
+    print(f"Results written to {args.output}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Classify every image in a folder with the disease model.')
+    parser.add_argument('--input', default=os.path.join(os.getcwd(), 'input_folder'), help='Folder of images to classify')
+    parser.add_argument('--output', default='results.csv', help='Results file (.csv or .jsonl)')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help='Override the output format')
+    parser.add_argument('--checkpoint', help='Checkpoint file (default: <output>.checkpoint)')
+    parser.add_argument('--batch-size', type=int, default=32, help='Images per forward pass')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Decode threads')
+    parser.add_argument('--recursive', action='store_true', help='Include images in subfolders')
+    parser.add_argument('--report-every', type=float, default=10.0, help='Seconds between progress reports')
+    args = parser.parse_args(argv)
+
+    if not INFERENCE_AVAILABLE:
+        print("Error: No inference backend is available. Cannot make predictions.")
+        return 1
+    if not os.path.isdir(args.input):
+        print(f"Input folder not found: {args.input}")
+        return 1
+    return run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+Two-stage cascade classifier.
+
+Every image first goes through a cheap model (by default the small
+TensorFlow.js topology from simple_convert.py, run by the NumPy engine).
+Images whose top-1 probability clears the threshold exit there; only the
+uncertain ones are sent to the full model.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+
+class CascadeClassifier:
+    """Early-exit cascade of a cheap first stage and the full model."""
+
+    def __init__(self, first_stage, threshold=0.9):
+        self.first_stage = first_stage  # Callable returning the first-stage predict function
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.images = 0
+        self.exited_first = 0
+        self.escalated = 0
+        self._first_seconds = 0.0
+        self._second_seconds = 0.0
+
+    def predict(self, input_arr, full_predict):
+        """Return probabilities for a batch, running full_predict only on uncertain rows."""
+        start = time.perf_counter()
+        probabilities = np.asarray(self.first_stage()(input_arr), dtype=np.float32)
+        first_seconds = time.perf_counter() - start
+
+        uncertain = np.flatnonzero(probabilities.max(axis=1) < self.threshold)
+        second_seconds = 0.0
+        if len(uncertain):
+            start = time.perf_counter()
+            probabilities[uncertain] = full_predict(input_arr[uncertain])
+            second_seconds = time.perf_counter() - start
+
+        with self._lock:
+            self.images += len(input_arr)
+            self.escalated += len(uncertain)
+            self.exited_first += len(input_arr) - len(uncertain)
+            self._first_seconds += first_seconds
+            self._second_seconds += second_seconds
+        return probabilities
+
+    def stats(self):
+        with self._lock:
+            return {
+                'threshold': self.threshold,
+                'images': self.images,
+                'exited_first_stage': self.exited_first,
+                'escalated': self.escalated,
+                'first_stage_exit_fraction': round(self.exited_first / self.images, 3) if self.images else 0.0,
+                'first_stage_ms_per_image': round(self._first_seconds / self.images * 1000.0, 3) if self.images else 0.0,
+                'second_stage_ms_per_image': (round(self._second_seconds / self.escalated * 1000.0, 3)
+                                              if self.escalated else 0.0)
+            }
@@ -0,0 +1,83 @@
+"""
+Circuit breaker for calls to an external service.
+
+After failure_threshold consecutive failures the breaker opens and callers
+are refused at once (they serve a fallback instead of waiting on a service
+that is down). Once reset_seconds have passed it lets a single trial call
+through (half-open): success closes it again, failure reopens it.
+"""
+
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a half-open trial call."""
+
+    def __init__(self, failure_threshold=5, reset_seconds=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_started = None
+        self._lock = threading.Lock()
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+
+    def allow(self):
+        """Return True when a call may go ahead; False while the breaker is open."""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN and now - self._opened_at >= self.reset_seconds:
+                self.state = HALF_OPEN
+                self._trial_started = None
+            if self.state == HALF_OPEN:
+                # One trial call at a time; a trial that never reported back does not block forever
+                if self._trial_started is None or now - self._trial_started >= self.reset_seconds:
+                    self._trial_started = now
+                    return True
+            elif self.state == CLOSED:
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.successes += 1
+            self._failures = 0
+            self._trial_started = None
+            self.state = CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._failures += 1
+            self._trial_started = None
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.opened += 1
+                    print(f"Circuit breaker opened after {self._failures} consecutive failures")
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self._failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_seconds': self.reset_seconds,
+                'retry_in_seconds': (round(max(0.0, self.reset_seconds - (time.monotonic() - self._opened_at)), 1)
+                                     if self.state == OPEN else None),
+                'successes': self.successes,
+                'failures': self.failures,
+                'rejected': self.rejected,
+                'opened': self.opened
+            }
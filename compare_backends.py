@@ -0,0 +1,110 @@
+"""
+Accuracy-vs-latency report for the Keras and TFLite inference backends.
+
+Runs every backend on the same image set and reports load time, single-image
+latency (p50/p99), batched throughput, top-1 agreement and maximum probability
+drift against the Keras reference. If a labels CSV (filename,class_name) is
+given, top-1 accuracy against the labels is reported too.
+
+Usage:
+    python compare_backends.py --images input_folder
+    python compare_backends.py --images /labelled --labels labels.csv --repeat 20
+"""
+
+import argparse
+import csv
+import os
+import time
+
+import numpy as np
+
+from config import Config
+from main import TENSORFLOW_AVAILABLE, class_names, load_image_array
+
+
+def load_backends(model_path, calibration_folder, quantizations):
+    """Return a list of (name, predict, load_seconds); Keras first as the reference."""
+    from main import _load_keras_model
+    from tflite_backend import load_tflite_model
+
+    backends = []
+    start = time.perf_counter()
+    predict, _ = _load_keras_model(model_path)
+    backends.append(('keras', predict, time.perf_counter() - start))
+    for quantization in quantizations:
+        start = time.perf_counter()
+        predict, _ = load_tflite_model(model_path, quantization, calibration_folder=calibration_folder,
+                                       load_image_array=load_image_array, num_threads=Config.TFLITE_NUM_THREADS)
+        backends.append((f'tflite-{quantization}', predict, time.perf_counter() - start))
+    return backends
+
+
+def load_labels(path):
+    with open(path, newline='') as f:
+        return {row[0]: class_names.index(row[1]) for row in csv.reader(f) if len(row) >= 2 and row[1] in class_names}
+
+
+def measure(predict, images, repeat, batch_size):
+    # Warm up both the single-image and batched shapes before timing
+    predict(images[:1])
+    predict(images[:batch_size])
+
+    latencies = []
+    for _ in range(repeat):
+        for i in range(len(images)):
+            start = time.perf_counter()
+            predict(images[i:i + 1])
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    outputs = [predict(images[i:i + batch_size]) for i in range(0, len(images), batch_size)]
+    throughput = len(images) / (time.perf_counter() - start)
+    return np.concatenate(outputs), np.array(latencies) * 1000.0, throughput
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare inference backends on the same image set.')
+    parser.add_argument('--model', default=Config.MODEL_PATH)
+    parser.add_argument('--images', default='input_folder')
+    parser.add_argument('--calibration', default=Config.TFLITE_CALIBRATION_FOLDER)
+    parser.add_argument('--labels', help='CSV of filename,class_name for accuracy')
+    parser.add_argument('--quantizations', default='none,float16,int8')
+    parser.add_argument('--repeat', type=int, default=5, help='Passes over the images for latency')
+    parser.add_argument('--batch-size', type=int, default=16)
+    args = parser.parse_args()
+
+    if not TENSORFLOW_AVAILABLE:
+        print("Error: TensorFlow is required to compare backends.")
+        return
+
+    names = sorted(f for f in os.listdir(args.images) if f.lower().endswith(('.png', '.jpg', '.jpeg')))
+    images = np.stack([load_image_array(os.path.join(args.images, f)) for f in names])
+    labels = load_labels(args.labels) if args.labels else {}
+    labelled = [i for i, name in enumerate(names) if name in labels]
+
+    quantizations = [q for q in args.quantizations.split(',') if q]
+    backends = load_backends(args.model, args.calibration, quantizations)
+    print(f"{len(names)} images, batch size {args.batch_size}, {args.repeat} latency passes\n")
+
+    header = f"{'backend':<16}{'load s':>8}{'p50 ms':>9}{'p99 ms':>9}{'img/s':>9}{'agree':>9}{'max diff':>10}"
+    if labelled:
+        header += f"{'accuracy':>10}"
+    print(header)
+
+    reference = None
+    for name, predict, load_seconds in backends:
+        outputs, latencies, throughput = measure(predict, images, args.repeat, args.batch_size)
+        if reference is None:
+            reference = outputs
+        agreement = float((outputs.argmax(axis=1) == reference.argmax(axis=1)).mean())
+        max_diff = float(np.abs(outputs - reference).max())
+        row = (f"{name:<16}{load_seconds:>8.2f}{np.percentile(latencies, 50):>9.2f}"
+               f"{np.percentile(latencies, 99):>9.2f}{throughput:>9.1f}{agreement:>9.1%}{max_diff:>10.4f}")
+        if labelled:
+            correct = sum(int(outputs[i].argmax() == labels[names[i]]) for i in labelled)
+            row += f"{correct / len(labelled):>10.1%}"
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
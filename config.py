@@ -23,6 +23,115 @@ class Config:
     # File upload settings
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB max upload size
+    PERSIST_UPLOADS = os.getenv('PERSIST_UPLOADS', 'true').lower() == 'true'  # Keep originals in UPLOAD_FOLDER (written while the image is classified)
+    
+    # Model configuration
+    MODEL_PATH = os.getenv('MODEL_PATH', 'model.h5')
+    MODEL_CONFIDENCE_THRESHOLD = float(os.getenv('MODEL_CONFIDENCE_THRESHOLD', '0.4'))
+    
+    # Decode JPEGs at reduced scale (libjpeg draft mode) before resizing to 128x128
+    JPEG_DRAFT_DECODE = os.getenv('JPEG_DRAFT_DECODE', 'true').lower() == 'true'
+    # Load the model, Gemini client and database tables at startup instead of on first use
+    PRELOAD_ON_STARTUP = os.getenv('PRELOAD_ON_STARTUP', 'false').lower() == 'true'
+    
+    # Versioned model store (versions/<name>/ + ACTIVE); workers hot-swap when ACTIVE changes
+    MODEL_STORE_DIR = os.getenv('MODEL_STORE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_store'))
+    MODEL_WATCH_SECONDS = float(os.getenv('MODEL_WATCH_SECONDS', '5'))  # 0 disables watching
+    MODEL_DRAIN_TIMEOUT = float(os.getenv('MODEL_DRAIN_TIMEOUT', '60'))  # Wait for in-flight requests on the old model
+    
+    # Inference backend: 'keras', 'tflite', 'numpy' (TensorFlow-free engine) or 'auto'
+    # ('auto' uses Keras when TensorFlow is installed, otherwise NumPy)
+    INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'auto')
+    TFLITE_QUANTIZATION = os.getenv('TFLITE_QUANTIZATION', 'float16')  # none, float16 or int8
+    TFLITE_CALIBRATION_FOLDER = os.getenv('TFLITE_CALIBRATION_FOLDER', 'input_folder')
+    TFLITE_NUM_THREADS = int(os.getenv('TFLITE_NUM_THREADS', '1'))
+    NUMPY_MODEL_PATH = os.getenv('NUMPY_MODEL_PATH', os.path.join('static', 'model', 'tfjs_model', 'model.json'))
+    NUMPY_METADATA_PATH = os.getenv('NUMPY_METADATA_PATH', os.path.join('static', 'model', 'metadata.json'))
+    
+    # Two-stage cascade: a cheap first-stage backend answers when its top-1 probability
+    # reaches CASCADE_THRESHOLD, otherwise the image escalates to the full model
+    CASCADE_ENABLED = os.getenv('CASCADE_ENABLED', 'false').lower() == 'true'
+    CASCADE_FIRST_STAGE_BACKEND = os.getenv('CASCADE_FIRST_STAGE_BACKEND', 'numpy')  # numpy or tflite
+    CASCADE_THRESHOLD = float(os.getenv('CASCADE_THRESHOLD', '0.9'))
+    
+    # Compiled serving function: optional XLA, and the batch sizes run once at load time
+    XLA_COMPILE = os.getenv('XLA_COMPILE', 'false').lower() == 'true'
+    WARMUP_BATCH_SIZES = [int(s) for s in os.getenv('WARMUP_BATCH_SIZES', '1,8,16').split(',') if s.strip()]
+    # Load and warm the model in a background thread once a gunicorn worker (or `python app.py`) starts;
+    # off by default so importing the app (CLI commands, dashboard-only workers) does not load TensorFlow
+    WARMUP_ON_STARTUP = os.getenv('WARMUP_ON_STARTUP', 'false').lower() == 'true'
+    
+    # CPU budget per inference process: TF thread pools (0 = TensorFlow default, 'auto' = cores / workers)
+    # and CPU pinning ('none', 'auto' for a slice of cores per worker, or a list such as '0-3')
+    TF_INTRA_OP_THREADS = os.getenv('TF_INTRA_OP_THREADS', '0')
+    TF_INTER_OP_THREADS = os.getenv('TF_INTER_OP_THREADS', '0')
+    CPU_AFFINITY = os.getenv('CPU_AFFINITY', 'none')
+    WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', '2'))  # gunicorn workers (gunicorn.conf.py); divides the budget
+    
+    # Micro-batching of concurrent inference requests
+    INFERENCE_BATCHING = os.getenv('INFERENCE_BATCHING', 'true').lower() == 'true'
+    INFERENCE_BATCH_MAX_SIZE = int(os.getenv('INFERENCE_BATCH_MAX_SIZE', '16'))
+    INFERENCE_BATCH_MAX_WAIT_MS = float(os.getenv('INFERENCE_BATCH_MAX_WAIT_MS', '5'))
+    
+    # Where inference runs: 'local' (model loaded in every web worker) or 'pool'
+    # (a shared inference_server.py process pool reached over a local socket)
+    INFERENCE_MODE = os.getenv('INFERENCE_MODE', 'local')
+    INFERENCE_REPLICAS = int(os.getenv('INFERENCE_REPLICAS', '1'))
+    INFERENCE_SERVER_ADDRESS = os.getenv('INFERENCE_SERVER_ADDRESS', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'inference.sock'))
+    INFERENCE_SERVER_AUTHKEY = os.getenv('INFERENCE_SERVER_AUTHKEY')  # Defaults to SECRET_KEY
+    INFERENCE_SERVER_TIMEOUT = float(os.getenv('INFERENCE_SERVER_TIMEOUT', '30'))
+    
+    # Content-hash prediction cache (memory LRU + SQLite)
+    PREDICTION_CACHE_ENABLED = os.getenv('PREDICTION_CACHE_ENABLED', 'true').lower() == 'true'
+    PREDICTION_CACHE_PATH = os.getenv('PREDICTION_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'prediction_cache.db'))
+    PREDICTION_CACHE_MEMORY_ENTRIES = int(os.getenv('PREDICTION_CACHE_MEMORY_ENTRIES', '1024'))
+    PREDICTION_CACHE_MAX_MB = int(os.getenv('PREDICTION_CACHE_MAX_MB', '64'))
+    
+    # Image quality gate run on the downscaled image before inference and the LLM call
+    QUALITY_GATE_ENABLED = os.getenv('QUALITY_GATE_ENABLED', 'true').lower() == 'true'
+    QUALITY_MIN_SHARPNESS = float(os.getenv('QUALITY_MIN_SHARPNESS', '100'))  # Laplacian variance
+    QUALITY_MIN_BRIGHTNESS = float(os.getenv('QUALITY_MIN_BRIGHTNESS', '25'))  # Mean grey level, 0-255
+    QUALITY_MAX_BRIGHTNESS = float(os.getenv('QUALITY_MAX_BRIGHTNESS', '245'))
+    QUALITY_MAX_CLIPPED_FRACTION = float(os.getenv('QUALITY_MAX_CLIPPED_FRACTION', '0.9'))  # Share of crushed/blown pixels
+    QUALITY_MIN_PLANT_FRACTION = float(os.getenv('QUALITY_MIN_PLANT_FRACTION', '0.1'))  # Share of foliage-coloured pixels
+    
+    # Perceptual-hash (dHash) reuse of predictions for near-duplicate uploads
+    NEAR_DUPLICATE_ENABLED = os.getenv('NEAR_DUPLICATE_ENABLED', 'true').lower() == 'true'
+    NEAR_DUPLICATE_MAX_DISTANCE = int(os.getenv('NEAR_DUPLICATE_MAX_DISTANCE', '4'))  # Hamming distance out of 64 bits
+    
+    # Multi-image prediction (/api/predict/batch)
+    BATCH_PREDICT_CHUNK_SIZE = int(os.getenv('BATCH_PREDICT_CHUNK_SIZE', '32'))
+    BATCH_PREDICT_MAX_ITEMS = int(os.getenv('BATCH_PREDICT_MAX_ITEMS', '500'))  # Images per request, zip members included
+    BATCH_PREDICT_MAX_MEMBER_BYTES = int(os.getenv('BATCH_PREDICT_MAX_MEMBER_BYTES', str(16 * 1024 * 1024)))  # Uncompressed size of one zip member
+    IMAGE_DECODE_WORKERS = int(os.getenv('IMAGE_DECODE_WORKERS', str(min(8, os.cpu_count() or 1))))
+    
+    # Tiled inference for high-resolution photos (/api/predict/tiled)
+    TILE_MAX_SIDE = int(os.getenv('TILE_MAX_SIDE', '1024'))  # Longer side the photo is decoded to before tiling
+    TILE_STRIDE = int(os.getenv('TILE_STRIDE', '96'))  # Step between 128x128 patches (smaller = more overlap)
+    TILE_BATCH_SIZE = int(os.getenv('TILE_BATCH_SIZE', '32'))  # Patches per forward pass, bounds peak memory
+    
+    # Asynchronous prediction jobs (/api/predict?async=1)
+    ASYNC_JOB_WORKERS = int(os.getenv('ASYNC_JOB_WORKERS', '2'))
+    ASYNC_JOB_MAX_PENDING = int(os.getenv('ASYNC_JOB_MAX_PENDING', '100'))  # Queued + running jobs before 503
+    ASYNC_JOB_TTL_SECONDS = int(os.getenv('ASYNC_JOB_TTL_SECONDS', '600'))  # How long finished results are kept
+    # Job table shared by all gunicorn workers, so any worker can answer /api/jobs/<id>
+    ASYNC_JOB_SHARED = os.getenv('ASYNC_JOB_SHARED', 'true').lower() == 'true'
+    ASYNC_JOB_DB_PATH = os.getenv('ASYNC_JOB_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'jobs.db'))
+    
+    # Live camera streams (/api/stream)
+    STREAM_MAX_FPS = float(os.getenv('STREAM_MAX_FPS', '5'))  # Frames per second accepted per stream
+    STREAM_SMOOTHING = float(os.getenv('STREAM_SMOOTHING', '0.6'))  # Weight of the newest frame in the moving average
+    STREAM_MAX_STREAMS = int(os.getenv('STREAM_MAX_STREAMS', '50'))
+    STREAM_IDLE_TIMEOUT = float(os.getenv('STREAM_IDLE_TIMEOUT', '60'))  # Seconds before an idle stream is closed
+    STREAM_MAX_VIEWERS = int(os.getenv('STREAM_MAX_VIEWERS', '2'))  # Concurrent SSE viewers per stream; each holds a server thread
+    STREAM_MAX_FRAME_BYTES = int(os.getenv('STREAM_MAX_FRAME_BYTES', str(2 * 1024 * 1024)))  # Largest frame on an upload channel
+    
+    # Similar past cases (/api/detections/<id>/similar)
+    EMBEDDINGS_ENABLED = os.getenv('EMBEDDINGS_ENABLED', 'true').lower() == 'true'
+    EMBEDDING_DIR = os.getenv('EMBEDDING_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'embeddings'))
+    EMBEDDING_DIM = int(os.getenv('EMBEDDING_DIM', '128'))  # Penultimate-layer features are projected to this size
+    SIMILARITY_NPROBE = int(os.getenv('SIMILARITY_NPROBE', '8'))  # Index lists scanned per query (higher = better recall)
+    SIMILARITY_EXACT_BELOW = int(os.getenv('SIMILARITY_EXACT_BELOW', '20000'))  # Exhaustive search below this many embeddings
     
     # Firebase configuration
     FIREBASE_API_KEY = os.getenv('FIREBASE_API_KEY')
@@ -37,7 +146,35 @@ class Config:
     # API Keys
     GEOAPIFY_API_KEY = os.getenv('GEOAPIFY_API_KEY')
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+    GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')
     OPENWEATHERMAP_API_KEY = os.getenv('OPENWEATHERMAP_API_KEY')
+    
+    # Render result pages at once and stream the Gemini answer into them over SSE
+    LLM_STREAMING = os.getenv('LLM_STREAMING', 'true').lower() == 'true'
+    
+    # Identical concurrent Gemini prompts share one call (see singleflight.py)
+    LLM_SINGLE_FLIGHT = os.getenv('LLM_SINGLE_FLIGHT', 'true').lower() == 'true'
+    LLM_COALESCE_ACROSS_WORKERS = os.getenv('LLM_COALESCE_ACROSS_WORKERS', 'false').lower() == 'true'
+    LLM_COALESCE_DB_PATH = os.getenv('LLM_COALESCE_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'llm_single_flight.db'))
+    LLM_COALESCE_LEASE_SECONDS = float(os.getenv('LLM_COALESCE_LEASE_SECONDS', '60'))  # A crashed lease holder is taken over after this
+    
+    # Deadline and circuit breaker for Gemini calls; fallbacks are served while it is down
+    GEMINI_BASE_URL = os.getenv('GEMINI_BASE_URL', '')  # e.g. http://127.0.0.1:8765 for fake_gemini_server.py
+    LLM_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', '20'))  # Budget for one answer, including waiting on a shared call
+    LLM_BREAKER_FAILURES = int(os.getenv('LLM_BREAKER_FAILURES', '5'))  # Consecutive failures that open the breaker
+    LLM_BREAKER_RESET_SECONDS = float(os.getenv('LLM_BREAKER_RESET_SECONDS', '30'))  # Open time before a trial call
+    
+    # Reuse of Gemini answers for near-identical symptom descriptions (see semantic_cache.py)
+    SEMANTIC_CACHE_ENABLED = os.getenv('SEMANTIC_CACHE_ENABLED', 'true').lower() == 'true'
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.7'))  # Jaccard similarity of word unigrams + bigrams, among texts naming the same crops/diseases
+    SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', '5000'))
+    SEMANTIC_CACHE_TTL_SECONDS = int(os.getenv('SEMANTIC_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+    
+    # Disease detail text per class for the upload flow (see knowledge.py)
+    KNOWLEDGE_CACHE_ENABLED = os.getenv('KNOWLEDGE_CACHE_ENABLED', 'true').lower() == 'true'
+    KNOWLEDGE_CACHE_PATH = os.getenv('KNOWLEDGE_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'disease_knowledge.db'))
+    KNOWLEDGE_TTL_SECONDS = int(os.getenv('KNOWLEDGE_TTL_SECONDS', str(7 * 24 * 3600)))  # Age before an entry is refreshed
+    KNOWLEDGE_REFRESH_SECONDS = int(os.getenv('KNOWLEDGE_REFRESH_SECONDS', '3600'))  # How often stale entries are looked for
 
 class DevelopmentConfig(Config):
     """Development configuration."""
@@ -0,0 +1 @@
+"""Lets pytest import the top-level modules (numpy_engine, main, ...) from tests/."""
@@ -0,0 +1,135 @@
+"""
+CPU thread budget and affinity for inference processes.
+
+Several workers that each let TensorFlow use every core oversubscribe the CPU.
+TF_INTRA_OP_THREADS / TF_INTER_OP_THREADS set the per-process thread pools
+(0 keeps TensorFlow's default, 'auto' divides the available cores across the
+workers), and CPU_AFFINITY pins each worker to its own slice of cores
+('auto') or to an explicit list such as '0-3,8'. Pinning is applied when the
+process starts (gunicorn's post_fork, the inference replica entry point),
+before it creates threads; every thread already running is pinned as well.
+"""
+
+import os
+
+from config import Config
+
+
+def available_cpus():
+    """CPUs this process may run on (respects cgroup/taskset limits where the OS reports them)."""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+def worker_count():
+    """Number of inference processes sharing this machine."""
+    if Config.INFERENCE_MODE == 'pool':
+        return max(1, Config.INFERENCE_REPLICAS)
+    # gunicorn.conf.py exports the actual worker count in post_fork; the default is shared with it
+    return max(1, int(os.getenv('WEB_CONCURRENCY', str(Config.WEB_CONCURRENCY))))
+
+
+def parse_cpu_list(text):
+    """Parse '0-3,8' into [0, 1, 2, 3, 8]."""
+    cpus = []
+    for part in text.split(','):
+        part = part.strip()
+        if '-' in part:
+            low, high = part.split('-')
+            cpus.extend(range(int(low), int(high) + 1))
+        elif part:
+            cpus.append(int(part))
+    return cpus
+
+
+def cpu_slice(index, workers, cpus=None):
+    """The contiguous share of cpus for worker index out of workers (shares wrap if workers > cpus)."""
+    cpus = cpus if cpus is not None else available_cpus()
+    per_worker = max(1, len(cpus) // workers)
+    start = (index * per_worker) % len(cpus)
+    return cpus[start:start + per_worker]
+
+
+def thread_budget(workers=None):
+    """Return (intra_op, inter_op) thread counts for this process; 0 means TensorFlow's default."""
+    workers = workers or worker_count()
+    share = max(1, len(available_cpus()) // workers)
+
+    def resolve(value, auto):
+        value = str(value).strip().lower()
+        return auto if value == 'auto' else int(value or 0)
+
+    return resolve(Config.TF_INTRA_OP_THREADS, share), resolve(Config.TF_INTER_OP_THREADS, 1 if share < 4 else 2)
+
+
+_pinned_pid = None
+
+
+def _thread_ids():
+    """Ids of every thread of this process (os.sched_setaffinity(0, ...) only affects the calling thread)."""
+    try:
+        return [int(tid) for tid in os.listdir('/proc/self/task')]
+    except OSError:
+        return [0]
+
+
+def apply_cpu_affinity(index=None, workers=None):
+    """
+    Pin this process according to CPU_AFFINITY; returns the CPU list it was
+    pinned to, or None. Runs once per process; later calls are no-ops.
+    """
+    global _pinned_pid
+    setting = str(Config.CPU_AFFINITY).strip().lower()
+    if setting in ('', 'none', 'off') or not hasattr(os, 'sched_setaffinity') or _pinned_pid == os.getpid():
+        return None
+    if setting == 'auto':
+        if index is None:
+            index = int(os.getenv('WORKER_INDEX', '0'))
+        cpus = cpu_slice(index, workers or worker_count())
+    else:
+        cpus = parse_cpu_list(setting)
+    threads = _thread_ids()
+    try:
+        for tid in threads:
+            try:
+                os.sched_setaffinity(tid, cpus)
+            except ProcessLookupError:
+                pass  # The thread exited meanwhile
+    except OSError as e:
+        print(f"Could not set CPU affinity to {cpus}: {e}")
+        return None
+    _pinned_pid = os.getpid()
+    print(f"Pinned process {os.getpid()} ({len(threads)} thread(s)) to CPUs {cpus}")
+    return cpus
+
+
+def configure_tensorflow_threads(tf):
+    """Apply the thread budget to TensorFlow; must run before TensorFlow executes its first op."""
+    intra, inter = thread_budget()
+    try:
+        if intra:
+            tf.config.threading.set_intra_op_parallelism_threads(intra)
+        if inter:
+            tf.config.threading.set_inter_op_parallelism_threads(inter)
+    except RuntimeError as e:
+        # TensorFlow was already initialised in this process; the settings cannot change now
+        print(f"Could not apply TensorFlow thread budget: {e}")
+        return None
+    return intra, inter
+
+
+def budget_stats():
+    intra, inter = thread_budget()
+    try:
+        affinity = sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        affinity = None
+    return {
+        'workers': worker_count(),
+        'intra_op_threads': intra or 'default',
+        'inter_op_threads': inter or 'default',
+        'cpu_affinity_setting': Config.CPU_AFFINITY,
+        'cpus': affinity
+    }
@@ -3,7 +3,6 @@ from flask_login import current_user
 from models import db, Field, Sensor, DiseaseDetection, SensorReading
 from sensor_utils import get_field_health_status
 from config import Config
-import plotly.graph_objects as go
 import json
 import os
 
@@ -127,6 +126,9 @@ def disease_trend(field_id):
         field_id=field_id
     ).order_by(DiseaseDetection.detected_at.desc()).limit(30).all()
     
+    # Imported here so plotly is only loaded when a trend chart is requested
+    import plotly.graph_objects as go
+
     # Create time series plot
     fig = go.Figure()
     
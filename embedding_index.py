@@ -0,0 +1,353 @@
+"""
+Embedding store and approximate nearest-neighbour index for "similar past cases".
+
+Penultimate-layer activations of stored detections are projected to a fixed
+size, L2-normalised and appended to a float16 matrix that is memory-mapped
+from disk, with a parallel array of detection ids. Search uses an inverted
+file (IVF) index: k-means centroids partition the vectors, and a query only
+scores the vectors in its nprobe closest partitions. Rows appended after the
+index was built are assigned to their nearest centroid immediately, so the
+index stays current; it is retrained in the background once the collection
+has grown several times over. Small collections are searched exhaustively.
+
+Usage (synthetic benchmark):
+    python embedding_index.py --benchmark 1000000 --dim 128
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+
+def project(features, dim, seed=0):
+    """Random-projection of (N, D) features to (N, dim), L2-normalised (cosine similarity = dot product)."""
+    features = np.asarray(features, dtype=np.float32).reshape(len(features), -1)
+    rng = np.random.default_rng(seed)
+    matrix = _projection_cache.get((features.shape[1], dim, seed))
+    if matrix is None:
+        matrix = (rng.standard_normal((features.shape[1], dim)) / np.sqrt(dim)).astype(np.float32)
+        _projection_cache[(features.shape[1], dim, seed)] = matrix
+    vectors = features @ matrix
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+_projection_cache = {}
+
+
+def kmeans(vectors, clusters, iterations=10, seed=0):
+    """Spherical k-means on normalised float32 vectors; returns (clusters, dim) unit centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        counts = np.bincount(assignment, minlength=clusters)
+        # Re-seed empty clusters from random vectors
+        empty = counts == 0
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32)
+
+
+class EmbeddingIndex:
+    """Append-only float16 embedding matrix on disk with an IVF search index."""
+
+    def __init__(self, directory, dim=128, nprobe=8, exact_below=20000, retrain_growth=4.0):
+        self.directory = directory
+        self.dim = dim
+        self.nprobe = nprobe
+        self.exact_below = exact_below
+        self.retrain_growth = retrain_growth
+        self._lock = threading.RLock()
+        self._count = 0
+        self._capacity = 0
+        self._vectors = None
+        self._ids = None
+        self._assign = None
+        self._centroids = None
+        self._trained_count = 0
+        self._order = None
+        self._offsets = None
+        self._sorted_count = 0
+        self._meta_mtime = None
+        self._training = False
+        self.queries = 0
+        self._query_seconds = 0.0
+        os.makedirs(directory, exist_ok=True)
+        self._refresh()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    # --- storage ---------------------------------------------------------
+
+    def _read_meta(self):
+        try:
+            with open(self._path('meta.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'count': 0, 'capacity': 0, 'dim': self.dim, 'trained_count': 0}
+
+    def _write_meta(self):
+        meta = {'count': self._count, 'capacity': self._capacity, 'dim': self.dim,
+                'trained_count': self._trained_count}
+        tmp_path = self._path(f'meta.json.{os.getpid()}.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._path('meta.json'))
+        self._meta_mtime = os.stat(self._path('meta.json')).st_mtime_ns
+
+    def _map(self, capacity):
+        """(Re)open the memory maps with room for capacity rows."""
+        mode = 'r+' if os.path.exists(self._path('vectors.f16')) else 'w+'
+        self._vectors = np.memmap(self._path('vectors.f16'), dtype=np.float16, mode=mode, shape=(capacity, self.dim))
+        self._ids = np.memmap(self._path('ids.i64'), dtype=np.int64, mode=mode, shape=(capacity,))
+        self._assign = np.memmap(self._path('assign.i32'), dtype=np.int32, mode=mode, shape=(capacity,))
+        self._capacity = capacity
+
+    def _grow(self, needed):
+        capacity = max(1024, self._capacity)
+        while capacity < needed:
+            capacity *= 2
+        if capacity == self._capacity and self._vectors is not None:
+            return
+        for name, width in (('vectors.f16', self.dim * 2), ('ids.i64', 8), ('assign.i32', 4)):
+            with open(self._path(name), 'ab') as f:
+                f.truncate(capacity * width)
+        self._map(capacity)
+
+    def _refresh(self):
+        """Pick up rows appended by other worker processes."""
+        try:
+            mtime = os.stat(self._path('meta.json')).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._meta_mtime and self._vectors is not None:
+            return
+        meta = self._read_meta()
+        self.dim = meta.get('dim', self.dim)
+        if meta['capacity'] and meta['capacity'] != self._capacity:
+            self._map(meta['capacity'])
+        self._count = meta['count']
+        if meta.get('trained_count', 0) != self._trained_count or self._centroids is None:
+            self._trained_count = meta.get('trained_count', 0)
+            self._centroids = np.load(self._path('centroids.npy')) if self._trained_count else None
+            self._sorted_count = 0
+        self._meta_mtime = mtime
+
+    def append(self, detection_ids, vectors):
+        """Store normalised vectors (N, dim) for detection ids; safe across worker processes. Returns the first row."""
+        detection_ids = np.atleast_1d(np.asarray(detection_ids, dtype=np.int64))
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(detection_ids), self.dim)
+        with self._lock, open(self._path('append.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._meta_mtime = None
+            self._refresh()
+            start = self._count
+            end = start + len(detection_ids)
+            self._grow(end)
+            self._vectors[start:end] = vectors
+            self._ids[start:end] = detection_ids
+            self._assign[start:end] = (np.argmax(vectors @ self._centroids.T, axis=1)
+                                       if self._centroids is not None else -1)
+            self._vectors.flush()
+            self._ids.flush()
+            self._assign.flush()
+            self._count = end
+            self._write_meta()
+        if self._trained_count and self._count > self._trained_count * self.retrain_growth:
+            self.train_in_background()
+        return start
+
+    def __len__(self):
+        return self._count
+
+    def row_of(self, detection_id):
+        with self._lock:
+            self._refresh()
+            if not self._count:
+                return None
+            rows = np.flatnonzero(self._ids[:self._count] == detection_id)
+        return int(rows[-1]) if len(rows) else None
+
+    def indexed_ids(self):
+        with self._lock:
+            self._refresh()
+            return set(np.unique(self._ids[:self._count]).tolist()) if self._count else set()
+
+    def vector(self, row):
+        return np.asarray(self._vectors[row], dtype=np.float32)
+
+    # --- index -------------------------------------------------------------
+
+    def train(self, sample_size=65536, iterations=10):
+        """Fit centroids (about sqrt(N) of them) and assign every stored vector to one."""
+        with self._lock:
+            self._refresh()
+            count = self._count
+            vectors = self._vectors
+        if count < 2:
+            return
+        clusters = int(min(4096, max(16, np.sqrt(count))))
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(count, min(count, max(sample_size, clusters * 8)), replace=False))
+        centroids = kmeans(np.asarray(vectors[sample], dtype=np.float32), min(clusters, len(sample)), iterations)
+        assignment = np.empty(count, dtype=np.int32)
+        for start in range(0, count, 65536):
+            chunk = np.asarray(vectors[start:min(start + 65536, count)], dtype=np.float32)
+            assignment[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+
+        with self._lock, open(self._path('append.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._meta_mtime = None
+            self._refresh()
+            np.save(self._path('centroids.npy'), centroids)
+            self._assign[:count] = assignment
+            # Rows appended while training was running
+            if self._count > count:
+                tail = np.asarray(self._vectors[count:self._count], dtype=np.float32)
+                self._assign[count:self._count] = np.argmax(tail @ centroids.T, axis=1)
+            self._assign.flush()
+            self._centroids = centroids
+            self._trained_count = self._count
+            self._sorted_count = 0
+            self._write_meta()
+            self._lists()
+        print(f"Trained similarity index: {len(centroids)} lists over {count} embeddings")
+
+    def train_in_background(self):
+        with self._lock:
+            if self._training:
+                return
+            self._training = True
+
+        def run():
+            try:
+                self.train()
+            except Exception as e:
+                print(f"Error training similarity index: {e}")
+            finally:
+                self._training = False
+
+        threading.Thread(target=run, name='similarity-index-train', daemon=True).start()
+
+    def _lists(self):
+        """Rows grouped by centroid (re-sorted when many rows were appended since the last sort)."""
+        if self._order is None or self._count - self._sorted_count > max(1024, self._sorted_count // 10) \
+                or self._sorted_count == 0:
+            assign = np.asarray(self._assign[:self._count])
+            self._order = np.argsort(assign, kind='stable').astype(np.int64)
+            self._offsets = np.searchsorted(assign[self._order], np.arange(len(self._centroids) + 1))
+            self._sorted_count = self._count
+        return self._order, self._offsets
+
+    def search(self, vector, k=10, exclude_row=None):
+        """Return [(detection_id, similarity)] of the k most similar stored vectors."""
+        start = time.perf_counter()
+        vector = np.asarray(vector, dtype=np.float32).reshape(self.dim)
+        with self._lock:
+            self._refresh()
+            count = self._count
+            if count == 0:
+                return []
+            if self._centroids is None and count >= self.exact_below:
+                self.train_in_background()
+            if self._centroids is None or count < self.exact_below:
+                rows = np.arange(count)
+            else:
+                order, offsets = self._lists()
+                probe = np.argpartition(-(self._centroids @ vector), min(self.nprobe, len(self._centroids) - 1))
+                probe = probe[:self.nprobe]
+                parts = [order[offsets[c]:offsets[c + 1]] for c in probe]
+                # Rows appended since the lists were last sorted
+                tail = np.arange(self._sorted_count, count)
+                if len(tail):
+                    parts.append(tail[np.isin(self._assign[self._sorted_count:count], probe)])
+                rows = np.concatenate(parts)
+            if exclude_row is not None:
+                rows = rows[rows != exclude_row]
+            if not len(rows):
+                return []
+            scores = np.asarray(self._vectors[rows], dtype=np.float32) @ vector
+            top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            results = [(int(self._ids[rows[i]]), float(scores[i])) for i in top]
+        self.queries += 1
+        self._query_seconds += time.perf_counter() - start
+        return results
+
+    def stats(self):
+        return {
+            'embeddings': self._count,
+            'dim': self.dim,
+            'lists': len(self._centroids) if self._centroids is not None else 0,
+            'nprobe': self.nprobe,
+            'disk_mb': round(self._capacity * (self.dim * 2 + 12) / (1024 * 1024), 1),
+            'queries': self.queries,
+            'avg_query_ms': round(self._query_seconds / self.queries * 1000.0, 2) if self.queries else 0.0
+        }
+
+
+def benchmark(count, dim, queries, k, nprobe):
+    """Fill a temporary index with clustered synthetic vectors and report query latency and recall."""
+    import tempfile
+
+    rng = np.random.default_rng(1)
+    centres = rng.standard_normal((2000, dim)).astype(np.float32)
+    with tempfile.TemporaryDirectory() as directory:
+        index = EmbeddingIndex(directory, dim=dim, nprobe=nprobe)
+        start = time.perf_counter()
+        index._grow(count)
+        for begin in range(0, count, 100000):
+            n = min(100000, count - begin)
+            data = centres[rng.integers(0, len(centres), n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+            data /= np.linalg.norm(data, axis=1, keepdims=True)
+            index._vectors[begin:begin + n] = data
+            index._ids[begin:begin + n] = np.arange(begin, begin + n)
+        index._count = count
+        index._write_meta()
+        print(f"Filled {count} x {dim} float16 embeddings in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        index.train()
+        print(f"Trained in {time.perf_counter() - start:.1f}s")
+
+        appended = min(1000, count // 10)
+        start = time.perf_counter()
+        for i in range(appended):
+            index.append(count + i, project(rng.standard_normal((1, dim)), dim))
+        print(f"Appended {appended} embeddings in {(time.perf_counter() - start) / appended * 1000:.2f} ms each")
+
+        rows = rng.integers(0, count, queries)
+        latencies, recall = [], []
+        for row in rows:
+            query = index.vector(row)
+            start = time.perf_counter()
+            found = index.search(query, k=k)
+            latencies.append(time.perf_counter() - start)
+            exact = np.argsort(-(np.asarray(index._vectors[:len(index)], dtype=np.float32) @ query))[:k]
+            recall.append(len({i for i, _ in found} & set(index._ids[exact].tolist())) / k)
+        latencies = np.array(latencies) * 1000.0
+        print(f"top-{k} over {len(index)} embeddings, nprobe {nprobe}: p50 {np.percentile(latencies, 50):.1f} ms, "
+              f"p99 {np.percentile(latencies, 99):.1f} ms, recall@{k} {np.mean(recall):.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the similarity index on synthetic embeddings.')
+    parser.add_argument('--benchmark', type=int, default=1000000, help='Number of embeddings')
+    parser.add_argument('--dim', type=int, default=128)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--nprobe', type=int, default=8)
+    args = parser.parse_args()
+    benchmark(args.benchmark, args.dim, args.queries, args.k, args.nprobe)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Evaluate the two-stage cascade on an image set.
+
+Both stages are run once over every image, then each threshold is simulated:
+the fraction of images exiting at the first stage, the cascade's top-1
+accuracy next to the full model's (the accuracy delta), and the estimated time
+per image. Without a labels CSV (filename,class_name), agreement with the full
+model is reported instead of accuracy.
+
+Usage:
+    python eval_cascade.py --images /labelled --labels labels.csv
+    python eval_cascade.py --images input_folder --thresholds 0.8 0.9 0.95 0.99
+"""
+
+import argparse
+import csv
+import os
+import time
+
+import numpy as np
+
+from config import Config
+from main import _backend_model_path, active_backend, class_names, load_image_array, registry
+
+
+def load_labels(path):
+    with open(path, newline='') as f:
+        return {row[0]: class_names.index(row[1]) for row in csv.reader(f) if len(row) >= 2 and row[1] in class_names}
+
+
+def run_stage(predict, images, batch_size):
+    predict(images[:1])
+    start = time.perf_counter()
+    outputs = np.concatenate([predict(images[i:i + batch_size]) for i in range(0, len(images), batch_size)])
+    return outputs, (time.perf_counter() - start) / len(images) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report early-exit rates and accuracy of the cascade.')
+    parser.add_argument('--images', default='input_folder')
+    parser.add_argument('--labels', help='CSV of filename,class_name')
+    parser.add_argument('--first-stage', default=Config.CASCADE_FIRST_STAGE_BACKEND)
+    parser.add_argument('--thresholds', type=float, nargs='+', default=[0.7, 0.8, 0.9, 0.95, 0.99])
+    parser.add_argument('--batch-size', type=int, default=16)
+    args = parser.parse_args()
+
+    names = sorted(f for f in os.listdir(args.images) if f.lower().endswith(('.png', '.jpg', '.jpeg')))
+    images = np.stack([load_image_array(os.path.join(args.images, f)) for f in names])
+    labels = load_labels(args.labels) if args.labels else {}
+    labelled = np.array([i for i, name in enumerate(names) if name in labels], dtype=int)
+    truth = np.array([labels[names[i]] for i in labelled], dtype=int)
+
+    first_path = Config.NUMPY_MODEL_PATH if args.first_stage == 'numpy' else _backend_model_path(args.first_stage)
+    full_backend = active_backend()
+    first, first_ms = run_stage(registry.get(first_path, args.first_stage).predict, images, args.batch_size)
+    full, full_ms = run_stage(registry.get(_backend_model_path(full_backend), full_backend).predict,
+                              images, args.batch_size)
+    full_top1 = full.argmax(axis=1)
+
+    if len(labelled):
+        metric = 'accuracy'
+        reference = float((full_top1[labelled] == truth).mean())
+    else:
+        metric = 'agreement'
+        reference = 1.0
+    print(f"{len(names)} images ({len(labelled)} labelled); first stage {args.first_stage} {first_ms:.2f} ms/img, "
+          f"full model {full_backend} {full_ms:.2f} ms/img, full-model {metric} {reference:.1%}\n")
+    print(f"{'threshold':>10}{'stage 1 exit':>14}{'stage 2':>9}{metric:>11}{'delta':>9}{'ms/img':>9}{'speed-up':>10}")
+
+    confident = first.max(axis=1)
+    for threshold in args.thresholds:
+        exits = confident >= threshold
+        top1 = np.where(exits, first.argmax(axis=1), full_top1)
+        if len(labelled):
+            score = float((top1[labelled] == truth).mean())
+        else:
+            score = float((top1 == full_top1).mean())
+        ms = first_ms + (1.0 - exits.mean()) * full_ms
+        print(f"{threshold:>10.2f}{exits.mean():>14.1%}{1.0 - exits.mean():>9.1%}{score:>11.1%}"
+              f"{(score - reference) * 100:>+8.1f}%{ms:>9.2f}{full_ms / ms:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
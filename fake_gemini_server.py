@@ -0,0 +1,150 @@
+"""
+Local stand-in for the Gemini API, for exercising timeouts, the circuit
+breaker and the fallback answers without a network or an API key.
+
+Serves the two endpoints the google-genai client uses:
+    POST /v1beta/models/<model>:generateContent
+    POST /v1beta/models/<model>:streamGenerateContent?alt=sse
+
+Behaviour is set on the command line and can be changed while it runs:
+    POST /control {"mode": "ok" | "fail" | "hang", "delay": 0.5, "fail_rate": 0.0}
+    GET  /control  -> current settings and request counts
+
+Usage:
+    python fake_gemini_server.py --port 8765 --delay 0.2
+    GEMINI_BASE_URL=http://127.0.0.1:8765 GEMINI_API_KEY=test LLM_TIMEOUT_SECONDS=2 python app.py
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER = """Disease: Tomato Late Blight
+
+Description: A fast-spreading disease caused by Phytophthora infestans, favoured by cool, wet weather.
+
+Treatment:
+- Remove and destroy infected leaves
+- Apply a copper-based fungicide
+- Avoid overhead watering
+
+Prevention:
+- Plant resistant varieties
+- Space plants for air flow
+- Rotate crops yearly
+
+References:
+- Fry, W. Phytophthora infestans: the plant destroyer, Molecular Plant Pathology, 2008
+"""
+
+
+class FakeGemini:
+    """Shared settings and counters of the fake server."""
+
+    def __init__(self, mode='ok', delay=0.0, fail_rate=0.0, chunks=4):
+        self.mode = mode
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.chunks = chunks
+        self.requests = 0
+        self.failed = 0
+        self.lock = threading.Lock()
+
+    def settings(self):
+        with self.lock:
+            return {'mode': self.mode, 'delay': self.delay, 'fail_rate': self.fail_rate,
+                    'requests': self.requests, 'failed': self.failed}
+
+
+def _response(text):
+    return {'candidates': [{'content': {'role': 'model', 'parts': [{'text': text}]},
+                            'finishReason': 'STOP', 'index': 0}],
+            'modelVersion': 'fake-gemini'}
+
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _json(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/control':
+                return self._json(200, fake.settings())
+            self._json(404, {'error': {'code': 404, 'message': 'Not found', 'status': 'NOT_FOUND'}})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length) or b'{}')
+            if self.path == '/control':
+                with fake.lock:
+                    for key in ('mode', 'delay', 'fail_rate'):
+                        if key in body:
+                            setattr(fake, key, body[key])
+                return self._json(200, fake.settings())
+            if ':generateContent' not in self.path and ':streamGenerateContent' not in self.path:
+                return self._json(404, {'error': {'code': 404, 'message': 'Not found', 'status': 'NOT_FOUND'}})
+
+            with fake.lock:
+                fake.requests += 1
+                mode, delay, fail_rate = fake.mode, fake.delay, fake.fail_rate
+                fail = mode == 'fail' or random.random() < fail_rate
+                if fail:
+                    fake.failed += 1
+            if mode == 'hang':
+                # Never answer; the client has to give up on its own
+                time.sleep(3600)
+                return
+            time.sleep(delay)
+            if fail:
+                return self._json(503, {'error': {'code': 503, 'message': 'The model is overloaded.',
+                                                  'status': 'UNAVAILABLE'}})
+            if ':streamGenerateContent' in self.path:
+                return self._stream(delay)
+            self._json(200, _response(ANSWER))
+
+        def _stream(self, delay):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            size = -(-len(ANSWER) // fake.chunks)
+            for start in range(0, len(ANSWER), size):
+                self.wfile.write(f"data: {json.dumps(_response(ANSWER[start:start + size]))}\r\n\r\n".encode('utf-8'))
+                self.wfile.flush()
+                time.sleep(delay)
+            self.close_connection = True
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a fake Gemini API for local testing.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--mode', choices=['ok', 'fail', 'hang'], default='ok')
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds before answering (and between stream chunks)')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Share of requests answered with 503')
+    args = parser.parse_args()
+
+    fake = FakeGemini(mode=args.mode, delay=args.delay, fail_rate=args.fail_rate)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(fake))
+    server.daemon_threads = True
+    print(f"Fake Gemini API on http://{args.host}:{args.port} (mode {args.mode})")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Gunicorn settings.
+
+With INFERENCE_MODE=pool the master starts inference_server.py's replica pool
+before forking the web workers, so workers stay small (no model, no
+TensorFlow) and web concurrency is sized independently of model replicas:
+
+    INFERENCE_MODE=pool INFERENCE_REPLICAS=2 WEB_CONCURRENCY=4 gunicorn 'app:create_app()'
+
+See bench_inference_pool.py for choosing the two numbers.
+"""
+
+import multiprocessing
+import os
+import time
+
+from config import Config
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+workers = Config.WEB_CONCURRENCY
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+# Workers build the app lazily (see create_app); preloading would load the model in the master instead
+preload_app = Config.PRELOAD_ON_STARTUP and Config.INFERENCE_MODE == 'local'
+
+_inference_server = None
+_used_slots = set()  # WORKER_INDEX values held by live workers
+
+
+def on_starting(server):
+    global _inference_server
+    if Config.INFERENCE_MODE != 'pool':
+        return
+    from inference_server import serve
+
+    if os.path.exists(Config.INFERENCE_SERVER_ADDRESS):
+        os.unlink(Config.INFERENCE_SERVER_ADDRESS)
+    _inference_server = multiprocessing.get_context('spawn').Process(
+        target=serve, args=(Config.INFERENCE_SERVER_ADDRESS, Config.INFERENCE_REPLICAS), name='inference-server')
+    _inference_server.start()
+    # Give the queue server a moment to bind its socket before workers connect
+    for _ in range(50):
+        if os.path.exists(Config.INFERENCE_SERVER_ADDRESS):
+            break
+        time.sleep(0.1)
+    server.log.info(f"Started inference server (pid {_inference_server.pid}) with {Config.INFERENCE_REPLICAS} replica(s)")
+
+
+def pre_fork(server, worker):
+    # Runs in the master: give the new worker the lowest slot no live worker holds, so a
+    # restarted worker takes over the slot (and CPUs) of the one it replaces
+    worker.slot = min(set(range(len(_used_slots) + 1)) - _used_slots)
+    _used_slots.add(worker.slot)
+
+
+def child_exit(server, worker):
+    _used_slots.discard(getattr(worker, 'slot', None))
+
+
+def post_fork(server, worker):
+    # Worker slot for CPU_AFFINITY=auto; the actual worker count (which -w may override)
+    # also sizes TF_INTRA_OP_THREADS=auto
+    count = server.cfg.workers
+    os.environ['WEB_CONCURRENCY'] = str(count)
+    os.environ['WORKER_INDEX'] = str(worker.slot)
+    if Config.INFERENCE_MODE == 'local':
+        # Pin before the worker starts any threads (in pool mode the replicas pin themselves)
+        from cpu_budget import apply_cpu_affinity
+        apply_cpu_affinity(worker.slot, count)
+
+
+def post_worker_init(worker):
+    # The app is loaded by now; warm the model in workers that run inference themselves
+    from app import start_background_warmup
+    start_background_warmup()
+
+
+def on_exit(server):
+    if _inference_server is not None and _inference_server.is_alive():
+        _inference_server.terminate()
+        _inference_server.join(10)
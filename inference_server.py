@@ -0,0 +1,318 @@
+"""
+Dedicated pool of inference processes shared by all web workers.
+
+In INFERENCE_MODE=pool the web workers do not load the model. A server
+process owns a request queue (multiprocessing manager on a local socket) and
+INFERENCE_REPLICAS worker processes, each holding one copy of the model. A web
+worker writes the decoded batch into a shared-memory block, puts a small
+(client, request, block, shape) message on the queue and waits on its own reply
+queue; the replica writes the probabilities back over the input in the same
+block and replies with their column count (taken from the model). Replicas
+drain several queued requests into one forward pass, so batching also happens
+across web workers.
+
+Usage:
+    python inference_server.py --replicas 2
+"""
+
+import argparse
+import itertools
+import multiprocessing
+from collections import OrderedDict
+import os
+import queue
+import signal
+import threading
+import time
+import uuid
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.managers import BaseManager
+
+import numpy as np
+
+from config import Config
+
+# Reply-queue proxies a replica keeps open (least recently used are dropped)
+REPLY_PROXY_CACHE = 64
+
+_request_queue = queue.Queue(maxsize=1024)
+_reply_queues = {}
+_reply_lock = threading.Lock()
+
+
+def _get_request_queue():
+    return _request_queue
+
+
+def _client_alive(client_id):
+    """Client ids start with the web worker's pid; the server shares its host, so the pid can be checked."""
+    try:
+        os.kill(int(client_id.split('-', 1)[0]), 0)
+    except ProcessLookupError:
+        return False
+    except (ValueError, PermissionError):
+        pass
+    return True
+
+
+def _get_reply_queue(client_id):
+    with _reply_lock:
+        if client_id not in _reply_queues:
+            # New client: forget the queues of web workers that have exited
+            for stale in [c for c in _reply_queues if not _client_alive(c)]:
+                del _reply_queues[stale]
+            _reply_queues[client_id] = queue.Queue()
+        return _reply_queues[client_id]
+
+
+class QueueManager(BaseManager):
+    pass
+
+
+QueueManager.register('request_queue', callable=_get_request_queue)
+QueueManager.register('reply_queue', callable=_get_reply_queue)
+
+
+def _authkey():
+    return (Config.INFERENCE_SERVER_AUTHKEY or Config.SECRET_KEY).encode('utf-8')
+
+
+def _connect(address):
+    manager = QueueManager(address=address, authkey=_authkey())
+    manager.connect()
+    return manager
+
+
+def _attach(name):
+    """Attach to a block created by a client without letting this process's tracker unlink it."""
+    block = shared_memory.SharedMemory(name=name)
+    resource_tracker.unregister(block._name, 'shared_memory')
+    return block
+
+
+def _replica(address, index, max_batch_size):
+    """Replica process: load the model once and serve batches from the shared request queue."""
+    # Lets CPU_AFFINITY=auto give each replica its own slice of cores, pinned before any threads start
+    os.environ['WORKER_INDEX'] = str(index)
+    from cpu_budget import apply_cpu_affinity
+    apply_cpu_affinity(index)
+    from main import get_model, predict_local
+
+    # predict_local follows hot swaps of the model version in this replica
+    get_model()
+    predict = predict_local
+    manager = _connect(address)
+    requests = manager.request_queue()
+    reply_queues = OrderedDict()
+    print(f"Inference replica {index} ready (pid {os.getpid()})")
+
+    while True:
+        messages = [requests.get()]
+        images = sum(m[3][0] for m in messages)
+        while images < max_batch_size:
+            try:
+                message = requests.get_nowait()
+            except queue.Empty:
+                break
+            messages.append(message)
+            images += message[3][0]
+
+        # Attach each block on its own: a client that timed out has already unlinked its block
+        replies, attached = [], []
+        for message in messages:
+            try:
+                attached.append((message, _attach(message[2])))
+            except (FileNotFoundError, OSError) as e:
+                replies.append((message, f"request block is gone: {e}", 0))
+        if attached:
+            try:
+                error, columns = _run_batch(predict, attached)
+            finally:
+                for _, block in attached:
+                    block.close()
+            if error is not None:
+                print(f"Inference replica {index} failed on a batch: {error}")
+            replies.extend((message, error, columns) for message, _ in attached)
+        for (client_id, request_id, _, _), error, columns in replies:
+            try:
+                _reply_queue(manager, reply_queues, client_id).put((request_id, error, columns))
+            except Exception as e:
+                print(f"Inference replica {index} could not reply to {client_id}: {e}")
+
+
+def _reply_queue(manager, cache, client_id):
+    reply = cache.get(client_id)
+    if reply is None:
+        reply = cache[client_id] = manager.reply_queue(client_id)
+        while len(cache) > REPLY_PROXY_CACHE:
+            cache.popitem(last=False)
+    else:
+        cache.move_to_end(client_id)
+    return reply
+
+
+def _run_batch(predict, attached):
+    """
+    Run the concatenated inputs and write each request's rows over its input;
+    returns (error or None, number of output columns).
+    """
+    inputs = [np.ndarray(shape, dtype=np.float32, buffer=block.buf) for (_, _, _, shape), block in attached]
+    try:
+        outputs = np.asarray(predict(np.concatenate(inputs) if len(inputs) > 1 else inputs[0]), dtype=np.float32)
+    except Exception as e:
+        return str(e), 0
+    columns = outputs.shape[1]
+    offset = 0
+    for (_, block), array in zip(attached, inputs):
+        rows = outputs[offset:offset + len(array)]
+        if rows.nbytes > array.nbytes:
+            return f"model output ({columns} columns) does not fit the request block", 0
+        np.ndarray(rows.shape, dtype=np.float32, buffer=block.buf)[:] = rows
+        offset += len(array)
+    return None, columns
+
+
+def serve(address=None, replicas=None, max_batch_size=None):
+    """Start the queue server and the replica processes, then block until terminated."""
+    address = address or Config.INFERENCE_SERVER_ADDRESS
+    replicas = replicas or Config.INFERENCE_REPLICAS
+    max_batch_size = max_batch_size or Config.INFERENCE_BATCH_MAX_SIZE
+    if os.path.exists(address):
+        os.unlink(address)
+    os.makedirs(os.path.dirname(address) or '.', exist_ok=True)
+
+    manager = QueueManager(address=address, authkey=_authkey())
+    server = manager.get_server()
+    threading.Thread(target=server.serve_forever, name='inference-queue', daemon=True).start()
+
+    # Replicas are spawned (not forked) so none of them inherits a half-initialised TensorFlow
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=_replica, args=(address, i, max_batch_size), daemon=True,
+                                 name=f'inference-replica-{i}')
+                 for i in range(replicas)]
+    for process in processes:
+        process.start()
+    print(f"Inference server listening on {address} with {replicas} replica(s)")
+
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+    try:
+        while not stopping.wait(1.0):
+            for i, process in enumerate(processes):
+                if not process.is_alive():
+                    print(f"Inference replica {i} exited ({process.exitcode}); restarting")
+                    processes[i] = context.Process(target=_replica, args=(address, i, max_batch_size),
+                                                   daemon=True, name=f'inference-replica-{i}')
+                    processes[i].start()
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join(5)
+
+
+class InferenceClient:
+    """Web-worker side of the pool: sends batches through shared memory and waits for the reply."""
+
+    def __init__(self, address=None, timeout=30.0):
+        self.address = address or Config.INFERENCE_SERVER_ADDRESS
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pid = None
+        self._pending = {}
+        self._ids = itertools.count()
+        self.requests = 0
+        self.images = 0
+        self.errors = 0
+        self._seconds = 0.0
+
+    def _ensure_connected(self):
+        # Reconnect after a fork: the manager connection and reply thread belong to the parent
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.client_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+            manager = _connect(self.address)
+            self._requests = manager.request_queue()
+            self._pending = {}
+            threading.Thread(target=self._receive, args=(manager.reply_queue(self.client_id),),
+                             name='inference-replies', daemon=True).start()
+            self._pid = os.getpid()
+
+    def _receive(self, replies):
+        while True:
+            try:
+                request_id, error, columns = replies.get()
+            except (EOFError, OSError):
+                # Server went away: fail everything in flight and reconnect on the next request
+                with self._lock:
+                    pending, self._pending = self._pending, {}
+                    self._pid = None
+                for waiter in pending.values():
+                    waiter[1] = 'connection to inference server lost'
+                    waiter[0].set()
+                return
+            with self._lock:
+                waiter = self._pending.pop(request_id, None)
+            if waiter is not None:
+                waiter[1], waiter[2] = error, columns
+                waiter[0].set()
+
+    def predict(self, input_arr):
+        """Return class probabilities for a batch of shape (N, 128, 128, 3)."""
+        self._ensure_connected()
+        input_arr = np.ascontiguousarray(input_arr, dtype=np.float32)
+        start = time.perf_counter()
+        # The replica writes the (N, classes) probabilities over the input, which is far larger
+        block = shared_memory.SharedMemory(create=True, size=input_arr.nbytes)
+        try:
+            np.ndarray(input_arr.shape, dtype=np.float32, buffer=block.buf)[:] = input_arr
+            request_id = next(self._ids)
+            waiter = [threading.Event(), None, 0]
+            with self._lock:
+                self._pending[request_id] = waiter
+            self._requests.put((self.client_id, request_id, block.name, input_arr.shape))
+            if not waiter[0].wait(self.timeout):
+                with self._lock:
+                    self._pending.pop(request_id, None)
+                    self.errors += 1
+                raise TimeoutError(f"Inference server did not answer within {self.timeout}s")
+            if waiter[1] is not None:
+                with self._lock:
+                    self.errors += 1
+                raise RuntimeError(f"Inference server error: {waiter[1]}")
+            output = np.ndarray((len(input_arr), waiter[2]), dtype=np.float32, buffer=block.buf).copy()
+        finally:
+            block.close()
+            block.unlink()
+        with self._lock:
+            self.requests += 1
+            self.images += len(input_arr)
+            self._seconds += time.perf_counter() - start
+        return output
+
+    def stats(self):
+        return {
+            'address': self.address,
+            'connected': self._pid == os.getpid(),
+            'requests': self.requests,
+            'images': self.images,
+            'errors': self.errors,
+            'avg_round_trip_ms': round(self._seconds / self.requests * 1000.0, 2) if self.requests else 0.0
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the shared inference process pool.')
+    parser.add_argument('--address', default=Config.INFERENCE_SERVER_ADDRESS)
+    parser.add_argument('--replicas', type=int, default=Config.INFERENCE_REPLICAS)
+    parser.add_argument('--max-batch-size', type=int, default=Config.INFERENCE_BATCH_MAX_SIZE)
+    args = parser.parse_args()
+    serve(args.address, args.replicas, args.max_batch_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+"""
+Background prediction jobs.
+
+JobQueue runs submitted callables on a fixed pool of threads and keeps their
+results in memory so clients can poll for them or follow them over
+Server-Sent Events. The number of queued + running jobs is bounded, and
+finished jobs are dropped once they are older than the expiry time.
+
+With a db_path, every status change is also written to a SQLite table, so a
+job submitted to one web worker can be polled or followed through any other
+(followers in other workers poll the table for changes).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFullError(Exception):
+    """Raised when too many jobs are already waiting."""
+
+
+class Job:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.version = 0  # Bumped on every status change, for event streams
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def to_dict(self):
+        data = {
+            'job_id': self.id,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+        if self.status == 'done':
+            data['result'] = self.result
+        elif self.status == 'failed':
+            data['error'] = self.error
+        return data
+
+
+class JobQueue:
+    """Bounded job queue with a worker pool and result expiry, optionally shared through SQLite."""
+
+    def __init__(self, workers=2, max_pending=100, ttl_seconds=600, db_path=None, poll_interval=0.25):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self._conn = None
+        self._jobs = {}
+        self._pending = 0
+        self._condition = threading.Condition()
+        self._executor = None
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.expired = 0
+        self._wait_seconds = 0.0
+        self._run_seconds = 0.0
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) and return its Job; raises QueueFullError when the queue is full."""
+        with self._condition:
+            self._expire()
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise QueueFullError(f"{self._pending} jobs already pending")
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='prediction-job')
+            job = Job()
+            self._jobs[job.id] = job
+            self._pending += 1
+            self.submitted += 1
+            self._store(job)
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _set_status(self, job, status, **fields):
+        with self._condition:
+            job.status = status
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.version += 1
+            self._store(job)
+            self._condition.notify_all()
+
+    # --- shared job table ----------------------------------------------------
+
+    def _db(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, result TEXT, '
+                'error TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL, version INTEGER NOT NULL)')
+        return self._conn
+
+    def _store(self, job):
+        """Write job to the shared table (caller holds self._condition)."""
+        if not self.db_path:
+            return
+        try:
+            self._db().execute(
+                'INSERT OR REPLACE INTO jobs (id, status, result, error, created_at, started_at, finished_at, version) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (job.id, job.status, json.dumps(job.result) if job.result is not None else None, job.error,
+                 job.created_at, job.started_at, job.finished_at, job.version))
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            print(f"Could not store job {job.id}: {e}")
+
+    def _load(self, job_id, job=None):
+        """Read a job owned by another worker from the shared table (caller holds self._condition)."""
+        try:
+            row = self._db().execute(
+                'SELECT status, result, error, created_at, started_at, finished_at, version FROM jobs WHERE id = ?',
+                (job_id,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"Could not read job {job_id}: {e}")
+            return job
+        if row is None:
+            return None
+        if job is None:
+            job = Job()
+            job.id = job_id
+        job.status, result, job.error, job.created_at, job.started_at, job.finished_at, job.version = row
+        job.result = json.loads(result) if result is not None else None
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        self._set_status(job, 'running', started_at=time.time())
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            print(f"Prediction job {job.id} failed: {e}")
+            self._set_status(job, 'failed', error=str(e), finished_at=time.time())
+            outcome = 'failed'
+        else:
+            self._set_status(job, 'done', result=result, finished_at=time.time())
+            outcome = 'completed'
+        with self._condition:
+            self._pending -= 1
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            self._wait_seconds += job.started_at - job.created_at
+            self._run_seconds += job.finished_at - job.started_at
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl_seconds
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+        self.expired += len(expired)
+        if self.db_path:
+            try:
+                self._db().execute('DELETE FROM jobs WHERE finished_at < ?', (cutoff,))
+            except sqlite3.Error as e:
+                print(f"Could not expire jobs: {e}")
+
+    def get(self, job_id):
+        """The job with this id, whichever worker runs it (a snapshot if it runs elsewhere), or None."""
+        with self._condition:
+            self._expire()
+            job = self._jobs.get(job_id)
+            if job is None and self.db_path:
+                job = self._load(job_id)
+            return job
+
+    def wait_for_change(self, job, version, timeout):
+        """Block until job.version differs from version (or timeout); returns the current version."""
+        with self._condition:
+            if self._jobs.get(job.id) is job:
+                self._condition.wait_for(lambda: job.version != version, timeout=timeout)
+                return job.version
+        # Run by another worker: poll the shared table
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._condition:
+                self._load(job.id, job)
+            if job.version != version or time.monotonic() >= deadline:
+                return job.version
+            time.sleep(self.poll_interval)
+
+    def stats(self):
+        with self._condition:
+            finished = self.completed + self.failed
+            return {
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'pending': self._pending,
+                'stored': len(self._jobs),
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'expired': self.expired,
+                'avg_queue_wait_ms': round(self._wait_seconds / finished * 1000.0, 2) if finished else 0.0,
+                'avg_run_ms': round(self._run_seconds / finished * 1000.0, 2) if finished else 0.0,
+                'shared': bool(self.db_path)
+            }
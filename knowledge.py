@@ -0,0 +1,201 @@
+"""
+Persistent cache of the Gemini detail text for each disease class.
+
+The upload flow asks Gemini about the predicted class, and there are only 38
+classes, so the answers are stored in SQLite keyed by (class name, prompt
+version, model name) and served from memory. A new prompt or model gets its
+own entries automatically. Entries older than the TTL are still served (so
+the upload flow keeps working offline) while a background thread fetches a
+fresh copy. `flask prewarm-knowledge` fills every class up front.
+"""
+
+import os
+import random
+import sqlite3
+import threading
+import time
+
+
+class DiseaseKnowledge:
+    """SQLite-backed, memory-served detail text per disease class."""
+
+    RETRY_SECONDS = 300  # Back-off after a failed refresh (e.g. while offline)
+
+    def __init__(self, db_path, fetch, prompt_version, model_name, ttl_seconds=7 * 24 * 3600,
+                 refresh_interval=3600, is_valid=None):
+        self.db_path = db_path
+        self.fetch = fetch  # fetch(class_name) -> detail text; may raise when offline
+        self.prompt_version = str(prompt_version)
+        self.model_name = model_name
+        self.ttl_seconds = ttl_seconds
+        self.refresh_interval = refresh_interval
+        self.is_valid = is_valid or (lambda text: bool(text))
+        self._entries = {}  # class_name -> (detail, fetched_at)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._loaded = False
+        self._refresher = None
+        self._refreshing = set()
+        self._retry_after = {}  # class_name -> time before which a failed refresh is not retried
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    def _db(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS disease_knowledge ('
+                'class_name TEXT NOT NULL, prompt_version TEXT NOT NULL, model_name TEXT NOT NULL, '
+                'detail TEXT NOT NULL, fetched_at REAL NOT NULL, '
+                'PRIMARY KEY (class_name, prompt_version, model_name))'
+            )
+        return self._conn
+
+    def _load(self):
+        """Read this prompt/model's entries from SQLite (picks up refreshes made by other workers)."""
+        with self._lock:
+            try:
+                rows = self._db().execute(
+                    'SELECT class_name, detail, fetched_at FROM disease_knowledge '
+                    'WHERE prompt_version = ? AND model_name = ?', (self.prompt_version, self.model_name)).fetchall()
+            except sqlite3.Error as e:
+                print(f"Disease knowledge read failed: {e}")
+                return
+            for class_name, detail, fetched_at in rows:
+                current = self._entries.get(class_name)
+                if current is None or current[1] < fetched_at:
+                    self._entries[class_name] = (detail, fetched_at)
+            self._loaded = True
+
+    def put(self, class_name, detail):
+        """Store detail text for class_name (e.g. an answer that was streamed to a user)."""
+        fetched_at = time.time()
+        with self._lock:
+            self._entries[class_name] = (detail, fetched_at)
+            try:
+                conn = self._db()
+                conn.execute('INSERT OR REPLACE INTO disease_knowledge '
+                             '(class_name, prompt_version, model_name, detail, fetched_at) VALUES (?, ?, ?, ?, ?)',
+                             (class_name, self.prompt_version, self.model_name, detail, fetched_at))
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Disease knowledge write failed: {e}")
+
+    def _is_stale(self, entry):
+        return self.ttl_seconds > 0 and time.time() - entry[1] > self.ttl_seconds
+
+    def get(self, class_name, fetch_on_miss=True):
+        """
+        Return the detail text for class_name. Cached text is returned at once,
+        even when stale (a refresh is then started in the background); on a miss
+        the text is fetched synchronously, which raises if Gemini is unreachable,
+        or None is returned when fetch_on_miss is False.
+        """
+        if not self._loaded:
+            self._load()
+            self.start()
+        entry = self._entries.get(class_name)
+        if entry is not None:
+            if self._is_stale(entry):
+                self.stale_hits += 1
+                self._refresh_in_background(class_name)
+            else:
+                self.hits += 1
+            return entry[0]
+        self.misses += 1
+        if not fetch_on_miss:
+            return None
+        detail = self.fetch(class_name)
+        if self.is_valid(detail):
+            self.put(class_name, detail)
+        return detail
+
+    def refresh(self, class_name):
+        """Fetch and store a fresh copy; returns True when a valid text was stored."""
+        try:
+            detail = self.fetch(class_name)
+        except Exception as e:
+            print(f"Could not refresh disease knowledge for {class_name}: {e}")
+            detail = None
+        if not self.is_valid(detail):
+            self.refresh_failures += 1
+            self._retry_after[class_name] = time.time() + self.RETRY_SECONDS
+            return False
+        self.put(class_name, detail)
+        self.refreshes += 1
+        return True
+
+    def _refresh_in_background(self, class_name):
+        with self._lock:
+            if class_name in self._refreshing or time.time() < self._retry_after.get(class_name, 0):
+                return
+            self._refreshing.add(class_name)
+
+        def run():
+            try:
+                # Another worker may have refreshed it already
+                self._load()
+                entry = self._entries.get(class_name)
+                if entry is None or self._is_stale(entry):
+                    self.refresh(class_name)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(class_name)
+
+        threading.Thread(target=run, name='knowledge-refresh', daemon=True).start()
+
+    def prewarm(self, class_names, force=False):
+        """Fetch every missing (or stale, or with force every) class; returns (stored, failed)."""
+        self._load()
+        stored = failed = 0
+        for class_name in class_names:
+            entry = self._entries.get(class_name)
+            if entry is not None and not force and not self._is_stale(entry):
+                continue
+            if self.refresh(class_name):
+                stored += 1
+            else:
+                failed += 1
+        return stored, failed
+
+    def start(self):
+        """Start the thread that periodically refreshes entries older than the TTL."""
+        if self._refresher is not None or self.refresh_interval <= 0 or self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            if self._refresher is not None:
+                return
+            self._refresher = threading.Thread(target=self._run, name='knowledge-refresher', daemon=True)
+            self._refresher.start()
+
+    def _run(self):
+        while True:
+            # Jitter so the workers of one deployment do not all refresh at the same moment
+            time.sleep(self.refresh_interval * random.uniform(0.8, 1.2))
+            self._load()
+            for class_name, entry in list(self._entries.items()):
+                if self._is_stale(entry):
+                    self.refresh(class_name)
+
+    def stats(self):
+        lookups = self.hits + self.stale_hits + self.misses
+        entries = list(self._entries.values())
+        return {
+            'prompt_version': self.prompt_version,
+            'model': self.model_name,
+            'entries': len(entries),
+            'stale_entries': sum(1 for entry in entries if self._is_stale(entry)),
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.hits + self.stale_hits) / lookups, 3) if lookups else 0.0,
+            'refreshes': self.refreshes,
+            'refresh_failures': self.refresh_failures
+        }
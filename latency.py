@@ -0,0 +1,36 @@
+"""
+Rolling latency percentiles for /status.
+"""
+
+import threading
+from collections import deque
+
+import numpy as np
+
+
+class LatencyTracker:
+    """Keeps the last max_samples durations (seconds) and reports count and percentiles in ms."""
+
+    def __init__(self, max_samples=1000):
+        self._samples = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+
+    def stats(self):
+        with self._lock:
+            samples = np.array(self._samples, dtype=np.float64) * 1000.0
+        if not len(samples):
+            return {'count': self.count}
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        return {
+            'count': self.count,
+            'p50_ms': round(float(p50), 1),
+            'p95_ms': round(float(p95), 1),
+            'p99_ms': round(float(p99), 1),
+            'max_ms': round(float(samples.max()), 1)
+        }
@@ -1,27 +1,45 @@
-from google import genai
 from config import Config
+from semantic_cache import SemanticCache
+from latency import LatencyTracker
+from singleflight import SingleFlight, prompt_key
+from circuit_breaker import CircuitBreaker
 import os
-import requests
-import httpx
+import threading
+import time
 
-# Set up Gemini API key
-try:
-    client = genai.Client(api_key=Config.GEMINI_API_KEY)
-except Exception as e:
-    print(f"Error initializing Gemini client: {e}")
-    client = None
+# The Gemini client (and the google.genai import) is created on first use
+_client = None
+_client_lock = threading.Lock()
+_client_initialized = False
 
-# Function to detect plant disease based on user input
-def detect_disease(symptoms):
-    """
-    Process symptoms and return plant disease information.
-    May raise network-related exceptions if API is unreachable.
-    """
-    if not client:
-        return "Error: Gemini API client could not be initialized. Check your API key."
-    
-    # Fallback response in case of error
-    fallback_response = """
+def get_client():
+    """Return the shared Gemini client, creating it on first use (None if it cannot be created)."""
+    global _client, _client_initialized
+    if _client_initialized:
+        return _client
+    with _client_lock:
+        if not _client_initialized:
+            try:
+                from google import genai
+                from google.genai import types
+                # GEMINI_BASE_URL points the client elsewhere, e.g. at fake_gemini_server.py
+                http_options = types.HttpOptions(base_url=Config.GEMINI_BASE_URL) if Config.GEMINI_BASE_URL else None
+                _client = genai.Client(api_key=Config.GEMINI_API_KEY, http_options=http_options)
+            except Exception as e:
+                print(f"Error initializing Gemini client: {e}")
+                _client = None
+            _client_initialized = True
+    return _client
+
+# Bump when the detect_disease prompt changes so cached answers to the old prompt are not reused
+PROMPT_VERSION = 1
+
+def disease_info_prompt(disease_name):
+    """The symptom text the upload flow sends for a predicted class."""
+    return f"Provide information about the plant disease: {disease_name}"
+
+# Fallback response in case of error
+FALLBACK_RESPONSE = """
     Disease: Unable to determine
 
     Description: The service encountered an error while processing your request.
@@ -39,11 +57,27 @@ def detect_disease(symptoms):
     References:
     - Local agricultural extension services
     """
-    
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=[f"""The user describes the following plant symptoms: {symptoms}. 
+
+class FallbackAnswer(str):
+    """An answer served without Gemini (see fallback_answer); tier says where it came from."""
+
+    def __new__(cls, text, tier):
+        answer = super().__new__(cls, text)
+        answer.tier = tier
+        return answer
+
+def is_fallback_response(text):
+    """Return True for the canned error/fallback texts, which should not be cached."""
+    return (not text or isinstance(text, FallbackAnswer) or text == FALLBACK_RESPONSE
+            or text.startswith("Error:"))
+
+def is_degraded(text):
+    """Return True when text was served in place of a live Gemini answer, so the page can say so."""
+    return isinstance(text, FallbackAnswer) or text == FALLBACK_RESPONSE
+
+def build_prompt(symptoms):
+    """The Gemini prompt for a symptom description."""
+    return f"""The user describes the following plant symptoms: {symptoms}. 
             
             1. First, identify the most likely plant disease based on these symptoms. 
             2. Then provide detailed information about:
@@ -73,19 +107,231 @@ def detect_disease(symptoms):
             - [Reference 3: Author, Title, Source, Year]
             
             Keep your response concise but informative. If you can't determine the disease with confidence, state that clearly.
-            """]
+            """
+
+# Time to the first piece of the answer and to the whole answer, per response mode
+llm_latency = {mode: {'first_byte': LatencyTracker(), 'total': LatencyTracker()}
+               for mode in ('blocking', 'streaming')}
+
+# Answers to earlier symptom descriptions, reused for near-identical wording
+semantic_cache = SemanticCache(threshold=Config.SEMANTIC_CACHE_THRESHOLD,
+                               max_entries=Config.SEMANTIC_CACHE_MAX_ENTRIES,
+                               ttl_seconds=Config.SEMANTIC_CACHE_TTL_SECONDS)
+
+# Coalescing of identical in-flight prompts, optionally across workers through a SQLite lease
+single_flight = SingleFlight(lease_path=Config.LLM_COALESCE_DB_PATH if Config.LLM_COALESCE_ACROSS_WORKERS else None,
+                             lease_seconds=Config.LLM_COALESCE_LEASE_SECONDS,
+                             is_shareable=lambda text: not is_fallback_response(text))
+
+# Opens after consecutive failed Gemini calls; while open, answers come from the fallback tiers
+breaker = CircuitBreaker(failure_threshold=Config.LLM_BREAKER_FAILURES, reset_seconds=Config.LLM_BREAKER_RESET_SECONDS)
+
+# Local answers tried (in order) when Gemini cannot answer; each takes the symptom text and returns text or None
+_fallbacks = []
+fallback_counts = {'semantic_cache': 0, 'local': 0, 'static': 0}
+fallback_reasons = {'breaker_open': 0, 'deadline': 0, 'error': 0}
+_counts_lock = threading.Lock()
+
+def register_fallback(fn):
+    """Add a local answer source (e.g. the stored disease knowledge) tried before the static fallback."""
+    _fallbacks.append(fn)
+    return fn
+
+def fallback_answer(symptoms, reason, use_cache=True):
+    """
+    Best answer available without Gemini, as a FallbackAnswer: the cached
+    answer to a similar description (even past its TTL), then the registered
+    local sources, then FALLBACK_RESPONSE. The cache lookup is the usual one:
+    the usual threshold, and only entries naming the same crops, diseases and
+    negations (semantic_cache.key_terms), so a different crop is never served.
+    """
+    answer, tier = None, 'static'
+    if use_cache and Config.SEMANTIC_CACHE_ENABLED:
+        answer = semantic_cache.get(symptoms, allow_stale=True)
+        if answer is not None:
+            tier = 'semantic_cache'
+    for fn in _fallbacks:
+        if answer is not None:
+            break
+        try:
+            answer = fn(symptoms)
+        except Exception as e:
+            print(f"Fallback answer source failed: {e}")
+        if answer is not None:
+            tier = 'local'
+    with _counts_lock:
+        fallback_counts[tier] += 1
+        fallback_reasons[reason] += 1
+    return FallbackAnswer(answer if answer is not None else FALLBACK_RESPONSE, tier)
+
+class DeadlineExceeded(Exception):
+    """The time budget for an answer ran out before Gemini was asked."""
+
+class IncompleteAnswer(Exception):
+    """A streamed answer broke off (error or deadline) after part of it was already sent."""
+
+# Function to detect plant disease based on user input
+def detect_disease(symptoms, use_cache=True, timeout=None, fallback=True):
+    """
+    Process symptoms and return plant disease information.
+    A description similar enough to one already answered is served from the
+    semantic cache; pass use_cache=False for prompts that differ only in a
+    name (e.g. the per-class prompts of the upload flow).
+    The answer is given within timeout seconds (LLM_TIMEOUT_SECONDS by
+    default). When Gemini fails, times out or the circuit breaker is open,
+    a fallback answer is returned instead of raising; with fallback=False
+    that is always FALLBACK_RESPONSE (callers that store answers use this).
+    """
+    use_cache = use_cache and Config.SEMANTIC_CACHE_ENABLED
+    if use_cache:
+        cached = semantic_cache.get(symptoms)
+        if cached is not None:
+            return cached
+    get_client()  # The first call imports google.genai; that should not count against the deadline
+    deadline = time.monotonic() + (timeout or Config.LLM_TIMEOUT_SECONDS)
+    if not breaker.allow():
+        return _degraded(symptoms, 'breaker_open', use_cache, fallback)
+    start = time.perf_counter()
+    try:
+        result = _generate(symptoms, deadline)
+    except Exception as e:
+        print(f"Error in disease detection API: {e!r}")
+        return _degraded(symptoms, 'deadline' if _is_timeout(e) else 'error', use_cache, fallback)
+    elapsed = time.perf_counter() - start
+    # Nothing reaches the user before the whole answer, so first byte and total are the same
+    llm_latency['blocking']['first_byte'].record(elapsed)
+    llm_latency['blocking']['total'].record(elapsed)
+    if use_cache and not is_fallback_response(result):
+        semantic_cache.put(symptoms, result, seconds=elapsed)
+    return result
+
+def _degraded(symptoms, reason, use_cache, fallback):
+    if not fallback:
+        with _counts_lock:
+            fallback_reasons[reason] += 1
+        return FallbackAnswer(FALLBACK_RESPONSE, 'static')
+    return fallback_answer(symptoms, reason, use_cache)
+
+def stream_disease(symptoms, use_cache=True, timeout=None, fallback=True):
+    """
+    Like detect_disease, but yields the answer in pieces as Gemini generates
+    it. A cached or fallback answer is yielded in one piece. The stream is
+    cut off when the time budget runs out; when that (or any error) happens
+    after some text was yielded, IncompleteAnswer is raised so callers do not
+    mistake the partial text for a whole answer.
+    """
+    use_cache = use_cache and Config.SEMANTIC_CACHE_ENABLED
+    if use_cache:
+        cached = semantic_cache.get(symptoms)
+        if cached is not None:
+            yield cached
+            return
+    client = get_client()
+    if not client:
+        yield "Error: Gemini API client could not be initialized. Check your API key."
+        return
+    deadline = time.monotonic() + (timeout or Config.LLM_TIMEOUT_SECONDS)
+    if not breaker.allow():
+        yield _degraded(symptoms, 'breaker_open', use_cache, fallback)
+        return
+
+    start = time.perf_counter()
+    pieces = []
+    try:
+        stream = client.models.generate_content_stream(model=Config.GEMINI_MODEL, contents=[build_prompt(symptoms)],
+                                                       config=_request_config(deadline))
+        for chunk in stream:
+            text = chunk.text if chunk else None
+            if text:
+                if not pieces:
+                    llm_latency['streaming']['first_byte'].record(time.perf_counter() - start)
+                pieces.append(text)
+                yield text
+            if time.monotonic() >= deadline:
+                # The per-read timeout does not bound a slow trickle of chunks
+                getattr(stream, 'close', lambda: None)()
+                raise DeadlineExceeded('Streaming answer ran past its deadline')
+    except Exception as e:
+        if _counts_as_outage(e):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        print(f"Error streaming disease information: {e!r}")
+        reason = 'deadline' if _is_timeout(e) else 'error'
+        if pieces:
+            with _counts_lock:
+                fallback_reasons[reason] += 1
+            raise IncompleteAnswer('The answer was cut off before it was complete. Please try again.') from e
+        yield _degraded(symptoms, reason, use_cache, fallback)
+        return
+    breaker.record_success()
+
+    elapsed = time.perf_counter() - start
+    llm_latency['streaming']['total'].record(elapsed)
+    result = ''.join(pieces)
+    if use_cache and not is_fallback_response(result):
+        semantic_cache.put(symptoms, result, seconds=elapsed)
+
+def latency_stats():
+    return {mode: {name: tracker.stats() for name, tracker in trackers.items()}
+            for mode, trackers in llm_latency.items()}
+
+def client_stats():
+    """Breaker state, fallback counts and latency percentiles for /status."""
+    with _counts_lock:
+        fallbacks = {'tiers': dict(fallback_counts), 'reasons': dict(fallback_reasons)}
+    return {
+        'timeout_seconds': Config.LLM_TIMEOUT_SECONDS,
+        'breaker': breaker.stats(),
+        'fallbacks': fallbacks,
+        'latency': latency_stats()
+    }
+
+def _generate(symptoms, deadline):
+    if Config.LLM_SINGLE_FLIGHT:
+        # Concurrent identical prompts (e.g. many uploads of one disease) share a single Gemini call
+        return single_flight.do(prompt_key(f"{Config.GEMINI_MODEL}\0{symptoms}"),
+                                lambda: _call_gemini(symptoms, deadline),
+                                timeout=max(0.0, deadline - time.monotonic()))
+    return _call_gemini(symptoms, deadline)
+
+def _request_config(deadline):
+    """Per-request config carrying what is left of the time budget as the HTTP timeout."""
+    from google.genai import types
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded('No time left for a Gemini call')
+    return types.GenerateContentConfig(http_options=types.HttpOptions(timeout=max(1, int(remaining * 1000))))
+
+def _is_timeout(e):
+    return isinstance(e, (TimeoutError, DeadlineExceeded)) or 'timeout' in type(e).__name__.lower()
+
+def _counts_as_outage(e):
+    """Client errors (bad request, bad key) mean Gemini is up; anything else counts toward the breaker."""
+    code = getattr(e, 'code', None)
+    return not (isinstance(code, int) and 400 <= code < 500 and code not in (408, 429))
+
+def _call_gemini(symptoms, deadline):
+    """One Gemini call within the deadline; raises on failure and reports the outcome to the breaker."""
+    client = get_client()
+    if not client:
+        return "Error: Gemini API client could not be initialized. Check your API key."
+    try:
+        response = client.models.generate_content(
+            model=Config.GEMINI_MODEL,
+            contents=[build_prompt(symptoms)],
+            config=_request_config(deadline)
         )
-       
-        return response.text if response else "Unable to determine the disease."
-    
-    except (requests.exceptions.RequestException, httpx.ConnectError) as e:
-        # Network-related errors should be raised to be handled by the caller
+    except DeadlineExceeded:
         raise
-    
     except Exception as e:
-        # Log the error but return a user-friendly message
-        print(f"Error in disease detection API: {e}")
-        return fallback_response
+        if _counts_as_outage(e):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        raise
+    breaker.record_success()
+    return response.text if response else "Unable to determine the disease."
 
 if __name__ == "__main__":
     try:
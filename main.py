@@ -1,13 +1,399 @@
 import numpy as np
 import os
+import io
+import importlib.util
+import threading
+import time
+import weakref
+from PIL import Image
+from config import Config
+from model_registry import registry
+from batching import BatchScheduler
+from numpy_engine import NumpyCNN, missing_weight_shards
+from model_store import ModelSlot, ModelStore, ModelWatcher
+from cascade import CascadeClassifier
+from tiling import predict_tiles
+from cpu_budget import apply_cpu_affinity, configure_tensorflow_threads
+from embedding_index import project
 
-# Try importing TensorFlow, but provide a fallback if it fails
-try:
+# TensorFlow is only imported when a model is first loaded (see _load_keras_model);
+# here we just check that it is installed so worker boot stays fast
+TENSORFLOW_AVAILABLE = importlib.util.find_spec('tensorflow') is not None
+if not TENSORFLOW_AVAILABLE:
+    print("Warning: TensorFlow is not installed. Image-based detection may not work properly.")
+
+# Input size expected by the classifier
+IMAGE_SIZE = (128, 128)
+
+def _load_keras_model(path):
+    """
+    Load a Keras model and wrap it in a tf.function with a fixed
+    [None, 128, 128, 3] float32 signature. Calling the traced function is
+    thread-safe, is traced exactly once for every batch size, and skips the
+    per-call data-adapter overhead of model.predict. With XLA_COMPILE the
+    graph is also compiled by XLA (once per distinct batch size).
+    """
     import tensorflow as tf
-    TENSORFLOW_AVAILABLE = True
-except ImportError:
-    print("Warning: TensorFlow could not be imported. Image-based detection may not work properly.")
-    TENSORFLOW_AVAILABLE = False
+
+    configure_tensorflow_threads(tf)
+    model = tf.keras.models.load_model(path)
+
+    @tf.function(input_signature=[tf.TensorSpec([None, IMAGE_SIZE[0], IMAGE_SIZE[1], 3], tf.float32)],
+                 jit_compile=Config.XLA_COMPILE)
+    def serve(batch):
+        return model(batch, training=False)
+
+    def predict(input_arr):
+        return serve(tf.convert_to_tensor(input_arr, dtype=tf.float32)).numpy()
+
+    return predict, model
+
+def _load_numpy_model(path):
+    """Load the TensorFlow.js model with the NumPy engine (no TensorFlow needed)."""
+    engine = NumpyCNN.load(path, Config.NUMPY_METADATA_PATH)
+    return engine.predict, engine
+
+def _load_tflite_model(path):
+    """Convert the Keras model to TFLite once and serve it from a per-thread interpreter pool."""
+    from tflite_backend import load_tflite_model
+    return load_tflite_model(path, Config.TFLITE_QUANTIZATION,
+                             calibration_folder=Config.TFLITE_CALIBRATION_FOLDER,
+                             load_image_array=load_image_array,
+                             num_threads=Config.TFLITE_NUM_THREADS)
+
+_warmup_state = {'batch_sizes': [], 'seconds': None}
+
+def _warmup(predict):
+    """Run dummy batches of the common sizes so no request pays for tracing, compilation or allocation."""
+    start = time.perf_counter()
+    for size in Config.WARMUP_BATCH_SIZES:
+        predict(np.zeros((size, IMAGE_SIZE[0], IMAGE_SIZE[1], 3), dtype=np.float32))
+    _warmup_state['batch_sizes'] = list(Config.WARMUP_BATCH_SIZES)
+    _warmup_state['seconds'] = round(time.perf_counter() - start, 3)
+    print(f"Warmed up model for batch sizes {Config.WARMUP_BATCH_SIZES} in {_warmup_state['seconds']}s")
+
+def _with_warmup(loader):
+    """Wrap a registry loader so a model is only handed out (and counted as loaded) once it is warm."""
+    def load(path):
+        predict, model = loader(path)
+        _warmup(predict)
+        return predict, model
+    return load
+
+if TENSORFLOW_AVAILABLE:
+    registry.register_loader('keras', _with_warmup(_load_keras_model))
+    registry.register_loader('tflite', _with_warmup(_load_tflite_model))
+registry.register_loader('numpy', _with_warmup(_load_numpy_model))
+
+def active_backend():
+    """Return the inference backend configured for this worker."""
+    if Config.INFERENCE_BACKEND == 'auto':
+        return 'keras' if TENSORFLOW_AVAILABLE else 'numpy'
+    return Config.INFERENCE_BACKEND
+
+# Versioned model store; without an ACTIVE version the configured model file is served
+model_store = ModelStore(Config.MODEL_STORE_DIR)
+model_slot = ModelSlot()
+_slot_lock = threading.Lock()
+
+def _backend_model_path(backend):
+    """Path of the model to serve: the store's active version if there is one, else the configured file."""
+    version = model_store.active_version()
+    if version is None:
+        return Config.NUMPY_MODEL_PATH if backend == 'numpy' else Config.MODEL_PATH
+    if backend == 'numpy':
+        return model_store.model_path(version, 'model.json')
+    keras_path = model_store.model_path(version, 'model.keras')
+    return keras_path if os.path.exists(keras_path) else model_store.model_path(version, 'model.h5')
+
+def _numpy_model_complete(path):
+    """True when model.json and every weight shard its manifest lists exist."""
+    missing = missing_weight_shards(path)
+    if missing:
+        print(f"NumPy model {path} is incomplete, missing: {', '.join(missing)}")
+    return not missing
+
+# Server-side detection works with TensorFlow or, without it, through the NumPy engine
+INFERENCE_AVAILABLE = (_numpy_model_complete(_backend_model_path(active_backend())) if active_backend() == 'numpy'
+                       else TENSORFLOW_AVAILABLE)
+
+def resolve_model():
+    """Return (version, path) of the model that should be served right now."""
+    backend = active_backend()
+    path = _backend_model_path(backend)
+    version = model_store.active_version()
+    if version is not None:
+        return f"{backend}:{version}", path
+    # Unversioned file: identify it by size and modification time so replacing it is noticed
+    try:
+        stat = os.stat(path)
+        return f"{backend}:{os.path.basename(path)}:{stat.st_size}:{int(stat.st_mtime)}", path
+    except OSError:
+        return f"{backend}:{os.path.basename(path)}", path
+
+def model_version():
+    """Identify the served model (backend and version) for cache keys and detection records."""
+    version = model_slot.version or resolve_model()[0]
+    if Config.CASCADE_ENABLED:
+        # Cascade answers differ from the full model's, so they are cached separately
+        version += f"+cascade:{Config.CASCADE_FIRST_STAGE_BACKEND}@{Config.CASCADE_THRESHOLD}"
+    return version
+
+def _load_version(path):
+    # Drop any resident copy first so a file replaced in place is really reloaded
+    backend = active_backend()
+    registry.unload(path, backend)
+    return registry.get(path, backend)
+
+def _release_version(version, model):
+    registry.unload(model.path, model.backend, expected=model)
+    print(f"Released model version {version}")
+
+model_watcher = ModelWatcher(model_slot, resolve_model, _load_version, _release_version,
+                             interval=Config.MODEL_WATCH_SECONDS, drain_timeout=Config.MODEL_DRAIN_TIMEOUT)
+
+def get_model():
+    """Return the warm model for this worker, loading it on first use."""
+    if model_slot.model is None:
+        with _slot_lock:
+            if model_slot.model is None:
+                # Usually already done at process start (post_fork, replica entry); a no-op then
+                apply_cpu_affinity()
+                version, path = resolve_model()
+                model = registry.get(path, active_backend())
+                if Config.CASCADE_ENABLED:
+                    # Load the first stage with the model (warmup, preload) instead of on the first prediction
+                    try:
+                        cascade.first_stage()
+                    except Exception as e:
+                        raise RuntimeError(f"Could not load the cascade first stage "
+                                           f"({Config.CASCADE_FIRST_STAGE_BACKEND}): {e}") from e
+                model_slot.swap(version, model)
+                if Config.MODEL_WATCH_SECONDS > 0:
+                    model_watcher.start()
+    return model_slot.model
+
+def model_version_stats():
+    return dict(model_slot.stats(), store=model_store.active_version() is not None, watcher=model_watcher.stats())
+
+def model_ready():
+    """True once the active model is loaded and warmed up in this worker (or served by the pool)."""
+    if Config.INFERENCE_MODE == 'pool':
+        return INFERENCE_AVAILABLE
+    return model_slot.model is not None
+
+def warmup_stats():
+    return {'ready': model_ready(), 'batch_sizes': _warmup_state['batch_sizes'],
+            'seconds': _warmup_state['seconds'], 'xla': Config.XLA_COMPILE}
+
+def load_image_array(image_path, draft=None):
+    """Load an image file as a float32 array of shape (128, 128, 3)."""
+    with open(image_path, 'rb') as f:
+        return load_image_bytes(f.read(), draft=draft)
+
+_decode_lock = threading.Lock()
+_decode_totals = {'images': 0, 'seconds': 0.0}
+
+def load_image_bytes(data, draft=None):
+    """
+    Decode an in-memory encoded image (bytes or memoryview) into a float32 array of shape (128, 128, 3).
+    With draft decoding, JPEGs are decoded by libjpeg at the smallest DCT scale
+    (1/2, 1/4 or 1/8) that still covers 128x128, so multi-megapixel phone photos
+    never get decoded at full resolution.
+    """
+    if draft is None:
+        draft = Config.JPEG_DRAFT_DECODE
+    start = time.perf_counter()
+    with Image.open(io.BytesIO(data)) as image:
+        if draft:
+            image.draft('RGB', IMAGE_SIZE)
+        # Same conversion and nearest-neighbour resize as keras load_img
+        image = image.convert('RGB').resize(IMAGE_SIZE, Image.NEAREST)
+        array = np.asarray(image, dtype=np.float32)
+    elapsed = time.perf_counter() - start
+    with _decode_lock:
+        _decode_totals['images'] += 1
+        _decode_totals['seconds'] += elapsed
+    return array
+
+def load_image_bytes_full(data, max_side=1024):
+    """
+    Decode an image for tiled inference as a uint8 array, keeping detail up to
+    max_side pixels on the longer side (instead of squashing it to 128x128).
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft('RGB', (max_side, max_side))
+        image = image.convert('RGB')
+        image.thumbnail((max_side, max_side), Image.BILINEAR)
+        return np.asarray(image, dtype=np.uint8)
+
+def decode_stats():
+    with _decode_lock:
+        images = _decode_totals['images']
+        return {
+            'images': images,
+            'avg_decode_ms': round(_decode_totals['seconds'] / images * 1000.0, 3) if images else 0.0,
+            'jpeg_draft': Config.JPEG_DRAFT_DECODE
+        }
+
+_inference_client = None
+_inference_client_lock = threading.Lock()
+
+def inference_client():
+    """Return the client for the shared inference pool (INFERENCE_MODE=pool)."""
+    global _inference_client
+    if _inference_client is None:
+        with _inference_client_lock:
+            if _inference_client is None:
+                from inference_server import InferenceClient
+                _inference_client = InferenceClient(Config.INFERENCE_SERVER_ADDRESS,
+                                                    timeout=Config.INFERENCE_SERVER_TIMEOUT)
+    return _inference_client
+
+def _predict_direct(input_arr):
+    if Config.INFERENCE_MODE == 'pool':
+        # The model lives in the inference server's replicas, not in this worker
+        return inference_client().predict(input_arr)
+    return predict_local(input_arr)
+
+def _first_stage_predict():
+    backend = Config.CASCADE_FIRST_STAGE_BACKEND
+    # The NumPy first stage is the small TensorFlow.js model; TFLite is derived from the served model
+    path = Config.NUMPY_MODEL_PATH if backend == 'numpy' else _backend_model_path(backend)
+    return registry.get(path, backend).predict
+
+def _check_cascade_first_stage():
+    """Refuse to start with CASCADE_ENABLED when the first stage cannot possibly load."""
+    backend = Config.CASCADE_FIRST_STAGE_BACKEND
+    if backend not in ('numpy', 'tflite'):
+        raise RuntimeError(f"CASCADE_FIRST_STAGE_BACKEND must be 'numpy' or 'tflite', not {backend!r}")
+    if backend == 'numpy':
+        missing = missing_weight_shards(Config.NUMPY_MODEL_PATH)
+        if missing:
+            raise RuntimeError(f"CASCADE_ENABLED=true, but the NumPy first-stage model {Config.NUMPY_MODEL_PATH} is "
+                               f"incomplete (missing {', '.join(missing)}). Restore the files, set "
+                               f"CASCADE_FIRST_STAGE_BACKEND=tflite or set CASCADE_ENABLED=false.")
+    elif not TENSORFLOW_AVAILABLE:
+        raise RuntimeError("CASCADE_FIRST_STAGE_BACKEND=tflite needs TensorFlow to convert the served model")
+
+# Optional early-exit cascade in front of the full model
+if Config.CASCADE_ENABLED:
+    _check_cascade_first_stage()
+cascade = CascadeClassifier(_first_stage_predict, threshold=Config.CASCADE_THRESHOLD)
+
+def predict_local(input_arr):
+    """Run a batch on the model loaded in this process, holding a lease so a hot swap waits for it."""
+    get_model()
+    with model_slot.lease() as model:
+        if Config.CASCADE_ENABLED:
+            return cascade.predict(input_arr, model.predict)
+        return model.predict(input_arr)
+
+_embedders = weakref.WeakKeyDictionary()
+_embedders_lock = threading.Lock()
+
+def _build_embedder(model):
+    """Return a function mapping a batch to the penultimate-layer activations of a LoadedModel."""
+    if model.backend == 'numpy':
+        return model.model.embed
+    if model.backend != 'keras':
+        raise ValueError(f"Embeddings are not available for the '{model.backend}' backend")
+    import tensorflow as tf
+
+    features = tf.keras.Model(model.model.inputs[0], model.model.layers[-2].output)
+
+    @tf.function(input_signature=[tf.TensorSpec([None, IMAGE_SIZE[0], IMAGE_SIZE[1], 3], tf.float32)])
+    def serve(batch):
+        output = features(batch, training=False)
+        return tf.reshape(output, [tf.shape(output)[0], -1])
+
+    return lambda input_arr: serve(tf.convert_to_tensor(input_arr, dtype=tf.float32)).numpy()
+
+def embed_images(input_arr):
+    """
+    Return (model_version, vectors): the served model's penultimate-layer
+    features for a batch, projected to EMBEDDING_DIM and L2-normalised.
+    Embeddings from different model versions are not comparable, so callers
+    keep them apart by version.
+    """
+    if Config.INFERENCE_MODE == 'pool':
+        raise ValueError("Embeddings are computed in-process and are not available in pool mode")
+    get_model()
+    with model_slot.lease() as model:
+        with _embedders_lock:
+            embedder = _embedders.get(model)
+            if embedder is None:
+                embedder = _embedders[model] = _build_embedder(model)
+        version = model_slot.version
+        features = embedder(input_arr)
+    return version, project(features, Config.EMBEDDING_DIM)
+
+# Concurrent requests share forward passes through the micro-batching scheduler
+batch_scheduler = BatchScheduler(_predict_direct,
+                                 max_batch_size=Config.INFERENCE_BATCH_MAX_SIZE,
+                                 max_wait_ms=Config.INFERENCE_BATCH_MAX_WAIT_MS)
+
+def predict_probabilities(input_arr):
+    """Run a batch of shape (N, 128, 128, 3) through the model and return class probabilities."""
+    if Config.INFERENCE_BATCHING:
+        return batch_scheduler.submit(input_arr)
+    return _predict_direct(input_arr)
+
+def iter_batch_predictions(items, decode, executor, chunk_size=32):
+    """
+    Classify an iterable of (name, source) pairs in chunks.
+    Each chunk is decoded in parallel on executor with decode(source) and run as
+    one batch, so only chunk_size images are held in memory at a time.
+    Yields (name, probabilities, error) with error set when decoding failed.
+    """
+    def safe_decode(source):
+        try:
+            return decode(source), None
+        except Exception as e:
+            return None, str(e)
+
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield from _predict_chunk(chunk, safe_decode, executor)
+            chunk = []
+    if chunk:
+        yield from _predict_chunk(chunk, safe_decode, executor)
+
+def _predict_chunk(chunk, safe_decode, executor):
+    decoded = list(executor.map(safe_decode, [source for _, source in chunk]))
+    arrays = [array for array, error in decoded if error is None]
+    predictions = iter(predict_probabilities(np.stack(arrays)) if arrays else [])
+    for (name, _), (array, error) in zip(chunk, decoded):
+        if error is not None:
+            yield name, None, error
+        else:
+            yield name, next(predictions), None
+
+def predict_image_array(image_array):
+    """
+    Classify one decoded image of shape (128, 128, 3).
+    Returns (result_index, confidence, probabilities); result_index is -1 below the confidence threshold.
+    """
+    probabilities = predict_probabilities(image_array[np.newaxis])[0]
+    result_index = int(np.argmax(probabilities))
+    confidence = float(probabilities[result_index])
+    if confidence <= Config.MODEL_CONFIDENCE_THRESHOLD:
+        result_index = -1
+    return result_index, confidence, probabilities
+
+def predict_image_tiled(data):
+    """Classify overlapping 128x128 patches of a high-resolution upload; see tiling.predict_tiles."""
+    image = load_image_bytes_full(data, Config.TILE_MAX_SIDE)
+    result = predict_tiles(image, predict_probabilities, class_names,
+                           stride=Config.TILE_STRIDE, batch_size=Config.TILE_BATCH_SIZE)
+    result['image_size'] = [int(image.shape[1]), int(image.shape[0])]
+    return result
+
+def predict_image_bytes(data):
+    """Classify one encoded image; see predict_image_array."""
+    return predict_image_array(load_image_bytes(data))
 
 def model_prediction(image_path, verbose=False):
     """
@@ -15,17 +401,14 @@ def model_prediction(image_path, verbose=False):
     Returns the index of the detected disease or -1 if detection fails or model has low confidence.
     """
     try:
-        if not TENSORFLOW_AVAILABLE:
-            print("Error: TensorFlow is not available. Cannot make predictions.")
+        if not INFERENCE_AVAILABLE:
+            print("Error: No inference backend is available. Cannot make predictions.")
             return -1
             
-        model = tf.keras.models.load_model('model.h5')
-        image = tf.keras.preprocessing.image.load_img(image_path, target_size=(128, 128))
-        input_arr = tf.keras.preprocessing.image.img_to_array(image)
-        input_arr = np.array([input_arr])
-        prediction = model.predict(input_arr, verbose=verbose)
+        input_arr = np.array([load_image_array(image_path)])
+        prediction = predict_probabilities(input_arr)
         result_index = np.argmax(prediction)
-        return result_index if prediction[0][result_index] > 0.4 else -1
+        return result_index if prediction[0][result_index] > Config.MODEL_CONFIDENCE_THRESHOLD else -1
     except Exception as e:
         print(f"Error in model prediction: {e}")
         return -1
@@ -0,0 +1,117 @@
+"""
+Process-wide registry of warm inference models.
+
+Each model is loaded once per worker process and kept resident, so request
+handlers no longer pay the deserialization and graph-building cost on every
+call. Loaders are registered per backend and must return a predict callable
+that is safe to call from multiple request threads at once.
+"""
+
+import threading
+import time
+import resource
+
+
+def current_rss_bytes():
+    """Return the resident set size of this process in bytes."""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        # Not Linux: fall back to the peak RSS reported by getrusage (KiB)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class LoadedModel:
+    """A resident model and the bookkeeping reported through /status."""
+
+    def __init__(self, key, backend, path, predict, load_seconds, rss_delta_bytes, model=None):
+        self.key = key
+        self.backend = backend
+        self.path = path
+        self.predict = predict
+        self.model = model
+        self.load_seconds = load_seconds
+        self.rss_delta_bytes = rss_delta_bytes
+        self.loaded_at = time.time()
+
+    def describe(self):
+        return {
+            'backend': self.backend,
+            'path': self.path,
+            'load_seconds': round(self.load_seconds, 3),
+            'rss_delta_mb': round(self.rss_delta_bytes / (1024 * 1024), 1),
+            'loaded_at': self.loaded_at
+        }
+
+
+class ModelRegistry:
+    """Loads each (backend, path) pair once and hands out the resident copy."""
+
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._load_locks = {}
+        self._lock = threading.Lock()
+
+    def register_loader(self, backend, loader):
+        """
+        Register a loader for a backend name.
+        The loader takes a model path and returns (predict_callable, model_object).
+        """
+        self._loaders[backend] = loader
+
+    def get(self, path, backend='keras'):
+        """Return the LoadedModel for path, loading it on first use."""
+        key = (backend, path)
+        entry = self._models.get(key)
+        if entry is not None:
+            return entry
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Only one thread loads a given model; the others wait for it
+        with load_lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                return entry
+
+            loader = self._loaders.get(backend)
+            if loader is None:
+                raise ValueError(f"No model loader registered for backend '{backend}'")
+
+            rss_before = current_rss_bytes()
+            start = time.perf_counter()
+            predict, model = loader(path)
+            load_seconds = time.perf_counter() - start
+            entry = LoadedModel(key, backend, path, predict, load_seconds,
+                                current_rss_bytes() - rss_before, model=model)
+            self._models[key] = entry
+            print(f"Loaded {backend} model from {path} in {load_seconds:.2f}s")
+            return entry
+
+    def is_loaded(self, path, backend='keras'):
+        return (backend, path) in self._models
+
+    def unload(self, path, backend='keras', expected=None):
+        """
+        Drop a resident model so the next get() reloads it.
+        With expected, only drop it if it is still that LoadedModel.
+        """
+        with self._lock:
+            key = (backend, path)
+            if expected is not None and self._models.get(key) is not expected:
+                return False
+            return self._models.pop(key, None) is not None
+
+    def stats(self):
+        return {
+            'process_rss_mb': round(current_rss_bytes() / (1024 * 1024), 1),
+            'models': [entry.describe() for entry in list(self._models.values())]
+        }
+
+
+# Shared registry for this worker process
+registry = ModelRegistry()
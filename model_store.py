@@ -0,0 +1,225 @@
+"""
+Versioned model store and hot swapping of the served model.
+
+Layout of MODEL_STORE_DIR:
+
+    versions/<version>/model.h5     (Keras / TFLite backends)
+    versions/<version>/model.json   (NumPy engine, with its weight shards)
+    ACTIVE                          (name of the version to serve)
+
+Workers poll ACTIVE (see ModelWatcher). When it changes, the new version is
+loaded and warmed in the background, swapped in atomically, and the old one
+is dropped once the requests still running on it have finished.
+
+Usage:
+    python model_store.py publish model.h5 --version 2024-06-01 --activate
+    python model_store.py activate 2024-05-01
+    python model_store.py list
+"""
+
+import argparse
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+from config import Config
+
+
+class ModelStore:
+    """A directory of model versions plus an ACTIVE pointer file."""
+
+    def __init__(self, root):
+        self.root = root
+        self.versions_dir = os.path.join(root, 'versions')
+        self.active_file = os.path.join(root, 'ACTIVE')
+
+    def versions(self):
+        if not os.path.isdir(self.versions_dir):
+            return []
+        return sorted(v for v in os.listdir(self.versions_dir) if os.path.isdir(os.path.join(self.versions_dir, v)))
+
+    def active_version(self):
+        """Return the active version name, or None when the store is empty or not set up."""
+        try:
+            with open(self.active_file) as f:
+                version = f.read().strip()
+        except OSError:
+            return None
+        return version or None
+
+    def model_path(self, version, filename):
+        return os.path.join(self.versions_dir, version, filename)
+
+    def publish(self, source, version, activate=False):
+        """Copy a model file (or a directory such as a TensorFlow.js export) in as a new version."""
+        target = os.path.join(self.versions_dir, version)
+        if os.path.exists(target):
+            raise ValueError(f"Model version '{version}' already exists")
+        # Copy under a temporary name first so watchers never see a half-written version
+        tmp_target = f"{target}.tmp"
+        if os.path.isdir(source):
+            shutil.copytree(source, tmp_target)
+        else:
+            # Single files are stored as model<ext> (model.h5, model.keras, ...)
+            os.makedirs(tmp_target)
+            shutil.copy2(source, os.path.join(tmp_target, 'model' + os.path.splitext(source)[1]))
+        os.replace(tmp_target, target)
+        if activate:
+            self.activate(version)
+        return target
+
+    def activate(self, version):
+        if version not in self.versions():
+            raise ValueError(f"Unknown model version '{version}'")
+        tmp_file = f"{self.active_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w') as f:
+            f.write(version + '\n')
+        os.replace(tmp_file, self.active_file)
+
+
+class ModelSlot:
+    """
+    Holds the model currently being served. Requests lease it for the length
+    of a forward pass, so a swap can wait for the old model to drain before
+    it is released.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self.version = None
+        self.model = None
+        self.activated_at = None
+        self._in_flight = {}
+        self.swaps = 0
+
+    @contextmanager
+    def lease(self):
+        with self._condition:
+            version, model = self.version, self.model
+            self._in_flight[version] = self._in_flight.get(version, 0) + 1
+        try:
+            yield model
+        finally:
+            with self._condition:
+                self._in_flight[version] -= 1
+                if not self._in_flight[version]:
+                    del self._in_flight[version]
+                    self._condition.notify_all()
+
+    def swap(self, version, model):
+        """Make model the served one; returns the (version, model) it replaced."""
+        with self._condition:
+            previous = (self.version, self.model)
+            self.version, self.model = version, model
+            self.activated_at = time.time()
+            if previous[1] is not None:
+                self.swaps += 1
+            return previous
+
+    def drain(self, version, timeout=60.0):
+        """Wait until no request is running on version; returns False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(lambda: version not in self._in_flight, timeout=timeout)
+
+    def stats(self):
+        with self._condition:
+            return {
+                'version': self.version,
+                'load_seconds': round(self.model.load_seconds, 3) if self.model is not None else None,
+                'activated_at': self.activated_at,
+                'swaps': self.swaps,
+                'in_flight': dict(self._in_flight)
+            }
+
+
+class ModelWatcher:
+    """
+    Background thread that polls resolve() -> (version, path) and hot-swaps
+    the slot when the version changes. load(path) must return a warm model;
+    release(version, model) is called once the old model has drained.
+    """
+
+    def __init__(self, slot, resolve, load, release, interval=5.0, drain_timeout=60.0):
+        self.slot = slot
+        self.resolve = resolve
+        self.load = load
+        self.release = release
+        self.interval = interval
+        self.drain_timeout = drain_timeout
+        self.failed_version = None
+        self.last_error = None
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='model-watcher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Model watcher error: {e}")
+
+    def check(self):
+        """Swap in the active version if it changed; returns True when a swap happened."""
+        version, path = self.resolve()
+        if version == self.slot.version or version == self.failed_version:
+            return False
+        print(f"Loading model version {version} in the background")
+        try:
+            model = self.load(path)
+        except Exception as e:
+            # Keep serving the current version; retry only when the active version changes again
+            print(f"Could not load model version {version}, keeping {self.slot.version}: {e}")
+            self.failed_version, self.last_error = version, str(e)
+            return False
+        old_version, old_model = self.slot.swap(version, model)
+        self.failed_version = self.last_error = None
+        print(f"Now serving model version {version} (was {old_version})")
+        if old_model is not None:
+            if not self.slot.drain(old_version, timeout=self.drain_timeout):
+                print(f"Model version {old_version} still busy after {self.drain_timeout}s; releasing anyway")
+            self.release(old_version, old_model)
+        return True
+
+    def stats(self):
+        return {
+            'poll_seconds': self.interval,
+            'running': self._thread is not None,
+            'failed_version': self.failed_version,
+            'last_error': self.last_error
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the versioned model store.')
+    parser.add_argument('--store', default=Config.MODEL_STORE_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    publish = commands.add_parser('publish', help='Copy a model file or directory in as a new version')
+    publish.add_argument('source')
+    publish.add_argument('--version', required=True)
+    publish.add_argument('--activate', action='store_true')
+    activate = commands.add_parser('activate', help='Point ACTIVE at an existing version')
+    activate.add_argument('version')
+    commands.add_parser('list', help='List versions')
+    args = parser.parse_args()
+
+    store = ModelStore(args.store)
+    if args.command == 'publish':
+        print(f"Published {store.publish(args.source, args.version, activate=args.activate)}")
+    elif args.command == 'activate':
+        store.activate(args.version)
+        print(f"Active model version: {args.version}")
+    else:
+        active = store.active_version()
+        for version in store.versions():
+            print(f"{'*' if version == active else ' '} {version}")
+
+
+if __name__ == '__main__':
+    main()
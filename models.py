@@ -48,4 +48,24 @@ class DiseaseDetection(db.Model):
     detected_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     status = db.Column(db.String(20), default='active')  # active, resolved, false_positive
     treatment_notes = db.Column(db.Text)
-    weather_conditions = db.Column(db.Text)  # JSON stored as text for SQLite compatibility 
\ No newline at end of file
+    weather_conditions = db.Column(db.Text)  # JSON stored as text for SQLite compatibility
+    image_hash = db.Column(db.String(16))  # Perceptual (dHash) of the image, hex encoded
+    model_version = db.Column(db.String(128))  # Model version that produced the prediction
+
+def add_missing_columns():
+    """
+    Add columns that were introduced after a table was first created.
+    db.create_all() only creates missing tables, so existing databases need
+    new nullable columns added explicitly.
+    """
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                with db.engine.begin() as conn:
+                    conn.execute(db.text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+                print(f"Added column {table.name}.{column.name}") 
\ No newline at end of file
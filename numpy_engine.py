@@ -0,0 +1,293 @@
+"""
+TensorFlow-free inference engine for small TensorFlow.js layers models.
+
+Runs the topology emitted by simple_convert.py (Conv2D -> MaxPooling2D ->
+Flatten -> Dense) in pure NumPy: weights are memory-mapped straight from the
+.bin shards listed in the weights manifest, convolutions use im2col followed
+by a single GEMM, and the dense layer is one batched matrix multiply.
+
+Usage:
+    python numpy_engine.py --images input_folder
+    python numpy_engine.py --parity    # compare against Keras (requires TensorFlow)
+
+tests/test_numpy_engine.py checks the same parity automatically on a small exported model.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+SUPPORTED_LAYERS = ('InputLayer', 'Conv2D', 'MaxPooling2D', 'Flatten', 'Dense')
+
+
+def _activation(name, x):
+    if name in (None, 'linear'):
+        return x
+    if name == 'relu':
+        return np.maximum(x, 0, out=x)
+    if name == 'sigmoid':
+        return 1.0 / (1.0 + np.exp(-x))
+    if name == 'softmax':
+        x = x - x.max(axis=-1, keepdims=True)
+        np.exp(x, out=x)
+        x /= x.sum(axis=-1, keepdims=True)
+        return x
+    raise ValueError(f"Unsupported activation: {name}")
+
+
+def _same_padding(size, kernel, stride):
+    """TensorFlow 'same' padding split as (before, after)."""
+    out = -(-size // stride)
+    total = max((out - 1) * stride + kernel - size, 0)
+    return total // 2, total - total // 2
+
+
+def missing_weight_shards(model_json_path):
+    """Return the files a model needs that do not exist: model.json itself or shards from its manifest."""
+    if not os.path.exists(model_json_path):
+        return [model_json_path]
+    try:
+        with open(model_json_path) as f:
+            manifest = json.load(f).get('weightsManifest', [])
+    except (OSError, ValueError):
+        return [model_json_path]
+    base_dir = os.path.dirname(os.path.abspath(model_json_path))
+    return [path for group in manifest for path in group['paths']
+            if not os.path.exists(os.path.join(base_dir, path))]
+
+
+def load_weights(model_json_path, manifest):
+    """
+    Map every weight in a TensorFlow.js weights manifest to a NumPy array.
+    Weights that sit inside a single shard are memory-mapped in place; only
+    weights that straddle shard boundaries are read into memory.
+    """
+    base_dir = os.path.dirname(os.path.abspath(model_json_path))
+    missing = [p for group in manifest for p in group['paths'] if not os.path.exists(os.path.join(base_dir, p))]
+    if missing:
+        raise FileNotFoundError(f"Weight shards missing next to {model_json_path}: {', '.join(missing)}")
+    weights = {}
+    for group in manifest:
+        shards = [os.path.join(base_dir, p) for p in group['paths']]
+        sizes = [os.path.getsize(p) for p in shards]
+        starts = np.cumsum([0] + sizes)
+        offset = 0
+        joined = None  # All shards of the group, read once the first straddling weight needs them
+        for spec in group['weights']:
+            if spec.get('dtype', 'float32') != 'float32':
+                raise ValueError(f"Unsupported weight dtype for {spec['name']}: {spec['dtype']}")
+            shape = tuple(spec['shape'])
+            nbytes = int(np.prod(shape)) * 4
+            shard = int(np.searchsorted(starts, offset, side='right')) - 1
+            local = offset - starts[shard]
+            if local + nbytes <= sizes[shard]:
+                weights[spec['name']] = np.memmap(shards[shard], dtype=np.float32, mode='r',
+                                                  offset=int(local), shape=shape)
+            else:
+                if joined is None:
+                    joined = bytearray()
+                    for path in shards:
+                        with open(path, 'rb') as f:
+                            joined += f.read()
+                weights[spec['name']] = np.frombuffer(joined, dtype=np.float32,
+                                                      count=nbytes // 4, offset=offset).reshape(shape)
+            offset += nbytes
+    return weights
+
+
+class NumpyCNN:
+    """A Sequential layers model evaluated with NumPy."""
+
+    def __init__(self, layers, weights, input_scale=1.0):
+        self.layers = layers
+        self.weights = weights
+        self.input_scale = input_scale
+        self._prepared = {}
+        for layer in layers:
+            if layer['class_name'] not in SUPPORTED_LAYERS:
+                raise ValueError(f"Unsupported layer type: {layer['class_name']}")
+            if layer['class_name'] == 'Conv2D':
+                name = layer['config']['name']
+                kernel = weights[f'{name}/kernel']
+                kh, kw, channels, filters = kernel.shape
+                # Flatten to the (kh, kw, C) column order produced by _im2col
+                self._prepared[name] = np.ascontiguousarray(kernel).reshape(kh * kw * channels, filters)
+
+    @classmethod
+    def load(cls, model_json_path, metadata_path=None):
+        """Load model.json and its weight shards; metadata.json supplies input normalization."""
+        with open(model_json_path) as f:
+            model_json = json.load(f)
+        topology = model_json['modelTopology']
+        model_config = topology.get('model_config', topology)
+        layers = model_config['config']['layers']
+        weights = load_weights(model_json_path, model_json['weightsManifest'])
+
+        input_scale = 1.0
+        if metadata_path and os.path.exists(metadata_path):
+            with open(metadata_path) as f:
+                metadata = json.load(f)
+            if metadata.get('preprocessingParams', {}).get('normalization') == 'divide-by-255':
+                input_scale = 1.0 / 255.0
+        return cls(layers, weights, input_scale=input_scale)
+
+    def _im2col(self, x, kh, kw, sh, sw):
+        """Return columns of shape (N, OH, OW, kh * kw * C) built from strided views."""
+        windows = sliding_window_view(x, (kh, kw), axis=(1, 2))[:, ::sh, ::sw]
+        # (N, OH, OW, C, kh, kw) -> (N, OH, OW, kh, kw, C); reshape makes the one copy
+        windows = windows.transpose(0, 1, 2, 4, 5, 3)
+        n, oh, ow = windows.shape[:3]
+        return windows.reshape(n, oh, ow, -1)
+
+    def _conv2d(self, x, config):
+        name = config['name']
+        kernel = self._prepared[name]
+        kh, kw = config['kernel_size']
+        sh, sw = config.get('strides', [1, 1])
+        if config.get('dilation_rate', [1, 1]) != [1, 1]:
+            raise ValueError("Dilated convolutions are not supported")
+        if config.get('padding', 'valid') == 'same':
+            pad_h = _same_padding(x.shape[1], kh, sh)
+            pad_w = _same_padding(x.shape[2], kw, sw)
+            x = np.pad(x, ((0, 0), pad_h, pad_w, (0, 0)))
+        cols = self._im2col(x, kh, kw, sh, sw)
+        out = cols @ kernel
+        if config.get('use_bias', True):
+            out += self.weights[f'{name}/bias']
+        return _activation(config.get('activation'), out)
+
+    def _max_pool(self, x, config):
+        ph, pw = config['pool_size']
+        sh, sw = config.get('strides') or config['pool_size']
+        if config.get('padding', 'valid') == 'same':
+            pad_h = _same_padding(x.shape[1], ph, sh)
+            pad_w = _same_padding(x.shape[2], pw, sw)
+            x = np.pad(x, ((0, 0), pad_h, pad_w, (0, 0)), constant_values=-np.inf)
+        if (ph, pw) == (sh, sw):
+            # Non-overlapping windows: crop and reduce over a reshaped view
+            n, h, w, c = x.shape
+            oh, ow = h // ph, w // pw
+            x = x[:, :oh * ph, :ow * pw]
+            return x.reshape(n, oh, ph, ow, pw, c).max(axis=(2, 4))
+        windows = sliding_window_view(x, (ph, pw), axis=(1, 2))[:, ::sh, ::sw]
+        return windows.max(axis=(-2, -1))
+
+    def _dense(self, x, config):
+        name = config['name']
+        out = x @ self.weights[f'{name}/kernel']
+        if config.get('use_bias', True):
+            out += self.weights[f'{name}/bias']
+        return _activation(config.get('activation'), out)
+
+    def _forward(self, x, layers=None):
+        for layer in self.layers if layers is None else layers:
+            kind = layer['class_name']
+            config = layer['config']
+            if kind == 'Conv2D':
+                x = self._conv2d(x, config)
+            elif kind == 'MaxPooling2D':
+                x = self._max_pool(x, config)
+            elif kind == 'Flatten':
+                x = x.reshape(len(x), -1)
+            elif kind == 'Dense':
+                x = self._dense(x, config)
+        return x
+
+    def predict(self, batch, chunk_size=32):
+        """Return class probabilities for a batch of shape (N, H, W, C)."""
+        batch = np.asarray(batch, dtype=np.float32)
+        if self.input_scale != 1.0:
+            batch = batch * np.float32(self.input_scale)
+        # Bound the im2col buffers by evaluating large batches in chunks
+        outputs = [self._forward(batch[i:i + chunk_size]) for i in range(0, len(batch), chunk_size)]
+        return outputs[0] if len(outputs) == 1 else np.concatenate(outputs)
+
+    def embed(self, batch, chunk_size=32):
+        """Return the (N, features) activations feeding the output layer (the penultimate layer)."""
+        batch = np.asarray(batch, dtype=np.float32)
+        if self.input_scale != 1.0:
+            batch = batch * np.float32(self.input_scale)
+        outputs = [self._forward(batch[i:i + chunk_size], self.layers[:-1]).reshape(len(batch[i:i + chunk_size]), -1)
+                   for i in range(0, len(batch), chunk_size)]
+        return outputs[0] if len(outputs) == 1 else np.concatenate(outputs)
+
+    def to_keras(self):
+        """Build the equivalent Keras model with the same weights (requires TensorFlow)."""
+        import tensorflow as tf
+
+        model = tf.keras.Sequential()
+        for layer in self.layers:
+            kind = layer['class_name']
+            config = layer['config']
+            if kind == 'InputLayer':
+                shape = config.get('batch_input_shape') or config.get('batch_shape')
+                model.add(tf.keras.Input(shape=tuple(shape[1:])))
+            elif kind == 'Conv2D':
+                model.add(tf.keras.layers.Conv2D(config['filters'], tuple(config['kernel_size']),
+                                                 strides=tuple(config.get('strides', [1, 1])),
+                                                 padding=config.get('padding', 'valid'),
+                                                 activation=config.get('activation'),
+                                                 use_bias=config.get('use_bias', True),
+                                                 name=config['name']))
+            elif kind == 'MaxPooling2D':
+                model.add(tf.keras.layers.MaxPooling2D(tuple(config['pool_size']),
+                                                       strides=tuple(config.get('strides') or config['pool_size']),
+                                                       padding=config.get('padding', 'valid'),
+                                                       name=config['name']))
+            elif kind == 'Flatten':
+                model.add(tf.keras.layers.Flatten(name=config['name']))
+            elif kind == 'Dense':
+                model.add(tf.keras.layers.Dense(config['units'], activation=config.get('activation'),
+                                                use_bias=config.get('use_bias', True), name=config['name']))
+        for layer in model.layers:
+            if not layer.weights:
+                continue
+            params = [self.weights[f'{layer.name}/kernel']]
+            if f'{layer.name}/bias' in self.weights:
+                params.append(self.weights[f'{layer.name}/bias'])
+            layer.set_weights([np.asarray(p) for p in params])
+        return model
+
+
+def check_parity(model_json_path, metadata_path, image_folder, tolerance=1e-4):
+    """Compare NumPy and Keras outputs on the images in image_folder. Returns True when they match."""
+    from main import load_image_array
+
+    engine = NumpyCNN.load(model_json_path, metadata_path)
+    keras_model = engine.to_keras()
+    names = sorted(f for f in os.listdir(image_folder) if f.lower().endswith(('.png', '.jpg', '.jpeg')))
+    batch = np.stack([load_image_array(os.path.join(image_folder, f)) for f in names])
+
+    numpy_out = engine.predict(batch)
+    keras_out = keras_model.predict(batch * np.float32(engine.input_scale), verbose=0)
+    max_diff = float(np.abs(numpy_out - keras_out).max())
+    same_top1 = int((numpy_out.argmax(axis=1) == keras_out.argmax(axis=1)).sum())
+    print(f"Compared {len(names)} images: max |diff| = {max_diff:.2e}, top-1 agreement {same_top1}/{len(names)}")
+    return max_diff <= tolerance and same_top1 == len(names)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='NumPy inference engine for TensorFlow.js layers models.')
+    parser.add_argument('--model', default=os.path.join('static', 'model', 'tfjs_model', 'model.json'))
+    parser.add_argument('--metadata', default=os.path.join('static', 'model', 'metadata.json'))
+    parser.add_argument('--images', default='input_folder')
+    parser.add_argument('--parity', action='store_true', help='Check outputs against Keras')
+    parser.add_argument('--tolerance', type=float, default=1e-4)
+    args = parser.parse_args()
+
+    if args.parity:
+        ok = check_parity(args.model, args.metadata, args.images, tolerance=args.tolerance)
+        print("Parity check passed" if ok else "Parity check FAILED")
+        sys.exit(0 if ok else 1)
+
+    from main import class_names, load_image_array
+
+    engine = NumpyCNN.load(args.model, args.metadata)
+    for name in sorted(os.listdir(args.images)):
+        if name.lower().endswith(('.png', '.jpg', '.jpeg')):
+            probabilities = engine.predict(load_image_array(os.path.join(args.images, name))[np.newaxis])[0]
+            print(f"{name}: {class_names[int(np.argmax(probabilities))]} ({probabilities.max():.3f})")
@@ -0,0 +1,105 @@
+"""
+Perceptual hashing and near-duplicate lookup for uploaded images.
+
+dhash() reduces an image to a 64-bit difference hash that survives
+re-encoding, resizing and small crops. HammingIndex finds stored hashes within
+a Hamming distance threshold using multi-index hashing: the 64 bits are split
+into threshold + 1 chunks, so any match must agree exactly on at least one
+chunk (pigeonhole) and only the hashes sharing a chunk value are compared.
+"""
+
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+HASH_BITS = 64
+
+
+def dhash(image_array, hash_size=8):
+    """Return the 64-bit difference hash of an (H, W, 3) image array as an int."""
+    gray = np.asarray(image_array, dtype=np.float32) @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    small = Image.fromarray(gray.astype(np.uint8)).resize((hash_size + 1, hash_size), Image.BOX)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hash_to_hex(value):
+    return f"{value:016x}"
+
+
+def hex_to_hash(text):
+    return int(text, 16)
+
+
+class HammingIndex:
+    """Multi-index hash table for Hamming-distance range queries over 64-bit hashes."""
+
+    def __init__(self, max_distance=4):
+        self.max_distance = max_distance
+        chunks = max_distance + 1
+        bounds = np.linspace(0, HASH_BITS, chunks + 1).astype(int)
+        # (shift, mask) for each chunk of the hash
+        self._chunks = [(int(lo), (1 << int(hi - lo)) - 1) for lo, hi in zip(bounds[:-1], bounds[1:])]
+        self._tables = [dict() for _ in self._chunks]
+        self._hashes = np.zeros(1024, dtype=np.uint64)
+        self._size = 0
+        self._payloads = []
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.matches = 0
+        self._lookup_seconds = 0.0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, value, payload):
+        with self._lock:
+            slot = self._size
+            if slot == len(self._hashes):
+                self._hashes = np.concatenate([self._hashes, np.zeros_like(self._hashes)])
+            self._hashes[slot] = value
+            self._payloads.append(payload)
+            self._size += 1
+            for table, (shift, mask) in zip(self._tables, self._chunks):
+                table.setdefault((value >> shift) & mask, []).append(slot)
+
+    def clear(self):
+        with self._lock:
+            self._tables = [dict() for _ in self._chunks]
+            self._size = 0
+            self._payloads = []
+
+    def nearest(self, value, max_distance=None):
+        """Return (distance, payload) of the closest stored hash within max_distance, or None."""
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        start = time.perf_counter()
+        best = None
+        # Under the lock: a concurrent clear() or add() swaps the tables, payloads and hash array
+        with self._lock:
+            buckets = [table[key] for table, (shift, mask) in zip(self._tables, self._chunks)
+                       if (key := (value >> shift) & mask) in table]
+            if buckets:
+                # Candidates share at least one chunk; verify them with one vectorised popcount
+                slots = np.fromiter((slot for bucket in buckets for slot in bucket), dtype=np.int64)
+                distances = np.bitwise_count(self._hashes[slots] ^ np.uint64(value))
+                closest = int(np.argmin(distances))
+                if distances[closest] <= max_distance:
+                    best = (int(distances[closest]), self._payloads[int(slots[closest])])
+            self.lookups += 1
+            if best is not None:
+                self.matches += 1
+            self._lookup_seconds += time.perf_counter() - start
+        return best
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hashes': self._size,
+                'max_distance': self.max_distance,
+                'lookups': self.lookups,
+                'matches': self.matches,
+                'avg_lookup_us': round(self._lookup_seconds / self.lookups * 1e6, 1) if self.lookups else 0.0
+            }
@@ -0,0 +1,139 @@
+"""
+Content-hash cache of image predictions.
+
+Entries are keyed by the SHA-256 of the uploaded bytes plus the model version,
+so re-uploads of the same photo skip inference (and the LLM call, once its
+detail text is stored). Lookups go through an in-memory LRU first and then a
+persistent SQLite table whose total size is bounded by evicting the least
+recently used rows.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """Two-tier (memory LRU + SQLite) cache of prediction results."""
+
+    def __init__(self, db_path, memory_entries=1024, max_db_bytes=64 * 1024 * 1024):
+        self.db_path = db_path
+        self.memory_entries = memory_entries
+        self.max_db_bytes = max_db_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._db_bytes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(data, model_version):
+        digest = hashlib.sha256()
+        digest.update(str(model_version).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(data)
+        return digest.hexdigest()
+
+    def _db(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS predictions ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS predictions_last_access ON predictions (last_access)')
+            self._db_bytes = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM predictions').fetchone()[0]
+        return self._conn
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Return the cached result dict for key, or None."""
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return value
+            try:
+                conn = self._db()
+                row = conn.execute('SELECT value FROM predictions WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    conn.execute('UPDATE predictions SET last_access = ? WHERE key = ?', (time.time(), key))
+                    conn.commit()
+            except sqlite3.Error as e:
+                print(f"Prediction cache read failed: {e}")
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            value = json.loads(row[0])
+            self._remember(key, value)
+            self.disk_hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store a JSON-serialisable result dict under key."""
+        encoded = json.dumps(value)
+        with self._lock:
+            self._remember(key, value)
+            try:
+                conn = self._db()
+                previous = conn.execute('SELECT size FROM predictions WHERE key = ?', (key,)).fetchone()
+                conn.execute('INSERT OR REPLACE INTO predictions (key, value, size, last_access) VALUES (?, ?, ?, ?)',
+                             (key, encoded, len(encoded), time.time()))
+                self._db_bytes += len(encoded) - (previous[0] if previous else 0)
+                self._evict(conn)
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Prediction cache write failed: {e}")
+
+    def update(self, key, **fields):
+        """Merge fields into an existing entry (e.g. detail text fetched after the prediction)."""
+        value = self.get(key)
+        if value is not None:
+            self.put(key, dict(value, **fields))
+
+    def _evict(self, conn):
+        """Drop least recently used rows until the table fits in max_db_bytes."""
+        while self._db_bytes > self.max_db_bytes:
+            rows = conn.execute('SELECT key, size FROM predictions ORDER BY last_access LIMIT 64').fetchall()
+            if not rows:
+                break
+            # Stop as soon as the table fits, so newer rows in the same page survive
+            evicted = []
+            for k, size in rows:
+                if self._db_bytes <= self.max_db_bytes:
+                    break
+                evicted.append((k,))
+                self._memory.pop(k, None)
+                self._db_bytes -= size
+                self.evictions += 1
+            conn.executemany('DELETE FROM predictions WHERE key = ?', evicted)
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            'memory_entries': len(self._memory),
+            'disk_bytes': self._db_bytes,
+            'evictions': self.evictions
+        }
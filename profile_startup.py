@@ -0,0 +1,67 @@
+"""
+Measure the import cost of the app's modules and heavy dependencies.
+
+Each module is imported in a fresh interpreter so the timings and memory
+growth are not hidden by modules another import already loaded.
+
+Usage:
+    python profile_startup.py
+    python profile_startup.py --modules app tensorflow --repeat 5
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+import numpy as np
+
+DEFAULT_MODULES = ['config', 'models', 'main', 'llm', 'dashboard', 'sensor_utils', 'app',
+                   'tensorflow', 'google.genai', 'plotly.graph_objects', 'pandas']
+
+PROBE = """
+import json, resource, sys, time
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 1048576
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+before = rss_mb()
+start = time.perf_counter()
+try:
+    __import__(sys.argv[1])
+    error = None
+except Exception as e:
+    error = str(e)
+seconds = time.perf_counter() - start
+heavy = [m for m in ('tensorflow', 'google.genai', 'plotly', 'pandas', 'geopy') if m in sys.modules]
+print(json.dumps({'seconds': seconds, 'rss_mb': rss_mb() - before, 'error': error, 'heavy': heavy}))
+"""
+
+
+def profile(module):
+    result = subprocess.run([sys.executable, '-c', PROBE, module], capture_output=True, text=True)
+    lines = result.stdout.strip().splitlines()
+    if not lines:
+        return {'seconds': float('nan'), 'rss_mb': float('nan'), 'error': result.stderr.strip()[-200:], 'heavy': []}
+    return json.loads(lines[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Profile per-module import time and memory.')
+    parser.add_argument('--modules', nargs='+', default=DEFAULT_MODULES)
+    parser.add_argument('--repeat', type=int, default=3, help='Fresh interpreters per module (median is reported)')
+    args = parser.parse_args()
+
+    print(f"{'module':<22}{'import s':>10}{'RSS MB':>9}  heavy modules loaded")
+    for module in args.modules:
+        runs = [profile(module) for _ in range(args.repeat)]
+        seconds = np.median([r['seconds'] for r in runs])
+        rss = np.median([r['rss_mb'] for r in runs])
+        note = f"error: {runs[-1]['error']}" if runs[-1]['error'] else ', '.join(runs[-1]['heavy']) or '-'
+        print(f"{module:<22}{seconds:>10.3f}{rss:>9.1f}  {note}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Pre-inference image quality gate.
+
+Runs on the already-downscaled 128x128 array with a handful of vectorised
+NumPy operations (well under a millisecond), so blurry, badly exposed or
+non-plant captures can be turned away before they reach the model and the
+Gemini call.
+
+- sharpness: variance of the 4-neighbour Laplacian of the grey image
+- exposure: mean brightness and the share of crushed-black / blown-white pixels
+- plant fraction: share of pixels whose excess-green index (2g - r - b on
+  chromaticity) is positive enough to look like foliage
+"""
+
+import threading
+import time
+
+import numpy as np
+
+_GREY = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+class ImageQualityError(Exception):
+    """Raised when an image fails the quality gate; message tells the user what to fix."""
+
+    def __init__(self, message, reason, metrics):
+        super().__init__(message)
+        self.reason = reason
+        self.metrics = metrics
+
+
+def image_metrics(image_array):
+    """Return the quality metrics of an (H, W, 3) image array with values 0-255."""
+    rgb = np.asarray(image_array, dtype=np.float32)
+    grey = rgb @ _GREY
+    laplacian = (grey[1:-1, :-2] + grey[1:-1, 2:] + grey[:-2, 1:-1] + grey[2:, 1:-1]) - 4.0 * grey[1:-1, 1:-1]
+    histogram = np.bincount(np.clip(grey, 0, 255).astype(np.uint8).ravel(), minlength=256) / grey.size
+    total = rgb.sum(axis=-1) + 1e-6
+    excess_green = (2.0 * rgb[..., 1] - rgb[..., 0] - rgb[..., 2]) / total
+    return {
+        'sharpness': float(laplacian.var()),
+        'brightness': float(grey.mean()),
+        'dark_fraction': float(histogram[:16].sum()),
+        'bright_fraction': float(histogram[240:].sum()),
+        'plant_fraction': float((excess_green > 0.05).mean())
+    }
+
+
+class QualityGate:
+    """Checks images against configurable thresholds and keeps rejection statistics."""
+
+    def __init__(self, min_sharpness=100.0, min_brightness=25.0, max_brightness=245.0,
+                 max_clipped_fraction=0.9, min_plant_fraction=0.1):
+        self.min_sharpness = min_sharpness
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.max_clipped_fraction = max_clipped_fraction
+        self.min_plant_fraction = min_plant_fraction
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.rejections = {}
+        self._seconds = 0.0
+
+    def _failure(self, metrics):
+        """Return (reason, message) for the first failed check, or None."""
+        if metrics['brightness'] < self.min_brightness or metrics['dark_fraction'] > self.max_clipped_fraction:
+            return 'too_dark', 'The photo is too dark. Move into better light or turn on the flash and retake it.'
+        if metrics['brightness'] > self.max_brightness or metrics['bright_fraction'] > self.max_clipped_fraction:
+            return 'overexposed', 'The photo is overexposed. Avoid direct sunlight or glare on the leaf and retake it.'
+        if metrics['sharpness'] < self.min_sharpness:
+            return 'blurry', 'The photo is too blurry. Hold the camera steady, tap to focus on the leaf and retake it.'
+        if metrics['plant_fraction'] < self.min_plant_fraction:
+            return 'no_plant', 'No leaf was found in the photo. Fill the frame with the affected leaf and retake it.'
+        return None
+
+    def check(self, image_array):
+        """Return the image metrics; raises ImageQualityError if the image fails the gate."""
+        start = time.perf_counter()
+        metrics = image_metrics(image_array)
+        failure = self._failure(metrics)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.checked += 1
+            self._seconds += elapsed
+            if failure is not None:
+                self.rejections[failure[0]] = self.rejections.get(failure[0], 0) + 1
+        if failure is not None:
+            raise ImageQualityError(failure[1], failure[0], metrics)
+        return metrics
+
+    def stats(self):
+        with self._lock:
+            rejected = sum(self.rejections.values())
+            return {
+                'checked': self.checked,
+                'rejected': rejected,
+                'rejection_rate': round(rejected / self.checked, 3) if self.checked else 0.0,
+                'rejections': dict(self.rejections),
+                'avg_check_ms': round(self._seconds / self.checked * 1000.0, 3) if self.checked else 0.0
+            }
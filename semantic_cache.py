@@ -0,0 +1,234 @@
+"""
+Similarity cache for free-text symptom descriptions.
+
+Farmers describe the same few dozen problems in near-identical words, so a
+Gemini answer can be reused for a new description that is close enough to
+one already answered. Text is normalised (lower case, punctuation and filler
+words removed, light plural stemming) into a set of word unigrams and
+bigrams. Each set gets a MinHash signature, and an LSH index over signature
+bands finds the candidates that share a band, so only those are compared
+(exact Jaccard similarity) however large the cache grows. Entries are
+evicted least recently used once max_entries is reached.
+
+Similarity alone does not keep "yellow spots on tomato leaves" apart from
+"... potato leaves" (Jaccard 0.87), nor "no yellow spots" from "yellow
+spots". So two texts only match when they also name exactly the same crops
+and diseases and negate exactly the same words (see key_terms).
+
+Usage (synthetic benchmark):
+    python semantic_cache.py --benchmark 50000
+"""
+
+import argparse
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+_PRIME = np.uint64(4294967311)  # Smallest prime above 2**32
+_TOKEN = re.compile(r"[a-z0-9]+")
+_CONTRACTED_NOT = re.compile(r"n't\b")
+# Filler words only; negations ("no", "not") change the meaning and are kept
+STOPWORDS = frozenset("""
+a an the and or but of on in at to for from by with as is are was were be been being it its this that these
+those there their my our your i we you me have has had do does did some any very also just so what which
+""".split())
+
+
+NEGATIONS = frozenset(['no', 'not', 'without', 'never', 'none', 'nor'])
+
+
+def _stem(token):
+    if len(token) > 4 and token.endswith('ies'):
+        return token[:-3] + 'y'
+    if len(token) > 4 and token.endswith('ves'):
+        return token[:-3] + 'f'
+    if len(token) > 4 and token.endswith('oes'):
+        return token[:-2]
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+# Words that decide which answer is right: the crops of static/model/classes.json and other common
+# ones, and disease names. Stemmed like the text, so "tomatoes" and "tomato" are the same term
+CROP_TERMS = frozenset(_stem(t) for t in """
+apple blueberry cherry corn maize grape orange citrus peach pepper potato raspberry soybean soy squash
+strawberry tomato bean pea cucumber melon watermelon pumpkin zucchini lettuce cabbage onion garlic carrot
+wheat rice barley oat cotton banana mango coffee tea rose eggplant brinjal chilli chili okra
+""".split())
+DISEASE_TERMS = frozenset(_stem(t) for t in """
+scab rot rust mildew blight measles esca greening huanglongbing haunglongbing scorch mold mould mite mites
+mosaic curl virus septoria cercospora bacterial canker anthracnose smut
+""".split())
+
+
+def _words(text):
+    """Normalised, stemmed words of text with filler words removed; "n't" becomes "not"."""
+    return [_stem(t) for t in _TOKEN.findall(_CONTRACTED_NOT.sub(' not', text.lower())) if t not in STOPWORDS]
+
+
+def shingles(text):
+    """Return the set of normalised word unigrams and bigrams of text."""
+    words = _words(text)
+    return frozenset(words) | frozenset(f"{a} {b}" for a, b in zip(words, words[1:]))
+
+
+def key_terms(text):
+    """
+    The crop and disease names in text plus each negated word ("no yellow"),
+    which must all agree before two texts are compared by similarity.
+    """
+    words = _words(text)
+    terms = {w for w in words if w in CROP_TERMS or w in DISEASE_TERMS}
+    terms.update(f"{w} {after}" for w, after in zip(words, words[1:] + [''])
+                 if w in NEGATIONS)
+    return frozenset(terms)
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class SemanticCache:
+    """
+    LRU cache of responses keyed by text, looked up by MinHash/LSH Jaccard
+    similarity among the entries with the same key_terms.
+    """
+
+    def __init__(self, threshold=0.7, max_entries=5000, ttl_seconds=0, bands=20, rows=5, seed=1):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.bands = bands
+        self.rows = rows
+        # 20 bands of 5 rows: texts at Jaccard 0.7 share a band with ~97% probability, at 0.4 with ~18%
+        rng = np.random.default_rng(seed)
+        permutations = bands * rows
+        # (a * h + b) mod p with a < 2**31 and h < 2**32 stays inside uint64
+        self._a = rng.integers(1, 2 ** 31, permutations, dtype=np.uint64)
+        self._b = rng.integers(0, 2 ** 32, permutations, dtype=np.uint64)
+        self._entries = OrderedDict()  # id -> (shingles, band keys, response, created, seconds, key terms)
+        self._buckets = [dict() for _ in range(bands)]
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.evictions = 0
+        self.seconds_saved = 0.0
+        self._lookup_seconds = 0.0
+
+    def signature(self, features):
+        """MinHash signature of a shingle set, split into per-band bucket keys."""
+        if not features:
+            return None
+        hashes = np.fromiter((zlib.crc32(f.encode('utf-8')) for f in features), dtype=np.uint64, count=len(features))
+        values = ((hashes[:, None] * self._a + self._b) % _PRIME).min(axis=0)
+        return [values[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def get(self, text, allow_stale=False):
+        """
+        Return the stored response of the most similar cached text, or None.
+        allow_stale also matches entries older than the TTL (a fallback while Gemini is down).
+        """
+        start = time.perf_counter()
+        features = shingles(text)
+        terms = key_terms(text)
+        keys = self.signature(features)
+        best = None
+        with self._lock:
+            if keys is not None:
+                candidates = set()
+                for bucket, key in zip(self._buckets, keys):
+                    candidates.update(bucket.get(key, ()))
+                now = time.time()
+                for entry_id in candidates:
+                    entry = self._entries[entry_id]
+                    if entry[5] != terms:
+                        continue
+                    if self.ttl_seconds and not allow_stale and now - entry[3] > self.ttl_seconds:
+                        continue
+                    similarity = jaccard(features, entry[0])
+                    if similarity >= self.threshold and (best is None or similarity > best[0]):
+                        best = (similarity, entry_id)
+            self.lookups += 1
+            if best is not None:
+                self.hits += 1
+                self._entries.move_to_end(best[1])
+                entry = self._entries[best[1]]
+                self.seconds_saved += entry[4]
+            self._lookup_seconds += time.perf_counter() - start
+        return entry[2] if best is not None else None
+
+    def put(self, text, response, seconds=0.0):
+        """Cache response for text; seconds is how long producing it took (reported as time saved on hits)."""
+        features = shingles(text)
+        keys = self.signature(features)
+        if keys is None:
+            return
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (features, keys, response, time.time(), seconds, key_terms(text))
+            for bucket, key in zip(self._buckets, keys):
+                bucket.setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        for bucket, key in zip(self._buckets, entry[1]):
+            ids = bucket.get(key)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del bucket[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'threshold': self.threshold,
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'hit_rate': round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+                'evictions': self.evictions,
+                'seconds_saved': round(self.seconds_saved, 2),
+                'avg_lookup_us': round(self._lookup_seconds / self.lookups * 1e6, 1) if self.lookups else 0.0
+            }
+
+
+def benchmark(entries, lookups):
+    """Fill a cache with synthetic symptom texts and time lookups of reworded variants."""
+    rng = np.random.default_rng(0)
+    crops = ['tomato', 'potato', 'apple', 'corn', 'grape', 'pepper', 'peach', 'cherry', 'squash', 'strawberry']
+    colours = ['yellow', 'brown', 'black', 'white', 'grey', 'orange', 'purple', 'red']
+    marks = ['spots', 'rings', 'patches', 'lesions', 'powder', 'streaks', 'holes', 'mold']
+    parts = ['leaves', 'stems', 'fruit', 'roots', 'veins', 'edges']
+    extras = ['after rain', 'spreading fast', 'since last week', 'on lower side', 'near the tips', 'with wilting']
+    vocabulary = [f"w{i}" for i in range(5000)]  # Stand-ins for place names, varieties, etc.
+    texts = [f"{rng.choice(colours)} {rng.choice(marks)} on {rng.choice(crops)} {rng.choice(parts)} "
+             f"{rng.choice(extras)} {' '.join(rng.choice(vocabulary, 3))}" for _ in range(entries)]
+
+    cache = SemanticCache(max_entries=entries)
+    start = time.perf_counter()
+    for i, text in enumerate(texts):
+        cache.put(text, f"response {i}", seconds=2.0)
+    print(f"Inserted {entries} entries in {time.perf_counter() - start:.1f}s")
+    queries = [texts[i].replace(' on ', ' on my ').capitalize() + '.' for i in rng.integers(0, entries, lookups)]
+    start = time.perf_counter()
+    hits = sum(cache.get(q) is not None for q in queries)
+    elapsed = time.perf_counter() - start
+    print(f"{lookups} reworded lookups: {hits} hits, {elapsed / lookups * 1e6:.0f} us per lookup")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the symptom-text similarity cache.')
+    parser.add_argument('--benchmark', type=int, default=50000, help='Number of cached entries')
+    parser.add_argument('--lookups', type=int, default=1000)
+    args = parser.parse_args()
+    benchmark(args.benchmark, args.lookups)
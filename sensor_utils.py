@@ -1,13 +1,10 @@
 import os
 import requests
 from datetime import datetime, timedelta
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut
 import json
 from models import db, Sensor, SensorReading, DiseaseDetection, Field, User
 from config import Config
 from flask import current_app
-import pandas as pd
 import random
 
 def get_weather_data(latitude, longitude):
@@ -0,0 +1,182 @@
+"""
+Single-flight coalescing of identical concurrent calls.
+
+When many users hit the same disease at once, identical Gemini prompts arrive
+together. Within a process, the first caller for a key runs the call and the
+others wait on its Future. With a lease database, the same holds across
+worker processes: the caller holding the SQLite lease for a key runs the
+call and publishes the result, while callers in other workers poll for it.
+If the lease holder fails (or dies and its lease expires), one waiting
+caller takes over.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+
+def prompt_key(text):
+    """Key for a prompt: case and whitespace differences do not matter."""
+    return hashlib.sha256(' '.join(str(text).lower().split()).encode('utf-8')).hexdigest()
+
+
+class SingleFlight:
+    """Runs one call per key at a time and shares its result with concurrent duplicates."""
+
+    RESULT_SECONDS = 5.0  # How long a published result is handed to callers from other workers
+
+    def __init__(self, lease_path=None, lease_seconds=60.0, poll_interval=0.1, is_shareable=None):
+        self.lease_path = lease_path
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.is_shareable = is_shareable or (lambda value: True)
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self.calls = 0
+        self.executed = 0
+        self.coalesced_local = 0
+        self.coalesced_remote = 0
+        self.takeovers = 0
+
+    def do(self, key, fn, timeout=None):
+        """
+        Return fn() for key, sharing one execution among concurrent callers with
+        the same key. A caller that waits on someone else's call for longer than
+        timeout seconds gets TimeoutError (the call itself carries on).
+        """
+        with self._lock:
+            self.calls += 1
+            future = self._flights.get(key)
+            leader = future is None
+            if leader:
+                future = self._flights[key] = Future()
+            else:
+                self.coalesced_local += 1
+        if not leader:
+            return future.result(timeout)
+        try:
+            value = self._shared_call(key, fn, timeout) if self.lease_path else self._call(fn)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+
+    def _call(self, fn):
+        with self._lock:
+            self.executed += 1
+        return fn()
+
+    # --- cross-worker leases -------------------------------------------------
+
+    def _connect(self):
+        if not self._schema_ready:
+            directory = os.path.dirname(self.lease_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.lease_path, timeout=5.0, isolation_level=None)
+        if not self._schema_ready:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, '
+                         'expires_at REAL NOT NULL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+                         'finished_at REAL NOT NULL)')
+            self._schema_ready = True
+        return conn
+
+    def _acquire(self, conn, key, owner):
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            expired = conn.execute('DELETE FROM leases WHERE key = ? AND expires_at < ?', (key, now)).rowcount
+            acquired = conn.execute('INSERT OR IGNORE INTO leases (key, owner, expires_at) VALUES (?, ?, ?)',
+                                    (key, owner, now + self.lease_seconds)).rowcount == 1
+            conn.execute('COMMIT')
+        except sqlite3.Error:
+            conn.execute('ROLLBACK')
+            raise
+        if acquired and expired:
+            # The previous holder died without releasing its lease
+            with self._lock:
+                self.takeovers += 1
+        return acquired
+
+    def _finished(self, conn, key):
+        row = conn.execute('SELECT value FROM results WHERE key = ? AND finished_at > ?',
+                           (key, time.time() - self.RESULT_SECONDS)).fetchone()
+        return row[0] if row else None
+
+    def _wait_for_lease(self, conn, key, owner, timeout=None):
+        """Return (True, value) when another worker published a result, or (False, None) once we hold the lease."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            value = self._finished(conn, key)
+            if value is not None:
+                return True, value
+            if self._acquire(conn, key, owner):
+                # The holder may have published and released between the two checks above
+                value = self._finished(conn, key)
+                if value is not None:
+                    conn.execute('DELETE FROM leases WHERE key = ? AND owner = ?', (key, owner))
+                    return True, value
+                return False, None
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError('Timed out waiting for a shared call in another worker')
+            time.sleep(self.poll_interval)
+
+    def _shared_call(self, key, fn, timeout=None):
+        owner = f"{os.getpid()}:{threading.get_ident()}"
+        conn = None
+        try:
+            conn = self._connect()
+            published, value = self._wait_for_lease(conn, key, owner, timeout)
+        except TimeoutError:
+            conn.close()
+            raise
+        except sqlite3.Error as e:
+            print(f"Single-flight lease error, calling directly: {e}")
+            if conn is not None:
+                conn.close()
+            return self._call(fn)
+        if published:
+            conn.close()
+            with self._lock:
+                self.coalesced_remote += 1
+            return value
+        try:
+            value = self._call(fn)
+            if isinstance(value, str) and self.is_shareable(value):
+                try:
+                    conn.execute('INSERT OR REPLACE INTO results (key, value, finished_at) VALUES (?, ?, ?)',
+                                 (key, value, time.time()))
+                    conn.execute('DELETE FROM results WHERE finished_at < ?', (time.time() - 60.0,))
+                except sqlite3.Error as e:
+                    print(f"Could not publish single-flight result: {e}")
+            return value
+        finally:
+            try:
+                conn.execute('DELETE FROM leases WHERE key = ? AND owner = ?', (key, owner))
+            except sqlite3.Error as e:
+                print(f"Could not release single-flight lease: {e}")
+            conn.close()
+
+    def stats(self):
+        with self._lock:
+            coalesced = self.coalesced_local + self.coalesced_remote
+            return {
+                'calls': self.calls,
+                'executed': self.executed,
+                'coalesced_local': self.coalesced_local,
+                'coalesced_remote': self.coalesced_remote,
+                'coalesced_rate': round(coalesced / self.calls, 3) if self.calls else 0.0,
+                'takeovers': self.takeovers,
+                'in_flight': len(self._flights),
+                'shared': bool(self.lease_path)
+            }
@@ -0,0 +1,286 @@
+"""
+Live classification of camera frame streams.
+
+A client opens a stream, sends downscaled frames as it captures them and
+follows the predictions over Server-Sent Events. Frames arrive either one
+POST each or, without a request per frame, over an upload channel: one
+long-lived (chunked) POST whose body carries length-prefixed frames (see
+read_frames). Each stream holds at most
+one pending frame: a newer frame replaces one that has not been classified
+yet, so a slow server drops stale frames instead of queueing them. One
+worker thread classifies the latest pending frame of every stream in a single
+batch and publishes an exponentially smoothed prediction per stream. Frames
+arriving faster than the max-FPS policy are rejected so the client backs off.
+
+Stream state lives in the memory of one process, so every request for a
+stream must reach the worker that opened it (see the README: streams are
+served by a single-worker instance). Each event-stream viewer and upload
+channel holds a server thread, so a stream has at most max_viewers viewers
+and one upload channel.
+"""
+
+import threading
+import time
+import uuid
+
+import numpy as np
+
+
+class StreamLimitError(Exception):
+    """Raised when the maximum number of open streams is reached."""
+
+
+class FrameFormatError(Exception):
+    """Raised when an upload channel body is not a sequence of length-prefixed frames."""
+
+
+def _read_exactly(source, size):
+    data = b''
+    while len(data) < size:
+        chunk = source.read(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def read_frames(source, max_frame_bytes):
+    """
+    Yield the frames of an upload channel body read from a file-like source:
+    each frame is a 4-byte big-endian length followed by that many bytes of
+    encoded image. The body ends at end of input or at a zero length.
+    """
+    while True:
+        header = _read_exactly(source, 4)
+        if not header:
+            return
+        if len(header) < 4:
+            raise FrameFormatError('Truncated frame length')
+        size = int.from_bytes(header, 'big')
+        if size == 0:
+            return
+        if size > max_frame_bytes:
+            raise FrameFormatError(f'Frame of {size} bytes is larger than {max_frame_bytes} bytes')
+        frame = _read_exactly(source, size)
+        if len(frame) < size:
+            raise FrameFormatError(f'Truncated frame ({len(frame)} of {size} bytes)')
+        yield frame
+
+
+class FrameStream:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.created_at = time.time()
+        self.last_active = self.created_at
+        self.last_accepted = 0.0
+        self.pending = None  # (seq, frame bytes, received_at)
+        self.seq = 0
+        self.received = 0
+        self.throttled = 0
+        self.dropped = 0
+        self.classified = 0
+        self.smoothed = None
+        self.result = None
+        self.version = 0
+        self.closed = False
+        self.viewers = 0
+        self.uploading = False  # An upload channel is open
+
+
+class StreamHub:
+    """Open frame streams plus the worker thread that classifies their latest frames."""
+
+    def __init__(self, decode, predict, class_names, max_fps=5.0, smoothing=0.6, max_streams=50,
+                 idle_timeout=60.0, max_batch=16, max_viewers=2):
+        self.decode = decode
+        self.predict = predict
+        self.class_names = class_names
+        self.max_fps = max_fps
+        self.smoothing = smoothing  # Weight of the newest frame in the moving average
+        self.max_streams = max_streams
+        self.idle_timeout = idle_timeout
+        self.max_batch = max_batch
+        self.max_viewers = max_viewers  # Per stream
+        self._streams = {}
+        self._condition = threading.Condition()
+        self._worker = None
+        self.batches = 0
+        self.frames_classified = 0
+        self.errors = 0
+        self.viewers_rejected = 0
+
+    def open(self):
+        with self._condition:
+            self._expire()
+            if len(self._streams) >= self.max_streams:
+                raise StreamLimitError(f"{len(self._streams)} streams already open")
+            stream = FrameStream()
+            self._streams[stream.id] = stream
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='frame-streams', daemon=True)
+                self._worker.start()
+            return stream
+
+    def get(self, stream_id):
+        with self._condition:
+            return self._streams.get(stream_id)
+
+    def close(self, stream_id):
+        with self._condition:
+            stream = self._streams.pop(stream_id, None)
+            if stream is not None:
+                stream.closed = True
+                stream.version += 1
+                self._condition.notify_all()
+            return stream is not None
+
+    def push(self, stream, frame):
+        """
+        Offer a frame. Returns (accepted, retry_after_seconds). A frame that
+        replaces an unclassified one counts the older frame as dropped.
+        """
+        now = time.time()
+        with self._condition:
+            stream.last_active = now
+            stream.received += 1
+            min_interval = 1.0 / self.max_fps if self.max_fps > 0 else 0.0
+            wait = stream.last_accepted + min_interval - now
+            if wait > 0:
+                stream.throttled += 1
+                return False, wait
+            stream.last_accepted = now
+            if stream.pending is not None:
+                stream.dropped += 1
+            stream.seq += 1
+            stream.pending = (stream.seq, frame, now)
+            self._condition.notify_all()
+            return True, 0.0
+
+    def _take_pending(self):
+        """Wait for pending frames and take the latest one of up to max_batch streams."""
+        with self._condition:
+            while True:
+                ready = [s for s in self._streams.values() if s.pending is not None]
+                if ready:
+                    break
+                self._condition.wait(timeout=self.idle_timeout)
+                self._expire()
+            # Oldest frames first so no stream is starved when more than max_batch are waiting
+            ready.sort(key=lambda s: s.pending[2])
+            taken = []
+            for stream in ready[:self.max_batch]:
+                taken.append((stream, stream.pending))
+                stream.pending = None
+            return taken
+
+    def _run(self):
+        while True:
+            taken = self._take_pending()
+            frames, images = [], []
+            for stream, pending in taken:
+                try:
+                    images.append(self.decode(pending[1]))
+                    frames.append((stream, pending))
+                except Exception as e:
+                    self._publish(stream, {'seq': pending[0], 'success': False,
+                                           'message': f'Could not decode frame: {e}'})
+            if not frames:
+                continue
+            try:
+                probabilities = np.asarray(self.predict(np.stack(images)))
+            except Exception as e:
+                print(f"Error classifying stream frames: {e}")
+                self.errors += 1
+                for stream, pending in frames:
+                    self._publish(stream, {'seq': pending[0], 'success': False, 'message': str(e)})
+                continue
+            self.batches += 1
+            self.frames_classified += len(frames)
+            for (stream, pending), row in zip(frames, probabilities):
+                self._update(stream, pending, row)
+
+    def _update(self, stream, pending, probabilities):
+        seq, _, received_at = pending
+        if stream.smoothed is None:
+            stream.smoothed = probabilities.astype(np.float32)
+        else:
+            stream.smoothed = self.smoothing * probabilities + (1.0 - self.smoothing) * stream.smoothed
+        raw_index = int(np.argmax(probabilities))
+        index = int(np.argmax(stream.smoothed))
+        stream.classified += 1
+        self._publish(stream, {
+            'seq': seq,
+            'success': True,
+            'disease': self.class_names[index],
+            'confidence': round(float(stream.smoothed[index]), 4),
+            'frame_disease': self.class_names[raw_index],
+            'frame_confidence': round(float(probabilities[raw_index]), 4),
+            'latency_ms': round((time.time() - received_at) * 1000.0, 1),
+            'frames_classified': stream.classified,
+            'frames_dropped': stream.dropped
+        })
+
+    def _publish(self, stream, result):
+        with self._condition:
+            stream.result = result
+            stream.version += 1
+            self._condition.notify_all()
+
+    def add_viewer(self, stream):
+        """Claim one of the stream's max_viewers event-stream slots; False when all are taken."""
+        with self._condition:
+            if stream.viewers >= self.max_viewers:
+                self.viewers_rejected += 1
+                return False
+            stream.viewers += 1
+            return True
+
+    def remove_viewer(self, stream):
+        with self._condition:
+            stream.viewers = max(0, stream.viewers - 1)
+
+    def open_upload(self, stream):
+        """Claim the stream's upload channel; False when one is already open."""
+        with self._condition:
+            if stream.uploading or stream.closed:
+                return False
+            stream.uploading = True
+            return True
+
+    def close_upload(self, stream):
+        with self._condition:
+            stream.uploading = False
+
+    def wait_for_result(self, stream, version, timeout):
+        """Block until the stream has a result newer than version (or timeout); returns the current version."""
+        with self._condition:
+            self._condition.wait_for(lambda: stream.version != version, timeout=timeout)
+            return stream.version
+
+    def _expire(self):
+        cutoff = time.time() - self.idle_timeout
+        for stream_id in [i for i, s in self._streams.items() if s.last_active < cutoff]:
+            stream = self._streams.pop(stream_id)
+            stream.closed = True
+            stream.version += 1
+        self._condition.notify_all()
+
+    def stats(self):
+        with self._condition:
+            streams = list(self._streams.values())
+            return {
+                'open_streams': len(streams),
+                'max_fps': self.max_fps,
+                'smoothing': self.smoothing,
+                'batches': self.batches,
+                'frames_classified': self.frames_classified,
+                'avg_batch_size': round(self.frames_classified / self.batches, 2) if self.batches else 0.0,
+                'frames_received': sum(s.received for s in streams),
+                'frames_dropped': sum(s.dropped for s in streams),
+                'frames_throttled': sum(s.throttled for s in streams),
+                'viewers': sum(s.viewers for s in streams),
+                'max_viewers_per_stream': self.max_viewers,
+                'upload_channels': sum(1 for s in streams if s.uploading),
+                'viewers_rejected': self.viewers_rejected,
+                'errors': self.errors
+            }
@@ -0,0 +1,45 @@
+"""
+Shared fixtures. Every on-disk store the app opens is pointed at a temporary
+directory before config.py is imported, so tests never touch instance/.
+"""
+
+import os
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+_STATE_DIR = tempfile.mkdtemp(prefix='agrodx-tests-')
+for _name, _filename in {
+    'PREDICTION_CACHE_PATH': 'prediction_cache.db',
+    'ASYNC_JOB_DB_PATH': 'jobs.db',
+    'EMBEDDING_DIR': 'embeddings',
+    'LLM_COALESCE_DB_PATH': 'llm_single_flight.db',
+    'KNOWLEDGE_CACHE_PATH': 'disease_knowledge.db',
+    'INFERENCE_SERVER_ADDRESS': 'inference.sock',
+}.items():
+    os.environ.setdefault(_name, os.path.join(_STATE_DIR, _filename))
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_STATE_DIR, 'app.db')}")
+
+
+@pytest.fixture
+def fake_gemini(monkeypatch):
+    """Run fake_gemini_server.py on a free port and point a fresh Gemini client and breaker at it."""
+    import llm
+    from circuit_breaker import CircuitBreaker
+    from fake_gemini_server import FakeGemini, make_handler
+
+    fake = FakeGemini()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(llm.Config, 'GEMINI_BASE_URL', f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(llm.Config, 'GEMINI_API_KEY', 'test')
+    monkeypatch.setattr(llm.Config, 'LLM_SINGLE_FLIGHT', False)
+    monkeypatch.setattr(llm, '_client', None)
+    monkeypatch.setattr(llm, '_client_initialized', False)
+    monkeypatch.setattr(llm, 'breaker', CircuitBreaker(failure_threshold=2, reset_seconds=0.5))
+    yield fake
+    server.shutdown()
+    server.server_close()
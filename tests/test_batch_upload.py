@@ -0,0 +1,74 @@
+"""Upload validation for /api/predict/batch: zip archives are checked before any output is streamed."""
+
+import io
+import zipfile
+
+import pytest
+from PIL import Image
+
+import app as app_module
+from app import _collect_uploaded_images, _read_upload
+
+
+def _png():
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), (0, 128, 0)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # The 400 paths return before any inference, so no model is needed
+    monkeypatch.setattr(app_module, 'INFERENCE_AVAILABLE', True)
+    return app_module.create_app().test_client()
+
+
+def test_collect_expands_zip_members_and_skips_other_files():
+    archive = _zip({'a.png': _png(), 'notes.txt': b'hello', 'sub/b.JPG': _png()})
+    items, archives = _collect_uploaded_images([('leaves.zip', archive), ('c.png', _png()), ('x.gif', b'')])
+    assert [name for name, _ in items] == ['a.png', 'sub/b.JPG', 'c.png']
+    assert len(archives) == 1
+    assert _read_upload(items[0][1]).shape == (128, 128, 3)
+    assert _read_upload(items[2][1]).shape == (128, 128, 3)
+    archives[0].close()
+
+
+def test_collect_rejects_an_unreadable_zip():
+    with pytest.raises(zipfile.BadZipFile):
+        _collect_uploaded_images([('good.zip', _zip({'a.png': _png()})), ('bad.zip', b'not a zip')])
+
+
+def test_oversized_zip_member_is_a_per_item_error(monkeypatch):
+    monkeypatch.setattr(app_module.Config, 'BATCH_PREDICT_MAX_MEMBER_BYTES', 10)
+    items, archives = _collect_uploaded_images([('leaves.zip', _zip({'a.png': _png()}))])
+    with pytest.raises(ValueError, match='larger than'):
+        _read_upload(items[0][1])
+    archives[0].close()
+
+
+def test_endpoint_rejects_bad_zip(client):
+    response = client.post('/api/predict/batch', data={'files': (io.BytesIO(b'not a zip'), 'bad.zip')})
+    assert response.status_code == 400
+    assert 'not a valid zip' in response.get_json()['error']
+
+
+def test_endpoint_rejects_zip_without_images(client):
+    response = client.post('/api/predict/batch', data={'files': (io.BytesIO(_zip({'a.txt': b'x'})), 'a.zip')})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'No images found in the upload'
+
+
+def test_endpoint_rejects_too_many_images(client, monkeypatch):
+    monkeypatch.setattr(app_module.Config, 'BATCH_PREDICT_MAX_ITEMS', 2)
+    archive = _zip({f'{i}.png': _png() for i in range(3)})
+    response = client.post('/api/predict/batch', data={'files': (io.BytesIO(archive), 'a.zip')})
+    assert response.status_code == 400
+    assert 'Too many images (3)' in response.get_json()['error']
@@ -0,0 +1,85 @@
+"""Micro-batching: concurrent submits share one forward pass and a lone request waits no longer than the window."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from batching import BatchScheduler
+
+
+class RecordingModel:
+    """Returns each row's first pixel as its 'prediction' and records the batch sizes it saw."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def __call__(self, batch):
+        with self.lock:
+            self.batches.append(len(batch))
+        time.sleep(self.delay)
+        return batch[:, 0, 0, :1] * 2
+
+
+def _rows(value, count=1):
+    return np.full((count, 2, 2, 1), value, dtype=np.float32)
+
+
+def test_concurrent_requests_are_batched_and_split_back():
+    model = RecordingModel(delay=0.05)
+    scheduler = BatchScheduler(model, max_batch_size=8, max_wait_ms=200)
+    start = threading.Barrier(6)
+
+    def submit(value):
+        start.wait()
+        return scheduler.submit(_rows(value, count=value % 2 + 1), timeout=5)
+
+    with ThreadPoolExecutor(6) as pool:
+        results = list(pool.map(submit, range(1, 7)))
+
+    for value, result in zip(range(1, 7), results):
+        assert result.shape == (value % 2 + 1, 1)
+        assert np.all(result == value * 2)
+    assert sum(model.batches) == 9
+    assert len(model.batches) < 6
+    assert max(model.batches) <= 8
+    stats = scheduler.stats()
+    assert stats['requests'] == 6
+    assert stats['largest_batch'] == max(model.batches)
+
+
+def test_batch_stops_at_max_batch_size():
+    model = RecordingModel()
+    scheduler = BatchScheduler(model, max_batch_size=4, max_wait_ms=500)
+    with ThreadPoolExecutor(3) as pool:
+        list(pool.map(lambda v: scheduler.submit(_rows(v, count=2), timeout=5), range(3)))
+    assert all(size <= 4 for size in model.batches)
+    assert sum(model.batches) == 6
+
+
+def test_lone_request_runs_after_the_wait_window():
+    model = RecordingModel()
+    scheduler = BatchScheduler(model, max_batch_size=16, max_wait_ms=50)
+    started = time.perf_counter()
+    result = scheduler.submit(_rows(3), timeout=5)
+    elapsed = time.perf_counter() - started
+    assert result.tolist() == [[6.0]]
+    assert model.batches == [1]
+    assert 0.04 <= elapsed < 1.0
+    assert scheduler.stats()['max_queue_delay_ms'] >= 40
+
+
+def test_model_errors_reach_every_caller_and_the_worker_survives():
+    def broken(batch):
+        if batch[0, 0, 0, 0] < 0:
+            raise ValueError('bad batch')
+        return batch[:, 0, 0, :1]
+
+    scheduler = BatchScheduler(broken, max_wait_ms=1)
+    with pytest.raises(ValueError, match='bad batch'):
+        scheduler.submit(_rows(-1), timeout=5)
+    assert scheduler.submit(_rows(4), timeout=5).tolist() == [[4.0]]
@@ -0,0 +1,83 @@
+"""Circuit breaker states, on its own and around Gemini calls to fake_gemini_server.py."""
+
+import time
+
+import pytest
+
+import llm
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from fake_gemini_server import ANSWER
+
+
+@pytest.fixture
+def gemini(fake_gemini, monkeypatch):
+    monkeypatch.setattr(llm.Config, 'SEMANTIC_CACHE_ENABLED', False)
+    monkeypatch.setattr(llm.Config, 'LLM_TIMEOUT_SECONDS', 5)
+    monkeypatch.setattr(llm, '_fallbacks', [])
+    return fake_gemini
+
+
+def test_opens_after_consecutive_failures_and_half_opens_after_reset():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=0.1)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()  # A success resets the count
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.12)
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()  # Only one trial call at a time
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    time.sleep(0.12)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    stats = breaker.stats()
+    assert stats['opened'] == 2 and stats['rejected'] == 2
+
+
+def test_breaker_opens_on_gemini_outage_and_recovers(gemini):
+    assert llm.detect_disease('spots on leaves') == ANSWER
+    assert llm.breaker.state == CLOSED
+
+    gemini.mode = 'fail'
+    for _ in range(2):
+        assert llm.is_degraded(llm.detect_disease('spots on leaves'))
+    assert llm.breaker.state == OPEN
+    requests = gemini.requests
+
+    # While open, callers get a fallback without reaching Gemini
+    answer = llm.detect_disease('spots on leaves')
+    assert llm.is_degraded(answer)
+    assert gemini.requests == requests
+    assert llm.breaker.stats()['rejected'] == 1
+
+    # The half-open trial fails, so the breaker opens again
+    time.sleep(0.55)
+    assert llm.is_degraded(llm.detect_disease('spots on leaves'))
+    assert gemini.requests == requests + 1
+    assert llm.breaker.state == OPEN
+
+    # Once Gemini is back, the next trial closes it
+    gemini.mode = 'ok'
+    time.sleep(0.55)
+    assert not llm.is_degraded(llm.detect_disease('spots on leaves'))
+    assert llm.breaker.state == CLOSED
+    assert llm.breaker.stats()['opened'] == 2
+
+
+def test_open_breaker_degrades_streams_too(gemini):
+    gemini.mode = 'fail'
+    for _ in range(2):
+        llm.detect_disease('spots on leaves')
+    requests = gemini.requests
+    pieces = list(llm.stream_disease('spots on leaves', use_cache=False))
+    assert len(pieces) == 1 and llm.is_degraded(pieces[0])
+    assert gemini.requests == requests
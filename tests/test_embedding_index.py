@@ -0,0 +1,59 @@
+"""Similar-case search: exact below the threshold, high recall through the IVF index, shared through disk."""
+
+import numpy as np
+import pytest
+
+from embedding_index import EmbeddingIndex
+
+DIM = 32
+
+
+@pytest.fixture
+def clustered():
+    rng = np.random.default_rng(0)
+    centres = rng.standard_normal((40, DIM))
+    data = centres[rng.integers(0, len(centres), 3000)] + 0.4 * rng.standard_normal((3000, DIM))
+    return (data / np.linalg.norm(data, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _exact(vectors, query, k):
+    return set(np.argsort(-(vectors @ query))[:k].tolist())
+
+
+def test_small_collection_is_searched_exactly(tmp_path, clustered):
+    index = EmbeddingIndex(str(tmp_path), dim=DIM)
+    index.append(np.arange(200), clustered[:200])
+    stored = index.vector(np.arange(200)).astype(np.float32)
+    for row in (0, 57, 199):
+        found = index.search(stored[row], k=5)
+        assert found[0] == (row, pytest.approx(1.0, abs=1e-2))
+        assert {i for i, _ in found} == _exact(stored, stored[row], 5)
+    assert row not in {i for i, _ in index.search(stored[row], k=5, exclude_row=row)}
+
+
+def test_ivf_recall_on_clustered_fixture(tmp_path, clustered):
+    index = EmbeddingIndex(str(tmp_path), dim=DIM, nprobe=8, exact_below=500)
+    for start in range(0, 2500, 500):
+        index.append(np.arange(start, start + 500), clustered[start:start + 500])
+    index.train()
+    assert index.stats()['lists'] >= 16
+    # Rows appended after training are assigned to a list at once
+    index.append(np.arange(2500, 3000), clustered[2500:])
+
+    stored = index.vector(np.arange(3000)).astype(np.float32)
+    recall = []
+    for row in np.random.default_rng(1).integers(0, 3000, 50):
+        found = {i for i, _ in index.search(stored[row], k=10)}
+        recall.append(len(found & _exact(stored, stored[row], 10)) / 10)
+    assert np.mean(recall) >= 0.9
+    assert index.search(stored[2999], k=1)[0][0] == 2999
+
+
+def test_rows_appended_by_another_instance_are_visible(tmp_path, clustered):
+    first = EmbeddingIndex(str(tmp_path), dim=DIM)
+    second = EmbeddingIndex(str(tmp_path), dim=DIM)
+    first.append([10, 11], clustered[:2])
+    assert second.append([12], clustered[2:3]) == 2
+    assert first.row_of(12) == 2
+    assert second.indexed_ids() == {10, 11, 12}
+    assert first.search(clustered[2], k=1)[0][0] == 12
@@ -0,0 +1,101 @@
+"""Prediction jobs: bounded queue, and status changes seen by a JobQueue in another process."""
+
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+
+import pytest
+
+from jobs import JobQueue, QueueFullError
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a separate process: submits a job that finishes once the test creates the go file,
+# and a job that fails, then keeps its queue alive until the test is done reading
+OWNER = textwrap.dedent('''
+    import os, sys, time
+    sys.path.insert(0, sys.argv[1])
+    from jobs import JobQueue
+
+    db_path, go, stop = sys.argv[2:5]
+
+    def classify():
+        while not os.path.exists(go):
+            time.sleep(0.02)
+        return {'disease': 'Tomato___Late_blight', 'confidence': 0.93}
+
+    def broken():
+        raise ValueError('cannot decode image')
+
+    queue = JobQueue(workers=1, db_path=db_path)
+    job = queue.submit(classify)
+    failing = queue.submit(broken)
+    print(job.id, failing.id, flush=True)
+    while not os.path.exists(stop):
+        time.sleep(0.02)
+''')
+
+
+def test_status_changes_reach_another_process(tmp_path):
+    db_path = str(tmp_path / 'jobs.db')
+    go, stop = tmp_path / 'go', tmp_path / 'stop'
+    owner = subprocess.Popen([sys.executable, '-c', OWNER, ROOT, db_path, str(go), str(stop)],
+                             stdout=subprocess.PIPE, text=True)
+    try:
+        job_id, failing_id = owner.stdout.readline().split()
+        follower = JobQueue(db_path=db_path, poll_interval=0.02)
+
+        job = follower.get(job_id)
+        assert job is not None and job.status in ('queued', 'running')
+        assert follower.get('unknown') is None
+
+        deadline = time.monotonic() + 5
+        while job.status != 'running' and time.monotonic() < deadline:
+            follower.wait_for_change(job, job.version, timeout=1)
+        assert job.status == 'running' and job.started_at is not None
+
+        go.touch()
+        while not job.finished and time.monotonic() < deadline:
+            follower.wait_for_change(job, job.version, timeout=1)
+        assert job.to_dict()['result'] == {'disease': 'Tomato___Late_blight', 'confidence': 0.93}
+        assert job.status == 'done'
+
+        failing = follower.get(failing_id)
+        while not failing.finished and time.monotonic() < deadline:
+            follower.wait_for_change(failing, failing.version, timeout=1)
+        assert failing.status == 'failed'
+        assert failing.to_dict()['error'] == 'cannot decode image'
+    finally:
+        stop.touch()
+        owner.wait(timeout=10)
+
+
+def test_queue_is_bounded_and_local_waits_wake_up():
+    queue = JobQueue(workers=1, max_pending=1)
+    release = threading.Event()
+    job = queue.submit(release.wait)
+    with pytest.raises(QueueFullError):
+        queue.submit(lambda: None)
+    assert queue.stats()['rejected'] == 1
+
+    version = job.version
+    release.set()
+    while not job.finished:
+        version = queue.wait_for_change(job, version, timeout=5)
+    assert job.status == 'done' and job.result is True
+    queue.submit(lambda: None)
+
+
+def test_finished_jobs_expire_from_the_shared_table(tmp_path):
+    db_path = str(tmp_path / 'jobs.db')
+    queue = JobQueue(db_path=db_path, ttl_seconds=0.05)
+    job = queue.submit(lambda: 1)
+    while not job.finished:
+        queue.wait_for_change(job, job.version, timeout=5)
+    time.sleep(0.1)
+    other = JobQueue(db_path=db_path, ttl_seconds=0.05)
+    assert other.get(job.id) is None
+    assert queue.get(job.id) is None
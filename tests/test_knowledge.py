@@ -0,0 +1,79 @@
+"""Disease knowledge cache: put and get through memory and SQLite, stale entries and failed fetches."""
+
+import time
+
+import pytest
+
+from knowledge import DiseaseKnowledge
+
+
+class FakeFetch:
+    def __init__(self):
+        self.calls = []
+        self.offline = False
+
+    def __call__(self, class_name):
+        self.calls.append(class_name)
+        if self.offline:
+            raise ConnectionError('offline')
+        return f'Advice for {class_name} #{len(self.calls)}'
+
+
+def _knowledge(tmp_path, fetch, **kwargs):
+    kwargs.setdefault('refresh_interval', 0)
+    return DiseaseKnowledge(str(tmp_path / 'knowledge.db'), fetch, prompt_version=1, model_name='gemini-test', **kwargs)
+
+
+def test_put_then_get_without_fetching(tmp_path):
+    fetch = FakeFetch()
+    knowledge = _knowledge(tmp_path, fetch)
+    knowledge.put('Tomato___Late_blight', 'Remove infected leaves.')
+    assert knowledge.get('Tomato___Late_blight') == 'Remove infected leaves.'
+    assert fetch.calls == []
+    assert knowledge.stats()['hits'] == 1
+
+
+def test_miss_fetches_once_and_persists(tmp_path):
+    fetch = FakeFetch()
+    knowledge = _knowledge(tmp_path, fetch)
+    assert knowledge.get('Apple___Apple_scab', fetch_on_miss=False) is None
+    assert knowledge.get('Apple___Apple_scab') == 'Advice for Apple___Apple_scab #1'
+    assert knowledge.get('Apple___Apple_scab') == 'Advice for Apple___Apple_scab #1'
+    assert fetch.calls == ['Apple___Apple_scab']
+
+    # Another worker (or a restart) reads it from SQLite
+    other = _knowledge(tmp_path, FakeFetch())
+    assert other.get('Apple___Apple_scab', fetch_on_miss=False) == 'Advice for Apple___Apple_scab #1'
+
+
+def test_entries_are_keyed_by_prompt_version_and_model(tmp_path):
+    _knowledge(tmp_path, FakeFetch()).put('Corn___healthy', 'old prompt text')
+    newer = DiseaseKnowledge(str(tmp_path / 'knowledge.db'), FakeFetch(), prompt_version=2,
+                             model_name='gemini-test', refresh_interval=0)
+    assert newer.get('Corn___healthy', fetch_on_miss=False) is None
+
+
+def test_stale_entry_is_served_while_refreshing(tmp_path):
+    fetch = FakeFetch()
+    knowledge = _knowledge(tmp_path, fetch, ttl_seconds=0.05)
+    knowledge.put('Grape___Black_rot', 'cached text')
+    time.sleep(0.1)
+    assert knowledge.get('Grape___Black_rot') == 'cached text'
+    assert knowledge.stats()['stale_hits'] == 1
+    deadline = time.monotonic() + 5
+    while knowledge.stats()['refreshes'] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert knowledge.get('Grape___Black_rot').startswith('Advice for Grape___Black_rot')
+
+
+def test_offline_fetch_keeps_stale_text_and_raises_on_miss(tmp_path):
+    fetch = FakeFetch()
+    knowledge = _knowledge(tmp_path, fetch, ttl_seconds=0.05)
+    knowledge.put('Potato___Early_blight', 'cached text')
+    fetch.offline = True
+    time.sleep(0.1)
+    assert knowledge.refresh('Potato___Early_blight') is False
+    assert knowledge.get('Potato___Early_blight') == 'cached text'
+    with pytest.raises(ConnectionError):
+        knowledge.get('Potato___healthy')
+    assert knowledge.prewarm(['Potato___healthy']) == (0, 1)
@@ -0,0 +1,42 @@
+"""Fallback answers while Gemini is failing, against fake_gemini_server.py."""
+
+import time
+
+import pytest
+
+import llm
+
+TOMATO = "Yellow spots with brown centres on the lower tomato leaves"
+POTATO = "Yellow spots with brown centres on the lower potato leaves"
+
+
+@pytest.fixture
+def failing_gemini(fake_gemini, monkeypatch):
+    fake_gemini.mode = 'fail'
+    monkeypatch.setattr(llm.Config, 'SEMANTIC_CACHE_ENABLED', True)
+    monkeypatch.setattr(llm.Config, 'LLM_TIMEOUT_SECONDS', 5)
+    monkeypatch.setattr(llm, 'semantic_cache', llm.SemanticCache(threshold=0.7, ttl_seconds=1))
+    monkeypatch.setattr(llm, '_fallbacks', [])
+    llm.semantic_cache.put(TOMATO, 'tomato answer')
+    return fake_gemini
+
+
+def test_fallback_for_a_different_crop_is_never_the_cached_answer(failing_gemini):
+    answer = llm.detect_disease(POTATO)
+    assert answer != 'tomato answer'
+    assert answer.tier == 'static'
+    assert llm.is_degraded(answer)
+
+
+def test_fallback_serves_a_stale_answer_for_the_same_crop(failing_gemini, monkeypatch):
+    monkeypatch.setattr(llm.semantic_cache, 'ttl_seconds', 0.001)
+    time.sleep(0.01)
+    assert llm.semantic_cache.get(TOMATO) is None
+    answer = llm.fallback_answer(TOMATO.lower() + '.', 'error')
+    assert answer == 'tomato answer'
+    assert answer.tier == 'semantic_cache'
+
+
+@pytest.mark.parametrize('query', [POTATO, "no yellow spots with brown centres on the lower tomato leaves"])
+def test_fallback_answer_skips_near_misses(failing_gemini, query):
+    assert llm.fallback_answer(query, 'error').tier == 'static'
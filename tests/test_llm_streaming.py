@@ -0,0 +1,55 @@
+"""Streamed Gemini answers that break off part-way, against fake_gemini_server.py."""
+
+import json
+
+import pytest
+
+import llm
+from fake_gemini_server import ANSWER
+
+
+@pytest.fixture
+def slow_gemini(fake_gemini, monkeypatch):
+    # Four chunks 0.3 s apart against a 0.8 s budget: the stream is cut off after two or three
+    fake_gemini.delay = 0.3
+    monkeypatch.setattr(llm.Config, 'LLM_TIMEOUT_SECONDS', 0.8)
+    return fake_gemini
+
+
+def test_deadline_after_partial_output_raises_incomplete(slow_gemini):
+    pieces = []
+    with pytest.raises(llm.IncompleteAnswer):
+        for piece in llm.stream_disease('spots on leaves', use_cache=False):
+            pieces.append(piece)
+    assert pieces
+    assert ''.join(pieces) != ANSWER
+
+
+def test_incomplete_answer_is_not_cached(slow_gemini, monkeypatch):
+    monkeypatch.setattr(llm.Config, 'SEMANTIC_CACHE_ENABLED', True)
+    monkeypatch.setattr(llm, 'semantic_cache', llm.SemanticCache())
+    with pytest.raises(llm.IncompleteAnswer):
+        list(llm.stream_disease('white powder on squash leaves'))
+    assert llm.semantic_cache.stats()['entries'] == 0
+
+
+def test_sse_reports_incomplete_answer_and_skips_on_complete(slow_gemini):
+    from app import _stream_llm_events
+
+    completed = []
+    events = list(_stream_llm_events(llm.stream_disease('spots on leaves', use_cache=False), completed.append))
+
+    assert events[0].startswith('event: chunk')
+    assert events[-1].startswith('event: error')
+    assert json.loads(events[-1].split('data: ', 1)[1])['incomplete'] is True
+    assert completed == []
+
+
+def test_whole_stream_completes(fake_gemini):
+    from app import _stream_llm_events
+
+    completed = []
+    events = list(_stream_llm_events(llm.stream_disease('spots on leaves', use_cache=False), completed.append))
+
+    assert events[-1].startswith('event: done')
+    assert completed == [ANSWER]
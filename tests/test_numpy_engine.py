@@ -0,0 +1,95 @@
+"""
+Parity of numpy_engine.NumpyCNN with Keras on a small randomly initialised
+model exported in the TensorFlow.js layers format (model.json + .bin shards),
+and completeness of the shipped model's weight shards.
+"""
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+from numpy_engine import NumpyCNN, missing_weight_shards
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _build_model():
+    tf = pytest.importorskip('tensorflow')
+    tf.keras.utils.set_random_seed(0)
+    return tf.keras.Sequential([
+        tf.keras.Input(shape=(32, 32, 3)),
+        tf.keras.layers.Conv2D(8, (3, 3), padding='same', activation='relu', name='conv_same'),
+        tf.keras.layers.MaxPooling2D((2, 2), name='pool'),
+        tf.keras.layers.Conv2D(6, (3, 3), strides=(2, 2), activation='relu', name='conv_strided'),
+        tf.keras.layers.MaxPooling2D((3, 3), strides=(1, 1), padding='same', name='pool_overlapping'),
+        tf.keras.layers.Flatten(name='flatten'),
+        tf.keras.layers.Dense(16, activation='relu', name='hidden'),
+        tf.keras.layers.Dense(5, activation='softmax', name='output'),
+    ])
+
+
+def _export(model, directory, shard_bytes=1000):
+    """Write model.json and weight shards the way tensorflowjs_converter lays them out."""
+    specs, buffers = [], []
+    for layer in model.layers:
+        for variable, value in zip(('kernel', 'bias'), layer.get_weights()):
+            value = np.asarray(value, dtype=np.float32)
+            specs.append({'name': f'{layer.name}/{variable}', 'shape': list(value.shape), 'dtype': 'float32'})
+            buffers.append(value.tobytes())
+    data = b''.join(buffers)
+    # Small shards so some weights straddle a shard boundary
+    paths = []
+    for i, start in enumerate(range(0, len(data), shard_bytes)):
+        paths.append(f'group1-shard{i + 1}of{-(-len(data) // shard_bytes)}.bin')
+        (directory / paths[-1]).write_bytes(data[start:start + shard_bytes])
+    model_json = {
+        'format': 'layers-model',
+        'modelTopology': {'class_name': 'Sequential', 'config': model.get_config()},
+        'weightsManifest': [{'paths': paths, 'weights': specs}],
+    }
+    path = directory / 'model.json'
+    path.write_text(json.dumps(model_json))
+    return path
+
+
+def test_predict_matches_keras(tmp_path):
+    model = _build_model()
+    engine = NumpyCNN.load(str(_export(model, tmp_path)))
+    batch = np.random.default_rng(1).random((7, 32, 32, 3), dtype=np.float32)
+
+    expected = model.predict(batch, verbose=0)
+    actual = engine.predict(batch, chunk_size=3)
+
+    assert actual.shape == expected.shape
+    assert np.allclose(actual, expected, atol=1e-5)
+
+
+def test_divide_by_255_metadata_scales_inputs(tmp_path):
+    model = _build_model()
+    metadata = tmp_path / 'metadata.json'
+    metadata.write_text(json.dumps({'preprocessingParams': {'normalization': 'divide-by-255'}}))
+    engine = NumpyCNN.load(str(_export(model, tmp_path)), str(metadata))
+    batch = np.random.default_rng(2).integers(0, 256, (4, 32, 32, 3)).astype(np.float32)
+
+    expected = model.predict(batch / 255.0, verbose=0)
+
+    assert np.allclose(engine.predict(batch), expected, atol=1e-5)
+
+
+def test_shipped_model_has_every_shard():
+    model_json = os.path.join(ROOT, 'static', 'model', 'tfjs_model', 'model.json')
+    assert missing_weight_shards(model_json) == []
+    engine = NumpyCNN.load(model_json, os.path.join(ROOT, 'static', 'model', 'metadata.json'))
+    assert engine.predict(np.zeros((1, 128, 128, 3), dtype=np.float32)).shape == (1, 38)
+
+
+def test_missing_shard_is_reported(tmp_path):
+    path = _export(_build_model(), tmp_path)
+    shard = sorted(tmp_path.glob('*.bin'))[0]
+    shard.unlink()
+
+    assert missing_weight_shards(str(path)) == [shard.name]
+    with pytest.raises(FileNotFoundError):
+        NumpyCNN.load(str(path))
@@ -0,0 +1,102 @@
+"""Near-duplicate lookup: HammingIndex agrees with a brute-force scan, also while hashes are being added."""
+
+import random
+import threading
+
+import numpy as np
+
+from perceptual_hash import HASH_BITS, HammingIndex, dhash
+
+
+def _flip(value, bits):
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+def _brute_force(stored, value, max_distance):
+    best = None
+    for payload, other in enumerate(stored):
+        distance = bin(other ^ value).count('1')
+        if distance <= max_distance and (best is None or distance < best[0]):
+            best = (distance, payload)
+    return best
+
+
+def test_finds_neighbours_within_radius_only():
+    index = HammingIndex(max_distance=4)
+    base = random.Random(1).getrandbits(HASH_BITS)
+    index.add(base, 'base')
+    assert index.nearest(base) == (0, 'base')
+    assert index.nearest(_flip(base, [0, 17, 33, 63])) == (4, 'base')
+    assert index.nearest(_flip(base, [0, 17, 33, 50, 63])) is None
+    assert index.nearest(_flip(base, [5, 40]), max_distance=1) is None
+    assert index.stats()['matches'] == 2
+
+
+def test_matches_brute_force_scan():
+    rng = random.Random(2)
+    index = HammingIndex(max_distance=6)
+    stored = [rng.getrandbits(HASH_BITS) for _ in range(2000)]
+    for payload, value in enumerate(stored):
+        index.add(value, payload)
+    assert len(index) == 2000
+    for _ in range(300):
+        original = rng.choice(stored)
+        query = _flip(original, rng.sample(range(HASH_BITS), rng.randint(0, 9)))
+        expected = _brute_force(stored, query, 6)
+        found = index.nearest(query)
+        if expected is None:
+            assert found is None
+        else:
+            assert found is not None and found[0] == expected[0]
+            assert bin(stored[found[1]] ^ query).count('1') == found[0]
+
+
+def test_concurrent_add_and_lookup():
+    rng = random.Random(3)
+    index = HammingIndex(max_distance=4)
+    values = [rng.getrandbits(HASH_BITS) for _ in range(4000)]
+    added = []
+    errors = []
+    done = threading.Event()
+
+    def writer(part):
+        for payload in range(part, len(values), 2):
+            index.add(values[payload], payload)
+            added.append(payload)
+
+    def reader(seed):
+        local = random.Random(seed)
+        try:
+            while not done.is_set() or local.random() < 0.5:
+                if not added:
+                    continue
+                payload = added[local.randrange(len(added))]
+                found = index.nearest(_flip(values[payload], local.sample(range(HASH_BITS), 3)))
+                assert found is not None and found[0] <= 3
+        except Exception as e:
+            errors.append(e)
+
+    writers = [threading.Thread(target=writer, args=(part,)) for part in range(2)]
+    readers = [threading.Thread(target=reader, args=(seed,)) for seed in range(3)]
+    for thread in readers + writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    done.set()
+    for thread in readers:
+        thread.join()
+
+    assert errors == []
+    assert len(index) == len(values)
+    # The hash array grew several times under the readers; every entry is still reachable
+    for payload in rng.sample(range(len(values)), 200):
+        assert index.nearest(values[payload]) == (0, payload)
+
+
+def test_dhash_survives_resizing():
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 255, size=(16, 18, 3)).repeat(16, axis=0).repeat(16, axis=1).astype(np.uint8)
+    smaller = image[::2, ::2]
+    assert bin(dhash(image) ^ dhash(smaller)).count('1') <= 4
@@ -0,0 +1,62 @@
+"""Prediction cache: memory LRU order and least-recently-used eviction from the bounded SQLite table."""
+
+import json
+import time
+
+from prediction_cache import PredictionCache
+
+
+def _value(i):
+    return {'disease': f'class {i}', 'confidence': 0.5, 'pad': 'x' * 50}
+
+
+def test_make_key_depends_on_bytes_and_model_version():
+    key = PredictionCache.make_key(b'image', 'v1')
+    assert key == PredictionCache.make_key(b'image', 'v1')
+    assert key != PredictionCache.make_key(b'image', 'v2')
+    assert key != PredictionCache.make_key(b'other', 'v1')
+
+
+def test_memory_lru_falls_back_to_disk(tmp_path):
+    cache = PredictionCache(str(tmp_path / 'cache.db'), memory_entries=2)
+    for i in range(3):
+        cache.put(f'k{i}', _value(i))
+    assert list(cache._memory) == ['k1', 'k2']
+
+    assert cache.get('k0') == _value(0)
+    assert cache.stats()['disk_hits'] == 1
+    # Reading k0 back from disk pushed out the least recently used memory entry
+    assert list(cache._memory) == ['k2', 'k0']
+    assert cache.get('k2') == _value(2)
+    assert cache.stats()['memory_hits'] == 1
+    assert cache.get('missing') is None
+    assert cache.stats()['misses'] == 1
+
+
+def test_sqlite_evicts_least_recently_used_rows(tmp_path):
+    entry_size = len(json.dumps(_value(0)))
+    cache = PredictionCache(str(tmp_path / 'cache.db'), memory_entries=1, max_db_bytes=3 * entry_size)
+    for i in range(3):
+        cache.put(f'k{i}', _value(i))
+        time.sleep(0.01)
+    cache.get('k0')  # k0 is now more recent than k1
+    time.sleep(0.01)
+    cache.put('k3', _value(3))
+
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['disk_bytes'] == 3 * entry_size
+    reopened = PredictionCache(str(tmp_path / 'cache.db'), memory_entries=1)
+    assert reopened.get('k1') is None
+    for key in ('k0', 'k2', 'k3'):
+        assert reopened.get(key) is not None
+    assert reopened.stats()['disk_bytes'] == 3 * entry_size
+
+
+def test_update_merges_fields(tmp_path):
+    cache = PredictionCache(str(tmp_path / 'cache.db'))
+    cache.put('k', _value(1))
+    cache.update('k', detail='Remove infected leaves.')
+    assert cache.get('k')['detail'] == 'Remove infected leaves.'
+    cache.update('missing', detail='ignored')
+    assert cache.get('missing') is None
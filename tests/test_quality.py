@@ -0,0 +1,54 @@
+"""Quality gate: a sharp, well-lit leaf passes; dark, blown-out, blurry and leafless photos are turned away."""
+
+import numpy as np
+import pytest
+
+from quality import ImageQualityError, QualityGate
+
+
+def _leaf(seed=0):
+    # Textured green foliage: strong green channel with pixel-level detail
+    rng = np.random.default_rng(seed)
+    image = np.empty((128, 128, 3), dtype=np.float32)
+    image[..., 0] = rng.uniform(30, 90, (128, 128))
+    image[..., 1] = rng.uniform(110, 200, (128, 128))
+    image[..., 2] = rng.uniform(20, 70, (128, 128))
+    return image
+
+
+def _grey_texture():
+    value = np.random.default_rng(1).uniform(60, 200, (128, 128, 1))
+    return np.repeat(value, 3, axis=-1).astype(np.float32)
+
+
+def test_sharp_leaf_is_accepted():
+    gate = QualityGate()
+    metrics = gate.check(_leaf())
+    assert metrics['plant_fraction'] > 0.9
+    assert metrics['sharpness'] > gate.min_sharpness
+    assert gate.stats()['rejected'] == 0
+
+
+@pytest.mark.parametrize('image, reason', [
+    (_leaf() * 0.05, 'too_dark'),
+    (np.full((128, 128, 3), 252.0, dtype=np.float32), 'overexposed'),
+    (np.tile(_leaf().mean(axis=(0, 1)), (128, 128, 1)), 'blurry'),
+    (_grey_texture(), 'no_plant'),
+])
+def test_poor_photos_are_rejected_with_a_reason(image, reason):
+    gate = QualityGate()
+    with pytest.raises(ImageQualityError) as excinfo:
+        gate.check(image)
+    assert excinfo.value.reason == reason
+    assert 'retake' in str(excinfo.value)
+    assert set(excinfo.value.metrics) >= {'sharpness', 'brightness', 'plant_fraction'}
+    assert gate.stats()['rejections'] == {reason: 1}
+
+
+def test_thresholds_are_configurable_and_counted():
+    gate = QualityGate(min_plant_fraction=0.0)
+    gate.check(_grey_texture())
+    with pytest.raises(ImageQualityError):
+        QualityGate(min_sharpness=1e9).check(_leaf())
+    gate.check(_leaf(2))
+    assert gate.stats()['checked'] == 2 and gate.stats()['rejection_rate'] == 0.0
@@ -0,0 +1,48 @@
+"""Similarity cache lookups: reworded texts hit, different crops, diseases and negations do not."""
+
+import pytest
+
+from semantic_cache import SemanticCache, jaccard, key_terms, shingles
+
+NEAR_MISSES = [
+    ("Yellow spots with brown centres on the lower tomato leaves",
+     "Yellow spots with brown centres on the lower potato leaves"),
+    ("White powdery coating on squash leaves spreading fast",
+     "White powdery coating on grape leaves spreading fast"),
+    ("no yellow spots on leaves", "yellow spots on leaves"),
+    ("Leaves don't have brown rings after rain", "Leaves have brown rings after rain"),
+    ("Signs of late blight on tomato leaves", "Signs of leaf mold on tomato leaves"),
+]
+
+
+@pytest.mark.parametrize('cached, query', NEAR_MISSES)
+def test_near_miss_is_not_served(cached, query):
+    cache = SemanticCache(threshold=0.7)
+    cache.put(cached, 'cached answer')
+    assert cache.get(query) is None
+    assert cache.get(query, allow_stale=True) is None
+
+
+def test_near_misses_are_similar_enough_to_need_the_gate():
+    # Word overlap alone would pass the threshold for these pairs
+    assert jaccard(shingles(NEAR_MISSES[2][0]), shingles(NEAR_MISSES[2][1])) >= 0.7
+    assert key_terms(NEAR_MISSES[0][0]) == {'tomato'}
+    assert key_terms(NEAR_MISSES[2][0]) == {'no yellow'}
+
+
+def test_rewording_of_the_same_crop_is_served():
+    cache = SemanticCache(threshold=0.7)
+    cache.put("My tomatoes have yellow spots on the lower leaves", 'tomato answer')
+    assert cache.get("Yellow spots on lower leaves of my tomato!") == 'tomato answer'
+    assert cache.stats()['hits'] == 1
+
+
+def test_lru_eviction_and_ttl():
+    cache = SemanticCache(max_entries=2, ttl_seconds=60)
+    cache.put("yellow spots on tomato leaves", 'a')
+    cache.put("white powder on squash leaves", 'b')
+    cache.get("yellow spots on tomato leaves")
+    cache.put("black rot on grape fruit", 'c')
+    assert cache.get("white powder on squash leaves") is None
+    assert cache.get("yellow spots on tomato leaves") == 'a'
+    assert cache.stats()['evictions'] == 1
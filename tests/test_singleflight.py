@@ -0,0 +1,104 @@
+"""Single-flight: identical concurrent calls run once, within a process and across lease-sharing workers."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from singleflight import SingleFlight, prompt_key
+
+
+class GatedCall:
+    def __init__(self, value='answer'):
+        self.value = value
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        if isinstance(self.value, Exception):
+            raise self.value
+        return self.value
+
+
+def _wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert condition()
+
+
+def test_prompt_key_ignores_case_and_whitespace():
+    assert prompt_key('Yellow  spots\non Tomato') == prompt_key('yellow spots on tomato')
+    assert prompt_key('yellow spots on tomato') != prompt_key('yellow spots on potato')
+
+
+def test_concurrent_duplicates_share_one_call():
+    flight = SingleFlight()
+    call = GatedCall()
+    with ThreadPoolExecutor(5) as pool:
+        futures = [pool.submit(flight.do, 'k', call) for _ in range(5)]
+        _wait_until(lambda: flight.stats()['coalesced_local'] == 4)
+        call.release.set()
+        assert [f.result() for f in futures] == ['answer'] * 5
+    assert call.calls == 1
+    assert flight.stats()['in_flight'] == 0
+    # Once finished, the next call runs again
+    assert flight.do('k', lambda: 'fresh') == 'fresh'
+
+
+def test_errors_are_shared_and_other_keys_are_independent():
+    flight = SingleFlight()
+    call = GatedCall(ValueError('quota exceeded'))
+    with ThreadPoolExecutor(3) as pool:
+        failing = [pool.submit(flight.do, 'k', call) for _ in range(2)]
+        assert call.started.wait(5)
+        assert flight.do('other', lambda: 'independent') == 'independent'
+        _wait_until(lambda: flight.stats()['coalesced_local'] == 1)
+        call.release.set()
+        for future in failing:
+            with pytest.raises(ValueError, match='quota exceeded'):
+                future.result()
+    assert call.calls == 1
+
+
+def test_waiter_times_out_while_the_call_carries_on():
+    flight = SingleFlight()
+    call = GatedCall()
+    with ThreadPoolExecutor(1) as pool:
+        leader = pool.submit(flight.do, 'k', call)
+        assert call.started.wait(5)
+        with pytest.raises(TimeoutError):
+            flight.do('k', call, timeout=0.05)
+        call.release.set()
+        assert leader.result() == 'answer'
+
+
+def test_workers_sharing_a_lease_database_run_the_call_once(tmp_path):
+    lease_path = str(tmp_path / 'leases.db')
+    workers = [SingleFlight(lease_path=lease_path, poll_interval=0.02) for _ in range(2)]
+    call = GatedCall()
+    with ThreadPoolExecutor(2) as pool:
+        leader = pool.submit(workers[0].do, 'k', call)
+        assert call.started.wait(5)
+        follower = pool.submit(workers[1].do, 'k', call)
+        time.sleep(0.1)
+        call.release.set()
+        assert leader.result() == follower.result() == 'answer'
+    assert call.calls == 1
+    assert workers[1].stats()['coalesced_remote'] == 1
+
+
+def test_expired_lease_is_taken_over(tmp_path):
+    lease_path = str(tmp_path / 'leases.db')
+    dead = SingleFlight(lease_path=lease_path, lease_seconds=0.1)
+    conn = dead._connect()
+    assert dead._acquire(conn, 'k', 'dead-worker')
+    conn.close()
+    flight = SingleFlight(lease_path=lease_path, poll_interval=0.02)
+    assert flight.do('k', lambda: 'answer', timeout=5) == 'answer'
+    assert flight.stats()['takeovers'] == 1
@@ -0,0 +1,176 @@
+"""Live frame streams: throttling, dropping stale frames, smoothing, viewer caps and upload channels."""
+
+import io
+import struct
+import threading
+
+import numpy as np
+import pytest
+
+import app as app_module
+from streams import FrameFormatError, StreamHub, StreamLimitError, read_frames
+
+CLASSES = ['healthy', 'blight']
+
+
+class GatedModel:
+    """Predicts each frame's byte value as class 'blight' probability; blocks until released."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.batches = []
+
+    def decode(self, frame):
+        if frame == b'bad':
+            raise ValueError('not an image')
+        return np.full((2, 2, 1), frame[0] / 255.0, dtype=np.float32)
+
+    def predict(self, images):
+        self.started.set()
+        self.release.wait(5)
+        self.batches.append(len(images))
+        blight = images[:, 0, 0, 0]
+        return np.stack([1.0 - blight, blight], axis=1)
+
+
+@pytest.fixture
+def model():
+    return GatedModel()
+
+
+def _hub(model, **kwargs):
+    return StreamHub(model.decode, model.predict, CLASSES, **kwargs)
+
+
+def _next_result(hub, stream, version):
+    version = hub.wait_for_result(stream, version, timeout=5)
+    return stream.result, version
+
+
+def test_frames_faster_than_max_fps_are_throttled(model):
+    hub = _hub(model, max_fps=2.0)
+    stream = hub.open()
+    assert hub.push(stream, b'\x10') == (True, 0.0)
+    accepted, retry_after = hub.push(stream, b'\x20')
+    assert not accepted
+    assert 0.0 < retry_after <= 0.5
+    assert stream.throttled == 1 and stream.received == 2
+    stream.last_accepted -= 0.5
+    assert hub.push(stream, b'\x30')[0]
+
+
+def test_newer_frame_replaces_an_unclassified_one(model):
+    hub = _hub(model, max_fps=0, smoothing=0.6)
+    stream = hub.open()
+    hub.push(stream, b'\x00')
+    assert model.started.wait(5)
+    # The worker is busy with frame 1; frames 2 and 3 arrive, and only 3 is kept
+    hub.push(stream, b'\x80')
+    hub.push(stream, b'\xff')
+    assert stream.dropped == 1
+
+    model.release.set()
+    result, version = _next_result(hub, stream, 0)
+    while result['seq'] != 3:
+        result, version = _next_result(hub, stream, version)
+    assert stream.classified == 2 and model.batches == [1, 1]
+    assert result['frame_disease'] == 'blight' and result['frame_confidence'] == 1.0
+    # Smoothed with the earlier healthy frame, so not yet fully confident
+    assert result['disease'] == 'blight' and result['confidence'] == 0.6
+    assert result['frames_dropped'] == 1
+    assert hub.stats()['frames_classified'] == 2
+
+
+def test_bad_frame_is_reported_without_stopping_the_stream(model):
+    model.release.set()
+    hub = _hub(model, max_fps=0)
+    stream = hub.open()
+    hub.push(stream, b'bad')
+    result, version = _next_result(hub, stream, 0)
+    assert result['success'] is False and 'not an image' in result['message']
+    hub.push(stream, b'\xff')
+    result, _ = _next_result(hub, stream, version)
+    assert result['success'] is True and result['disease'] == 'blight'
+
+
+def test_stream_and_viewer_limits(model):
+    hub = _hub(model, max_streams=1, max_viewers=2)
+    stream = hub.open()
+    with pytest.raises(StreamLimitError):
+        hub.open()
+
+    assert hub.add_viewer(stream) and hub.add_viewer(stream)
+    assert not hub.add_viewer(stream)
+    hub.remove_viewer(stream)
+    assert hub.add_viewer(stream)
+    assert hub.stats()['viewers_rejected'] == 1
+
+    assert hub.open_upload(stream)
+    assert not hub.open_upload(stream)
+    hub.close_upload(stream)
+
+    assert hub.close(stream.id)
+    assert stream.closed and hub.get(stream.id) is None
+    assert not hub.close(stream.id)
+    assert not hub.open_upload(stream)
+    other = hub.open()
+    # The cap is per stream: viewers of a busy stream do not lock out another one
+    assert hub.add_viewer(other) and hub.add_viewer(other)
+
+
+def _channel(*frames):
+    return b''.join(struct.pack('>I', len(frame)) + frame for frame in frames)
+
+
+def test_read_frames_splits_length_prefixed_body():
+    body = io.BytesIO(_channel(b'\x01', b'\x02\x03') + struct.pack('>I', 0) + b'ignored')
+    assert list(read_frames(body, max_frame_bytes=16)) == [b'\x01', b'\x02\x03']
+    assert list(read_frames(io.BytesIO(b''), max_frame_bytes=16)) == []
+
+
+@pytest.mark.parametrize('body, message', [
+    (_channel(b'x' * 17), 'larger than 16'),
+    (_channel(b'\x01')[:-1], 'Truncated frame'),
+    (b'\x00\x00', 'Truncated frame length'),
+])
+def test_read_frames_rejects_malformed_bodies(body, message):
+    with pytest.raises(FrameFormatError, match=message):
+        list(read_frames(io.BytesIO(body), max_frame_bytes=16))
+
+
+@pytest.fixture
+def stream_client(model, monkeypatch):
+    model.release.set()
+    monkeypatch.setattr(app_module, 'INFERENCE_AVAILABLE', True)
+    monkeypatch.setattr(app_module, 'stream_hub', _hub(model, max_fps=0))
+    return app_module.create_app().test_client()
+
+
+def test_upload_channel_feeds_the_stream(stream_client, model):
+    # A channel carries more than MAX_CONTENT_LENGTH over its lifetime
+    stream_client.application.config['MAX_CONTENT_LENGTH'] = 8
+    opened = stream_client.post('/api/stream').get_json()
+    body = _channel(b'\x00', b'bad', b'\xff')
+    response = stream_client.post(opened['upload_url'], data=body, content_type='application/octet-stream')
+    assert response.status_code == 200
+    assert response.get_json()['frames'] == 3 and response.get_json()['accepted'] == 3
+
+    stream = app_module.stream_hub.get(opened['stream_id'])
+    version = 0
+    while stream.result is None or stream.result['seq'] != 3:
+        version = app_module.stream_hub.wait_for_result(stream, version, timeout=5)
+    assert stream.result['frame_disease'] == 'blight'
+    assert not stream.uploading
+
+
+def test_upload_channel_rejects_bad_frames_and_a_second_channel(stream_client, monkeypatch):
+    opened = stream_client.post('/api/stream').get_json()
+    monkeypatch.setattr(app_module.Config, 'STREAM_MAX_FRAME_BYTES', 2)
+    response = stream_client.post(opened['upload_url'], data=_channel(b'\x10', b'toolong'))
+    assert response.status_code == 400
+    assert response.get_json()['frames'] == 1
+
+    app_module.stream_hub.open_upload(app_module.stream_hub.get(opened['stream_id']))
+    assert stream_client.post(opened['upload_url'], data=_channel(b'\x10')).status_code == 409
+    assert stream_client.post('/api/stream/unknown/upload', data=b'').status_code == 404
@@ -0,0 +1,121 @@
+"""
+TFLite inference backend with optional post-training quantization.
+
+The Keras model is converted once to a TFLite flatbuffer stored next to it
+(model.float16.tflite, model.int8.tflite, ...) and reconverted only when the
+source model changes. Inference runs through a pool of interpreters, one per
+request thread, because a TFLite interpreter must not be shared across threads.
+"""
+
+import os
+import threading
+
+import numpy as np
+import tensorflow as tf
+
+try:
+    from ai_edge_litert.interpreter import Interpreter
+except ImportError:
+    Interpreter = tf.lite.Interpreter
+
+QUANTIZATION_MODES = ('none', 'float16', 'int8')
+
+
+def tflite_path_for(model_path, quantization):
+    base, _ = os.path.splitext(model_path)
+    return f"{base}.{quantization}.tflite"
+
+
+def _representative_dataset(calibration_folder, load_image_array, limit=100):
+    """Yield calibration samples from calibration_folder for int8 quantization."""
+    names = sorted(f for f in os.listdir(calibration_folder) if f.lower().endswith(('.png', '.jpg', '.jpeg')))
+    if not names:
+        raise ValueError(f"No calibration images found in {calibration_folder}")
+
+    def generator():
+        for name in names[:limit]:
+            yield [load_image_array(os.path.join(calibration_folder, name))[np.newaxis]]
+
+    return generator
+
+
+def convert_model(model_path, quantization='float16', calibration_folder=None, load_image_array=None):
+    """
+    Convert a Keras model to TFLite and return the flatbuffer path.
+    The converted file is reused until the Keras model is modified.
+    """
+    if quantization not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown TFLite quantization '{quantization}', expected one of {QUANTIZATION_MODES}")
+
+    output_path = tflite_path_for(model_path, quantization)
+    if os.path.exists(output_path) and os.path.getmtime(output_path) >= os.path.getmtime(model_path):
+        return output_path
+
+    model = tf.keras.models.load_model(model_path)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantization == 'float16':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == 'int8':
+        # Integer kernels inside; float32 input and output keep the predict interface unchanged
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = _representative_dataset(calibration_folder, load_image_array)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+
+    flatbuffer = converter.convert()
+    # Write then rename so concurrent workers never load a partial file
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(flatbuffer)
+    os.replace(tmp_path, output_path)
+    print(f"Converted {model_path} to {output_path} ({len(flatbuffer) / 1024:.0f} KiB, {quantization})")
+    return output_path
+
+
+class InterpreterPool:
+    """Hands each thread its own interpreter over a shared flatbuffer."""
+
+    def __init__(self, tflite_path, num_threads=1):
+        with open(tflite_path, 'rb') as f:
+            self.model_content = f.read()
+        self.num_threads = num_threads
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.size = 0
+
+    def _interpreter(self):
+        state = getattr(self._local, 'state', None)
+        if state is None:
+            interpreter = Interpreter(model_content=self.model_content, num_threads=self.num_threads)
+            interpreter.allocate_tensors()
+            state = {
+                'interpreter': interpreter,
+                'input_index': interpreter.get_input_details()[0]['index'],
+                'output_index': interpreter.get_output_details()[0]['index'],
+                'batch_size': 1
+            }
+            self._local.state = state
+            with self._lock:
+                self.size += 1
+        return state
+
+    def predict(self, input_arr):
+        input_arr = np.ascontiguousarray(input_arr, dtype=np.float32)
+        state = self._interpreter()
+        interpreter = state['interpreter']
+        if len(input_arr) != state['batch_size']:
+            # Reallocate only when the batch size changes
+            interpreter.resize_tensor_input(state['input_index'], list(input_arr.shape))
+            interpreter.allocate_tensors()
+            state['batch_size'] = len(input_arr)
+        interpreter.set_tensor(state['input_index'], input_arr)
+        interpreter.invoke()
+        return interpreter.get_tensor(state['output_index']).copy()
+
+
+def load_tflite_model(model_path, quantization='float16', calibration_folder=None,
+                      load_image_array=None, num_threads=1):
+    """Model registry loader: returns (predict, pool) for a Keras model path."""
+    tflite_path = convert_model(model_path, quantization, calibration_folder, load_image_array)
+    pool = InterpreterPool(tflite_path, num_threads=num_threads)
+    return pool.predict, pool
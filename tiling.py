@@ -0,0 +1,75 @@
+"""
+Tiled inference for high-resolution photos.
+
+Instead of squashing a whole-plant or canopy photo to 128x128, the image is
+cut into overlapping 128x128 patches. The patches are strided views into the
+decoded image (numpy sliding_window_view), so cutting them copies nothing.
+Only one bounded batch of patches is materialised at a time for the forward
+pass. Patch probabilities are averaged into an image-level result, and each
+patch's disease probability (everything except the *healthy classes) forms a
+coarse lesion heatmap.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+TILE_SIZE = 128
+
+
+def tile_grid(image, tile=TILE_SIZE, stride=96):
+    """
+    Return a (rows, cols, tile, tile, 3) strided view of overlapping patches.
+    The image is edge-padded (once, not per patch) when the last row or column
+    of patches would otherwise miss the border.
+    """
+    height, width = image.shape[:2]
+    pad_h = (-(max(height, tile) - tile)) % stride + max(0, tile - height)
+    pad_w = (-(max(width, tile) - tile)) % stride + max(0, tile - width)
+    if pad_h or pad_w:
+        image = np.pad(image, ((0, pad_h), (0, pad_w), (0, 0)), mode='edge')
+    windows = sliding_window_view(image, (tile, tile, 3))[::stride, ::stride, 0]
+    return windows
+
+
+def predict_tiles(image, predict, class_names, stride=96, batch_size=32):
+    """
+    Classify every patch of image (H, W, 3) with predict(batch) in batches of at
+    most batch_size, and aggregate the result. Returns a dict with the
+    image-level prediction, the heatmap and the most diseased patch.
+    """
+    grid = tile_grid(image, stride=stride)
+    rows, cols = grid.shape[:2]
+    count = rows * cols
+    probabilities = np.empty((count, len(class_names)), dtype=np.float32)
+    for start in range(0, count, batch_size):
+        index = np.arange(start, min(start + batch_size, count))
+        # Fancy indexing copies just this batch of patches out of the view
+        batch = grid[index // cols, index % cols].astype(np.float32)
+        probabilities[start:start + len(index)] = predict(batch)
+
+    healthy = np.array(['healthy' in name for name in class_names])
+    disease = probabilities[:, ~healthy].sum(axis=1)
+    image_probabilities = probabilities.mean(axis=0)
+    result_index = int(np.argmax(image_probabilities))
+
+    worst = int(np.argmax(disease))
+    worst_index = int(np.argmax(np.where(healthy, -1.0, probabilities[worst])))
+    return {
+        'result_index': result_index,
+        'confidence': float(image_probabilities[result_index]),
+        'probabilities': image_probabilities,
+        'grid': [rows, cols],
+        'tile_size': TILE_SIZE,
+        'stride': stride,
+        'heatmap': np.round(disease.reshape(rows, cols), 3).tolist(),
+        'diseased_fraction': float((disease > 0.5).mean()),
+        'worst_tile': {
+            'row': worst // cols,
+            'col': worst % cols,
+            'x': int(worst % cols * stride),
+            'y': int(worst // cols * stride),
+            'disease': class_names[worst_index],
+            'probability': float(probabilities[worst, worst_index]),
+            'disease_probability': float(disease[worst])
+        }
+    }